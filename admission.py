@@ -0,0 +1,112 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from rate_limit import TokenBucket
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a request waited in the admission queue longer than allowed."""
+
+
+class AdmissionController:
+    """Process-wide gate in front of the model API.
+
+    Requests queue in arrival order. A request is admitted when a global
+    concurrency slot is free and its API key's token bucket has a token; the
+    earliest queued request that satisfies both goes first, so one key that
+    has run out of quota does not block requests made with another key.
+    """
+
+    def __init__(self, max_concurrent=8, requests_per_minute=60, burst=None, poll_interval=0.5):
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst or max_concurrent
+        self.poll_interval = poll_interval
+        self.in_flight = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self._avg_service = 5.0
+        self._queue = OrderedDict()
+        self._buckets = {}
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+
+    def _bucket(self, api_key):
+        bucket = self._buckets.get(api_key)
+        if bucket is None:
+            bucket = TokenBucket(rate=self.requests_per_minute / 60.0, capacity=self.burst)
+            self._buckets[api_key] = bucket
+        return bucket
+
+    def _next_eligible(self):
+        """Returns the earliest queued ticket whose key has a token, if a slot is free."""
+        if self.in_flight >= self.max_concurrent:
+            return None
+        for ticket, api_key in self._queue.items():
+            if not self._bucket(api_key).wait_time():
+                return ticket
+        return None
+
+    def _estimate_wait(self, position, api_key):
+        return max(self.slot_wait(position), self._bucket(api_key).wait_time(position + 1))
+
+    def slot_wait(self, position):
+        """Estimated seconds until the request `position` places back (0-based) gets a concurrency slot."""
+        with self._cond:
+            return (position // self.max_concurrent) * self._avg_service
+
+    @contextmanager
+    def admit(self, api_key, on_wait=None, timeout=None):
+        """Holds a concurrency slot for the duration of the block.
+
+        `on_wait(position, estimated_seconds)` is called from the waiting thread
+        every poll interval while the request is queued.
+        """
+        started = time.monotonic()
+        with self._cond:
+            ticket = next(self._tickets)
+            self._queue[ticket] = api_key
+            try:
+                while True:
+                    if self._next_eligible() == ticket and self._bucket(api_key).try_acquire() == 0:
+                        break
+                    if timeout is not None and time.monotonic() - started > timeout:
+                        raise AdmissionTimeout()
+                    if on_wait is not None:
+                        position = list(self._queue).index(ticket)
+                        estimate = self._estimate_wait(position, api_key)
+                        # Report progress without holding the lock (callbacks may touch the UI).
+                        self._cond.release()
+                        try:
+                            on_wait(position + 1, estimate)
+                        finally:
+                            self._cond.acquire()
+                    self._cond.wait(self.poll_interval)
+            finally:
+                del self._queue[ticket]
+                self._cond.notify_all()
+            self.in_flight += 1
+            self.admitted += 1
+            self.total_wait += time.monotonic() - started
+
+        service_started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._avg_service = 0.8 * self._avg_service + 0.2 * (time.monotonic() - service_started)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "avg_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+                "avg_service": self._avg_service,
+            }
@@ -1,12 +1,25 @@
+import importlib
+
 import streamlit as st
 
-# Import the modularized pages and utils
 import utils
-import home_page
-import health_page
-import fun_facts_page
-import detailed_info_page
-import settings_page
+
+# --- PAGE REGISTRY ---
+# Page modules (and the model SDK / imaging libraries they pull in) are only
+# imported the first time a page is routed to, so a cold start that lands on
+# Home does not pay for them.
+PAGES = {
+    "Home": "home_page",
+    "Health Triage": "health_page",
+    "Breed & Facts": "fun_facts_page",
+    "Detailed Info": "detailed_info_page",
+    "History": "history_page",
+    "Settings": "settings_page",
+}
+
+def load_page(name):
+    """Imports (once per process) and returns the module that renders a page."""
+    return importlib.import_module(PAGES.get(name, PAGES["Home"]))
 
 # --- APP CONFIGURATION ---
 st.set_page_config(
@@ -38,27 +51,23 @@ def main():
         # This allows buttons on the Home page to update this selection
         st.radio(
             "Go to", 
-            ["Home", "Health Triage", "Breed & Facts", "Detailed Info", "Settings"],
+            list(PAGES),
             key="navigation"
         )
         
+        # Analyses keep running in the background while the user browses other pages.
+        utils.show_job_summary()
+
         st.divider()
         st.caption("Breed Recognition Site v2.2")
         st.caption("Still working")
 
     # Routing Logic based on Session State
-    page_selection = st.session_state.navigation
-    
-    if page_selection == "Home":
-        home_page.show()
-    elif page_selection == "Health Triage":
-        health_page.show()
-    elif page_selection == "Breed & Facts":
-        fun_facts_page.show()
-    elif page_selection == "Detailed Info":
-        detailed_info_page.show()
-    elif page_selection == "Settings":
-        settings_page.show()
+    page = st.session_state.navigation
+    # Model calls and image work made while rendering are labelled with this page.
+    utils.current_page.set(page)
+    with utils.trace("render"):
+        load_page(page).show()
 
 if __name__ == "__main__":
     main()
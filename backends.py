@@ -0,0 +1,324 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from resilience import ModelTimeoutError, ModelUnavailableError, RateLimitedError
+
+
+# --- BACKEND INTERFACE ---
+class ModelBackend:
+    """A model provider behind utils.get_gemini_response and stream_gemini_response.
+
+    `contents` is the prompt text followed by an inline image part
+    ({"mime_type", "data"}). A `response_schema` in generation_config asks for
+    JSON matching that schema. Failures may be raised as any exception;
+    callers map them with resilience.classify_exception. When `usage` is a
+    dict it receives the call's "prompt_tokens", "output_tokens" and
+    "cached_tokens" (prompt tokens served from a context cache).
+
+    Backends with context caching implement `register_prefix`; a call given
+    its handle as `cached_prefix` sends only the contents after the prefix.
+    """
+
+    name = ""
+    # Prefixes shorter than this are not worth (or not allowed) caching.
+    min_cached_tokens = 0
+    # Whose context cache prefix handles live in (e.g. a hash of the API key); handles never cross scopes.
+    cache_scope = ""
+
+    def generate(self, contents, model_name, generation_config, timeout, usage=None, cached_prefix=None):
+        """Returns the complete response text."""
+        raise NotImplementedError
+
+    def stream(self, contents, model_name, generation_config, timeout, usage=None, cached_prefix=None):
+        """Yields the response text in chunks as they arrive."""
+        yield self.generate(contents, model_name, generation_config, timeout, usage, cached_prefix)
+
+    def register_prefix(self, prefix, model_name, ttl):
+        """Caches a static prompt prefix for ttl seconds and returns its handle, or None if unsupported."""
+        return None
+
+
+def _record_usage(usage, metadata):
+    if usage is not None and metadata is not None:
+        usage["prompt_tokens"] = metadata.prompt_token_count
+        usage["output_tokens"] = metadata.candidates_token_count
+        usage["cached_tokens"] = getattr(metadata, "cached_content_token_count", 0) or 0
+
+
+# --- GEMINI ---
+class GeminiBackend(ModelBackend):
+    """Google Gemini through pooled clients for one API key (see utils.get_model_client).
+
+    Context caches are created with cache_client, built with the same key,
+    so a prefix is registered in the project that later calls reference it
+    from; cache_scope identifies that key.
+    """
+
+    name = "gemini"
+    # The API's minimum for explicit context caches; shorter prompts still benefit from implicit caching.
+    min_cached_tokens = 1024
+
+    def __init__(self, client, cache_client=None, cache_scope=""):
+        self.client = client
+        self.cache_client = cache_client
+        self.cache_scope = cache_scope
+
+    def _model(self, model_name, generation_config, cached_prefix=None):
+        # Imported on first use: the SDK takes about a second to import and Home never needs it.
+        import google.generativeai as genai
+
+        if cached_prefix is not None:
+            model = genai.GenerativeModel.from_cached_content(cached_prefix, generation_config=generation_config)
+        else:
+            model = genai.GenerativeModel(model_name, generation_config=generation_config)
+        model._client = self.client
+        return model
+
+    def register_prefix(self, prefix, model_name, ttl):
+        if self.cache_client is None:
+            return None
+        import datetime
+
+        from google.generativeai import caching
+
+        # CachedContent.create would use the SDK's default client (GEMINI_API_KEY), not this session's key.
+        request = caching.CachedContent._prepare_create_request(
+            model=model_name, contents=[prefix], ttl=datetime.timedelta(seconds=ttl)
+        )
+        return caching.CachedContent._from_obj(self.cache_client.create_cached_content(request))
+
+    def generate(self, contents, model_name, generation_config, timeout, usage=None, cached_prefix=None):
+        model = self._model(model_name, generation_config, cached_prefix)
+        response = model.generate_content(contents, request_options={"timeout": timeout})
+        _record_usage(usage, getattr(response, "usage_metadata", None))
+        return response.text
+
+    def stream(self, contents, model_name, generation_config, timeout, usage=None, cached_prefix=None):
+        model = self._model(model_name, generation_config, cached_prefix)
+        for chunk in model.generate_content(contents, stream=True, request_options={"timeout": timeout}):
+            # Every chunk carries the running totals; the last one holds the final counts.
+            _record_usage(usage, getattr(chunk, "usage_metadata", None))
+            if chunk.parts:
+                yield chunk.text
+
+
+# --- LOCAL STUB ---
+STUB_BREEDS = [
+    ("Gir", "Cattle", "Indigenous", "Gujarat"),
+    ("Sahiwal", "Cattle", "Indigenous", "Punjab"),
+    ("Red Sindhi", "Cattle", "Indigenous", "Sindh and Rajasthan"),
+    ("Tharparkar", "Cattle", "Indigenous", "Rajasthan"),
+    ("Ongole", "Cattle", "Indigenous", "Andhra Pradesh"),
+    ("Kankrej", "Cattle", "Indigenous", "Gujarat"),
+    ("Murrah", "Buffalo", "Indigenous", "Haryana"),
+    ("Jaffarabadi", "Buffalo", "Indigenous", "Gujarat"),
+    ("Holstein Friesian cross", "Cattle", "Crossbred", "Punjab"),
+]
+
+STUB_HEALTH = [
+    # (status, observation, recommendation); weighted towards healthy animals like real uploads.
+    ("HEALTHY", "The animal stands upright with a smooth coat and no visible lesions.", "Routine Care"),
+    ("HEALTHY", "Body condition looks good and the skin shows no nodules or wounds.", "Routine Care"),
+    ("HEALTHY", "Eyes are clear and the animal appears alert with normal posture.", "Routine Care"),
+    ("WARNING", "The ribs are slightly visible, suggesting the animal is underweight.", "Monitor"),
+    ("CRITICAL", "Several raised skin nodules are visible, consistent with Lumpy Skin Disease.",
+     "Immediate Veterinary Attention"),
+]
+
+# Prepended to every stub health observation: the stub can be picked in Settings, so a canned
+# diagnosis must never read like a real one.
+STUB_HEALTH_MARKER = "[Offline stub, not a real diagnosis] "
+
+# Gemini bills an image up to 384px per side as 258 tokens.
+STUB_IMAGE_TOKENS = 258
+
+
+class StubBackend(ModelBackend):
+    """Offline stand-in that answers in the shape each prompt asks for.
+
+    The answer depends only on the image bytes, so repeated calls and the
+    different pages agree on one photo. Latency is drawn from latency ± jitter seconds. Each call fails
+    with probability error_rate (service unavailable), timeout_rate (runs
+    to the timeout) or rate_limit_rate (quota exhausted). Errors and latency
+    come from a seeded RNG, so a load test replays the same sequence.
+    Token usage is estimated (about four characters per token, a flat
+    STUB_IMAGE_TOKENS per image). Each uncached input token adds
+    prefill_seconds_per_1k / 1000 seconds, and prefixes can be registered
+    as if the stub had a context cache, so caching savings show offline.
+    Like Gemini, it only caches prefixes of at least min_cached_tokens.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.8, jitter=0.4, error_rate=0.0, timeout_rate=0.0, rate_limit_rate=0.0,
+                 seed=0, chunks=12, prefill_seconds_per_1k=0.0, min_cached_tokens=GeminiBackend.min_cached_tokens):
+        self.latency = latency
+        self.min_cached_tokens = min_cached_tokens
+        self.prefill_seconds_per_1k = prefill_seconds_per_1k
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunks = chunks
+        self.calls = 0
+        self._prefixes = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        """Returns (latency, failure) for one call; failure is None or an error kind."""
+        with self._lock:
+            self.calls += 1
+            latency = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            roll = self._rng.random()
+        for kind, rate in (("unavailable", self.error_rate), ("timeout", self.timeout_rate),
+                           ("rate_limited", self.rate_limit_rate)):
+            if roll < rate:
+                return latency, kind
+            roll -= rate
+        return latency, None
+
+    def _fail(self, kind, timeout):
+        if kind == "timeout":
+            time.sleep(timeout)
+            raise ModelTimeoutError("Stub backend timed out.")
+        if kind == "rate_limited":
+            raise RateLimitedError("Stub backend quota exhausted.")
+        raise ModelUnavailableError("Stub backend unavailable.")
+
+    def register_prefix(self, prefix, model_name, ttl):
+        with self._lock:
+            handle = f"stub-prefix-{len(self._prefixes)}"
+            self._prefixes[handle] = prefix
+        return handle
+
+    def _expand(self, contents, cached_prefix):
+        """Returns (full contents, cached prompt characters) for a call that may continue a cached prefix."""
+        if cached_prefix is None:
+            return contents, 0
+        prefix = self._prefixes[cached_prefix]
+        return [prefix + contents[0]] + list(contents[1:]), len(prefix)
+
+    def _prefill(self, usage):
+        return self.prefill_seconds_per_1k * (usage["prompt_tokens"] - usage["cached_tokens"]) / 1000
+
+    def generate(self, contents, model_name, generation_config, timeout, usage=None, cached_prefix=None):
+        latency, failure = self._draw()
+        if failure is not None:
+            self._fail(failure, timeout)
+        contents, cached_chars = self._expand(contents, cached_prefix)
+        text = self.respond(contents, generation_config)
+        usage = {} if usage is None else usage
+        self._estimate_usage(usage, contents, text, cached_chars)
+        latency += self._prefill(usage)
+        time.sleep(min(latency, timeout))
+        if latency > timeout:
+            raise ModelTimeoutError("Stub backend timed out.")
+        return text
+
+    def stream(self, contents, model_name, generation_config, timeout, usage=None, cached_prefix=None):
+        latency, failure = self._draw()
+        if failure is not None:
+            self._fail(failure, timeout)
+        contents, cached_chars = self._expand(contents, cached_prefix)
+        text = self.respond(contents, generation_config)
+        usage = {} if usage is None else usage
+        self._estimate_usage(usage, contents, text, cached_chars)
+        latency += self._prefill(usage)
+        # The first chunk arrives after 40% of the latency; the rest trickle in evenly.
+        step = max(1, -(-len(text) // self.chunks))
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+        time.sleep(min(latency * 0.4, timeout))
+        for piece in pieces:
+            yield piece
+            time.sleep(latency * 0.6 / len(pieces))
+
+    @staticmethod
+    def _estimate_usage(usage, contents, text, cached_chars=0):
+        prompt_chars = sum(len(part) for part in contents if isinstance(part, str))
+        images = sum(1 for part in contents if isinstance(part, dict))
+        usage["prompt_tokens"] = prompt_chars // 4 + images * STUB_IMAGE_TOKENS
+        usage["output_tokens"] = len(text) // 4
+        usage["cached_tokens"] = cached_chars // 4
+
+    # --- Responses ---
+    def respond(self, contents, generation_config):
+        """Builds the deterministic answer for an image, shaped by the prompt or response schema."""
+        prompt = next((part for part in contents if isinstance(part, str)), "")
+        image = next((part["data"] for part in contents if isinstance(part, dict)), b"")
+        seed = int.from_bytes(hashlib.sha256(bytes(image)).digest()[:8], "big")
+        pick = random.Random(seed)
+        breed = pick.choice(STUB_BREEDS)
+        health = pick.choice(STUB_HEALTH)
+        confidence = pick.choice(["High", "High", "Medium", "Low"])
+
+        schema = (generation_config or {}).get("response_schema")
+        if not image:
+            return self._translate(prompt, schema)
+        if schema is not None:
+            health_json = self._health_dict(health, confidence)
+            if "health" in schema.get("properties", {}):
+                return json.dumps({
+                    "health": health_json,
+                    "fun_facts": self._fun_facts(breed),
+                    "detailed": self._detailed(breed, confidence),
+                })
+            return json.dumps(health_json)
+        if "STATUS:" in prompt:
+            return f"STATUS: {health[0]}\nOBSERVATION: {STUB_HEALTH_MARKER}{health[1]}\nRECOMMENDATION: {health[2]}"
+        if "Primary Breed Identification" in prompt:
+            return self._detailed(breed, confidence)
+        if "Fun Facts" in prompt:
+            return self._fun_facts(breed)
+        return f"Offline stub response for a {breed[0]} ({breed[1].lower()})."
+
+    @staticmethod
+    def _translate(prompt, schema):
+        """Text-only requests are translations: echoes the text, marked with the target language."""
+        target = re.search(r"into (\w+)", prompt)
+        body = prompt.split("### TEXT", 1)[-1].strip()
+        if schema is not None:
+            return body
+        return f"*[{target.group(1) if target else 'translated'}]*\n\n{body}"
+
+    @staticmethod
+    def _health_dict(health, confidence):
+        return {
+            "status": health[0], "observation": STUB_HEALTH_MARKER + health[1], "recommendation": health[2],
+            "confidence": confidence,
+        }
+
+    @staticmethod
+    def _fun_facts(breed):
+        name, species, category, origin = breed
+        return (
+            f"## 🐮 Breed: {name}\n\n"
+            "### 🎉 Fun Facts:\n"
+            f"1. The {name} is a {species.lower()} breed from {origin}, classed as {category.lower()}.\n"
+            f"2. Farmers value the {name} for its hardiness in local conditions.\n"
+            "3. This answer comes from the offline stub backend, not a real model."
+        )
+
+    @staticmethod
+    def _detailed(breed, confidence):
+        name, species, category, origin = breed
+        return (
+            "## 🧬 Primary Breed Identification\n"
+            f"* **Primary Breed Identification:** {name}\n"
+            f"* **Species:** {species}\n\n"
+            "## 🎯 Confidence Level\n"
+            f"* **Confidence Level:** {confidence}\n\n"
+            "## 📏 Key Physical Characteristics\n"
+            "Coat colour, horn shape and body frame typical of the breed.\n\n"
+            "## 🔄 Alternative Possibilities\n"
+            "None suggested by the stub backend.\n\n"
+            "## 🌍 Breed Category & Origin\n"
+            f"* **Breed Category:** {category}\n"
+            f"* **Geographic Origin:** {origin}\n\n"
+            "## 📝 Reasoning for Identification\n"
+            "Generated offline by the stub backend for testing; no image analysis was performed."
+        )
@@ -0,0 +1,281 @@
+"""Headless batch analysis: walk a folder of photos and stream results to JSONL or CSV.
+
+Run from the repository root:
+
+    python batch_cli.py /data/camera_dump --task health --out triage.jsonl
+    python batch_cli.py /data/camera_dump --task facts --out facts.csv --language Hindi
+    MODEL_PROVIDER=stub python batch_cli.py photos/ --out test.jsonl    # offline
+
+Photos are hashed, quality-checked and preprocessed in a process pool, then
+the prepared images are sent through utils.get_gemini_response on a bounded
+thread pool without being decoded again (so the
+result cache, near-duplicate index, admission control, retries and routing
+all apply). Rows are written as calls finish. The SHA-256 of every finished
+photo is appended to a checkpoint file, and a rerun skips those photos, so
+an interrupted run picks up where it stopped.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import streamlit as st
+from streamlit import logger as st_logger
+
+import utils
+from prompts import COMBINED_ANALYSIS_PROMPT, DETAILED_BREED_PROMPT, FUN_FACTS_PROMPT, HEALTH_ALERT_JSON_PROMPT
+from resilience import ModelError
+from results import CombinedAnalysis, HealthResult
+
+logger = logging.getLogger("batch_cli")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+TASKS = {
+    "health": (HEALTH_ALERT_JSON_PROMPT, HealthResult),
+    "facts": (FUN_FACTS_PROMPT, None),
+    "detailed": (DETAILED_BREED_PROMPT, None),
+    "combined": (COMBINED_ANALYSIS_PROMPT, CombinedAnalysis),
+}
+
+COLUMNS = [
+    "path", "sha256", "outcome", "status", "confidence", "observation", "recommendation",
+    "response", "fun_facts", "detailed", "error", "latency", "attempts", "source", "tier",
+]
+
+
+# --- DISCOVERY & CHECKPOINT ---
+def find_images(root):
+    """Yields image paths under root in a stable order."""
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+def load_checkpoint(path):
+    """Hashes of photos finished by earlier runs."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+# --- DECODE WORKERS (process pool) ---
+_skip = frozenset()
+_prompt = None
+
+
+def _init_decoder(skip, prompt, language):
+    global _skip, _prompt
+    _skip = frozenset(skip)
+    _prompt = prompt
+    st.session_state.language = language
+    # The parent exports the metrics; workers send theirs back with each photo.
+    utils.disable_metrics_export()
+    # A forked worker starts with a copy of the parent's registry, which the parent already counts.
+    utils.get_metrics().drain()
+
+
+def prepare(path):
+    """Hashes, quality-checks and preprocesses one photo in a worker process.
+
+    Returns (path, digest, outcome, payload, check, metrics): outcome is
+    "skip" (already done), "rejected" (payload lists the quality issues),
+    "error" (payload is the message) or "ok" (payload is the
+    utils.PreparedImage to send). check is the (QualityReport, seconds) of
+    the quality check, if one ran, and metrics this photo's drained worker
+    metrics, for the parent to record.
+    """
+    from PIL import Image
+
+    from quality_gate import score_image
+
+    check = None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in _skip:
+            return path, digest, "skip", None, None, utils.get_metrics().drain()
+        started = time.perf_counter()
+        report = score_image(Image.open(io.BytesIO(data)), utils.get_quality_gate().thresholds)
+        check = report, time.perf_counter() - started
+        if not report.passed:
+            return path, digest, "rejected", " ".join(report.issues), check, utils.get_metrics().drain()
+        prepared = utils.prepare_image(Image.open(io.BytesIO(data)), _prompt)
+        return path, digest, "ok", prepared, check, utils.get_metrics().drain()
+    except Exception as e:
+        return path, None, "error", f"Could not read image ({type(e).__name__})", check, utils.get_metrics().drain()
+
+
+# --- MODEL CALLS (thread pool) ---
+def analyze(path, digest, prepared, prompt, result_type):
+    info = {}
+    utils.current_page.set("batch_cli")
+    started = time.perf_counter()
+    try:
+        response = utils.get_gemini_response(prepared, prompt, result_type, info=info)
+    except ModelError as e:
+        row = {"outcome": "error", "error": f"{e.user_message} ({e})", "attempts": e.attempts}
+    else:
+        row = {"outcome": "ok", **flatten(response), "attempts": info.get("attempts", 0)}
+    row.update(
+        path=path, sha256=digest, latency=round(time.perf_counter() - started, 3),
+        source=info.get("source"), tier=info.get("tier"),
+    )
+    return row
+
+
+def flatten(response):
+    """Maps a text or parsed response onto the output columns."""
+    if isinstance(response, CombinedAnalysis):
+        return {**flatten(response.health), "fun_facts": response.fun_facts, "detailed": response.detailed}
+    if isinstance(response, HealthResult):
+        return response.to_dict()
+    return {"response": response}
+
+
+# --- OUTPUT ---
+class RowWriter:
+    """Appends rows to a .jsonl or .csv file and flushes each one, with the checkpoint after it."""
+
+    def __init__(self, path, checkpoint):
+        self.csv = path.lower().endswith(".csv")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._out = open(path, "a", encoding="utf-8", newline="")
+        self._checkpoint = open(checkpoint, "a", encoding="utf-8")
+        if self.csv:
+            self._writer = csv.DictWriter(self._out, fieldnames=COLUMNS, extrasaction="ignore")
+            if new_file:
+                self._writer.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self._writer.writerow(row)
+        else:
+            self._out.write(json.dumps({k: row.get(k) for k in COLUMNS if row.get(k) is not None}) + "\n")
+        self._out.flush()
+        # Errors are not checkpointed, so a rerun tries those photos again.
+        if row.get("sha256") and row["outcome"] != "error":
+            self._checkpoint.write(row["sha256"] + "\n")
+            self._checkpoint.flush()
+
+    def close(self):
+        self._out.close()
+        self._checkpoint.close()
+
+
+# --- PIPELINE ---
+def run(paths, writer, prompt, result_type, decoders, workers, done, language="English"):
+    """Feeds photos through the decode pool and the model pool with a bounded number in flight.
+
+    Returns a dict counting rows by outcome.
+    """
+    counts = {"ok": 0, "rejected": 0, "error": 0, "skip": 0}
+    seen = set(done)
+    paths = iter(paths)
+    decoding, calling = set(), set()
+    max_decoding, max_calling = decoders * 2, workers * 2
+    exhausted = False
+
+    initargs = (done, prompt, language)
+    with ProcessPoolExecutor(max_workers=decoders, initializer=_init_decoder, initargs=initargs) as decode_pool, \
+            ThreadPoolExecutor(max_workers=workers) as call_pool:
+        while True:
+            # Decoding runs ahead of the model only as far as the call window allows.
+            while not exhausted and len(decoding) < max_decoding and len(calling) < max_calling:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                else:
+                    decoding.add(decode_pool.submit(prepare, path))
+            if not decoding and not calling:
+                break
+
+            finished, _ = wait(decoding | calling, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in decoding:
+                    decoding.discard(future)
+                    path, digest, outcome, payload, check, metrics = future.result()
+                    if check is not None:
+                        utils.get_quality_gate().record(*check)
+                    utils.get_metrics().merge(metrics)
+                    if outcome == "skip" or (outcome == "ok" and digest in seen):
+                        counts["skip"] += 1
+                        continue
+                    if outcome == "ok":
+                        seen.add(digest)
+                        calling.add(call_pool.submit(analyze, path, digest, payload, prompt, result_type))
+                        continue
+                    row = {"path": path, "sha256": digest, "outcome": outcome, "error": payload}
+                else:
+                    calling.discard(future)
+                    row = future.result()
+                writer.write(row)
+                counts[row["outcome"]] += 1
+                written = counts["ok"] + counts["rejected"] + counts["error"]
+                if written % 100 == 0:
+                    logger.info("%d written (%s)", written, counts)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", help="directory to scan (recursively) for photos")
+    parser.add_argument("--task", choices=sorted(TASKS), default="health")
+    parser.add_argument("--out", required=True, help="output file; .csv for CSV, anything else for JSONL")
+    parser.add_argument("--checkpoint", help="finished-photo hashes (default: <out>.done)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--provider", choices=utils.MODEL_PROVIDERS, help="defaults to MODEL_PROVIDER")
+    parser.add_argument("--model", help="defaults to GEMINI_MODEL")
+    parser.add_argument("--decoders", type=int, default=os.cpu_count() or 2, help="decode/preprocess processes")
+    parser.add_argument("--workers", type=int, default=utils.BATCH_MAX_WORKERS, help="concurrent model calls")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    # Calls made outside a script run would log "missing ScriptRunContext" for every photo.
+    st_logger.set_log_level("error")
+    # Outside `streamlit run` session state is one process-wide dict that every thread reads.
+    st.session_state.language = args.language
+    if args.provider:
+        st.session_state.model_provider = args.provider
+    if args.model:
+        st.session_state.model_name = args.model
+
+    checkpoint = args.checkpoint or args.out + ".done"
+    if args.restart:
+        for path in (args.out, checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+    done = load_checkpoint(checkpoint)
+    if done:
+        logger.info("Resuming: %d photos already finished", len(done))
+
+    prompt, result_type = TASKS[args.task]
+    writer = RowWriter(args.out, checkpoint)
+    started = time.perf_counter()
+    try:
+        counts = run(
+            find_images(args.folder), writer, prompt, result_type, args.decoders, args.workers, done, args.language
+        )
+    finally:
+        writer.close()
+    logger.info("Finished in %.1fs: %s", time.perf_counter() - started, counts)
+    if utils.METRICS_FILE:
+        with open(utils.METRICS_FILE, "w", encoding="utf-8") as f:
+            f.write(utils.prometheus_text())
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
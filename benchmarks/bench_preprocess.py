@@ -0,0 +1,88 @@
+"""Benchmarks utils.preprocess_image: payload size and time per setting.
+
+Run from the repository root:
+
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --image cow.jpg --live
+
+With --live (and GEMINI_API_KEY set) every variant is also sent to the
+model so payload size can be compared with end-to-end response time.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import utils
+from prompts import HEALTH_ALERT_PROMPT
+
+EDGES = [512, 768, 1024, 1536, 2048]
+QUALITIES = [70, 85]
+
+
+def synthetic_photo(width=4000, height=3000):
+    """Builds a 12-MP JPEG with enough texture to resemble a real photo."""
+    noise = Image.effect_noise((width, height), 48).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    Image.blend(noise, gradient, 0.5).save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def time_model_call(prepared):
+    """Sends one prepared payload to the model and returns elapsed seconds."""
+    import google.generativeai as genai
+
+    model = genai.GenerativeModel(utils.DEFAULT_MODEL_NAME)
+    model._client = utils.get_model_client(os.environ["GEMINI_API_KEY"])
+    started = time.perf_counter()
+    model.generate_content(
+        [HEALTH_ALERT_PROMPT, {"mime_type": prepared.mime_type, "data": prepared.data}]
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", help="photo to benchmark (defaults to a synthetic 12-MP JPEG)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="also time a real model call per variant")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            source = f.read()
+    else:
+        source = synthetic_photo()
+
+    print(f"source: {len(source):,} bytes")
+    header = f"{'max_edge':>8} {'quality':>7} {'size':>12} {'payload':>10} {'saved':>6} {'prep ms':>8}"
+    if args.live:
+        header += f" {'model s':>8}"
+    print(header)
+
+    for edge in EDGES:
+        for quality in QUALITIES:
+            timings = []
+            for _ in range(args.repeat):
+                image = Image.open(io.BytesIO(source))
+                started = time.perf_counter()
+                prepared = utils.preprocess_image(image, max_edge=edge, quality=quality)
+                timings.append(time.perf_counter() - started)
+            saved = 1 - len(prepared.data) / len(source)
+            row = (
+                f"{edge:>8} {quality:>7} {prepared.width:>5}x{prepared.height:<6} "
+                f"{len(prepared.data):>10,} {saved:>6.0%} {min(timings) * 1000:>8.1f}"
+            )
+            if args.live:
+                row += f" {time_model_call(prepared):>8.2f}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
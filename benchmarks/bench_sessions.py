@@ -0,0 +1,409 @@
+"""Multi-session load test: concurrent AppTest sessions against the offline stub model.
+
+Run from the repository root:
+
+    python benchmarks/bench_sessions.py                         # 4 sessions, report
+    python benchmarks/bench_sessions.py --sessions 16 --latency 2
+    python benchmarks/bench_sessions.py --mode processes        # one interpreter per session
+    python benchmarks/bench_sessions.py --check                 # exit 1 on regression, 2 if not comparable
+    python benchmarks/bench_sessions.py --update                # record a new baseline
+
+A session drives app.py with AppTest: it opens Home, navigates through
+every page with the sidebar radio, and on each analysis page uploads a
+photo of its own, clicks the analyze button and reruns until the
+background job's result is rendered.
+
+By default (--mode threads) every session is a thread of one process, as
+under `streamlit run`, so they contend for the same admission queue,
+caches, job pool, upload store and history database; RSS per session is
+(peak - baseline after imports) / sessions. With --mode processes every
+session is its own interpreter with its own copies of all of those, which
+isolates per-session peak RSS but measures no contention. Each mode has
+its own baseline file.
+
+The model is utils.get_stub_backend() with the given latency, paced by the
+app's admission quota (GEMINI_REQUESTS_PER_MINUTE unless --rpm is given);
+nothing leaves the machine, and history/caches live in a temporary
+directory so earlier runs cannot answer for this one.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATHS = {
+    "threads": os.path.join(ROOT, "benchmarks", "sessions_threads_baseline.json"),
+    "processes": os.path.join(ROOT, "benchmarks", "sessions_baseline.json"),
+}
+
+# (page, uploader key, button label) for the pages that call the model.
+ANALYSIS_PAGES = [
+    ("Health Triage", "health_up", "Run Diagnostics"),
+    ("Breed & Facts", "fun_up", "Discover Facts"),
+    ("Detailed Info", "detail_up", "Generate Expert Report"),
+]
+OTHER_PAGES = ["History", "Settings", "Home"]
+
+POLL_SECONDS = 0.05
+RESULT_TIMEOUT = 120
+
+# Metrics compared by --check; higher is worse for all of them.
+CHECKED = ["rerun_p95_ms", "e2e_p95_ms", "peak_rss_mb", "model_calls_per_analysis"]
+
+
+# --- SESSION WORKER ---
+def session_photo(index, page_number):
+    """A distinct, sharp, well-exposed 1024x768 JPEG per session and page."""
+    from PIL import Image, ImageDraw
+
+    noise = Image.effect_noise((1024, 768), 40 + index % 7).convert("RGB")
+    draw = ImageDraw.Draw(noise)
+    for step in range(6):
+        offset = (index * 37 + page_number * 91 + step * 53) % 600
+        draw.rectangle([offset, 100 + step * 90, offset + 300, 160 + step * 90], fill=(60 * step % 255, 140, 90))
+    buffer = io.BytesIO()
+    noise.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def session_value(app, name, default):
+    return app.session_state[name] if name in app.session_state else default
+
+
+def timed_run(app, actions, kind):
+    started = time.perf_counter()
+    app.run()
+    elapsed = (time.perf_counter() - started) * 1000
+    actions.append({"kind": kind, "ms": elapsed})
+    if app.exception:
+        raise RuntimeError(f"{kind}: {app.exception[0].value}")
+    return elapsed
+
+
+def run_session(index, count_calls=True):
+    """Runs one scripted session and returns its measurements as a dict.
+
+    With count_calls=False (sessions sharing one stub) model calls are not attributed per action.
+    """
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    import utils
+
+    stub = utils.get_stub_backend()
+    startup_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    actions, analyses, calls = [], [], {}
+
+    def count(kind, before):
+        if count_calls:
+            calls[kind] = calls.get(kind, 0) + stub.calls - before
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=RESULT_TIMEOUT)
+    before = stub.calls
+    timed_run(app, actions, "open")
+    count("open", before)
+
+    for page_number, (page, uploader, button) in enumerate(ANALYSIS_PAGES):
+        before = stub.calls
+        app.sidebar.radio(key="navigation").set_value(page)
+        timed_run(app, actions, "navigate")
+        count("navigate", before)
+
+        before = stub.calls
+        app.file_uploader(key=uploader).set_value(
+            (f"session{index}_{page_number}.jpg", session_photo(index, page_number), "image/jpeg")
+        )
+        timed_run(app, actions, "upload")
+        count("upload", before)
+
+        before = stub.calls
+        started = time.perf_counter()
+        next(b for b in app.button if b.label == button).click()
+        timed_run(app, actions, "analyze")
+        # The job runs in the background; each poll is a rerun, as the page's progress fragment would do.
+        while page in session_value(app, "page_jobs", {}):
+            if time.perf_counter() - started > RESULT_TIMEOUT:
+                raise RuntimeError(f"{page}: no result after {RESULT_TIMEOUT}s")
+            time.sleep(POLL_SECONDS)
+            timed_run(app, actions, "poll")
+        failed = page in session_value(app, "page_job_errors", {})
+        analyses.append({"page": page, "ms": (time.perf_counter() - started) * 1000, "failed": failed})
+        count("analyze", before)
+
+    for page in OTHER_PAGES:
+        before = stub.calls
+        app.sidebar.radio(key="navigation").set_value(page)
+        timed_run(app, actions, "navigate")
+        count("navigate", before)
+
+    return {
+        "session": index,
+        "actions": actions,
+        "analyses": analyses,
+        "model_calls": calls,
+        "startup_rss_mb": startup_rss / 1024,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+# --- DRIVER ---
+def session_env(args, workdir, index=0):
+    """Environment for the app under test: the offline stub and a history database in workdir."""
+    env = dict(
+        os.environ,
+        MODEL_PROVIDER="stub",
+        STUB_LATENCY_SECONDS=str(args.latency),
+        STUB_LATENCY_JITTER=str(args.jitter),
+        STUB_ERROR_RATE=str(args.error_rate),
+        STUB_SEED=str(index),
+        HISTORY_DB_PATH=os.path.join(workdir, f"history{index}.sqlite3"),
+    )
+    if args.rpm is not None:
+        env["GEMINI_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    for name in ("RESULT_CACHE_DIR", "PHASH_INDEX_PATH", "METRICS_PORT", "METRICS_FILE"):
+        env.pop(name, None)
+    return env
+
+
+def share_apptest_runtime():
+    """Lets AppTest instances run concurrently in threads of this process.
+
+    AppTest.run installs a fresh mock Runtime and patches config.get_option for
+    the length of every run; both are process globals, so concurrent runs tear
+    down each other's. It also compiles app.py into a new script cache per run,
+    and CPython 3.11's ast.parse can fail while another thread compiles code.
+    Install one runtime, one script cache (compiled here, before any session
+    starts) and the override for the whole process instead, as `streamlit run`
+    does for all of its sessions.
+
+    These are private Streamlit internals: if a Streamlit upgrade moves any of
+    them, this raises instead of letting the sessions tear each other down.
+    """
+    import contextlib
+    from unittest.mock import MagicMock
+
+    import streamlit
+
+    try:
+        from streamlit import config
+        from streamlit.components.v2.component_manager import BidiComponentManager
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+        from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+        from streamlit.runtime.media_file_manager import MediaFileManager
+        from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+        from streamlit.testing.v1 import app_test, local_script_runner
+        from streamlit.testing.v1.util import build_mock_config_get_option
+    except ImportError as e:
+        raise RuntimeError(
+            f"Streamlit {streamlit.__version__} lacks an internal the threaded load test relies on ({e}); "
+            "use --mode processes or update share_apptest_runtime()."
+        ) from e
+    patched = {
+        "Runtime._instance": (Runtime, "_instance"),
+        "config.get_option": (config, "get_option"),
+        "app_test.Runtime": (app_test, "Runtime"),
+        "app_test.patch_config_options": (app_test, "patch_config_options"),
+        "local_script_runner.ScriptCache": (local_script_runner, "ScriptCache"),
+    }
+    missing = [label for label, (owner, name) in patched.items() if not hasattr(owner, name)]
+    if missing:
+        raise RuntimeError(
+            f"Streamlit {streamlit.__version__} no longer has {', '.join(missing)}, which the threaded load test "
+            "patches; use --mode processes or update share_apptest_runtime()."
+        )
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime._instance = runtime
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    # AppTest's own per-run assignments now go to a stand-in class and a no-op patch.
+    app_test.Runtime = type("PerRunRuntime", (), {"_instance": None})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(os.path.join(ROOT, "app.py"))
+    local_script_runner.ScriptCache = lambda: script_cache
+
+
+def run_threaded(args, workdir):
+    """Runs every session as a thread of this process; returns (sessions, model calls by action)."""
+    os.environ.clear()
+    os.environ.update(session_env(args, workdir))
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest  # noqa: F401 -- imported before the RSS baseline
+
+    import utils
+
+    share_apptest_runtime()
+    stub = utils.get_stub_backend()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    before = stub.calls
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        sessions = list(pool.map(lambda i: run_session(i, count_calls=False), range(args.sessions)))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for session in sessions:
+        session["startup_rss_mb"] = baseline / 1024
+        session["peak_rss_mb"] = (peak - baseline) / 1024 / args.sessions
+    # One stub serves every session, so its calls cannot be split by action; none are expected outside analyze.
+    return sessions, {"analyze": stub.calls - before}
+
+
+def spawn_session(index, args, workdir):
+    env = session_env(args, workdir, index)
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", str(index)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"session {index} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(sessions, calls=None):
+    actions = [a for s in sessions for a in s["actions"]]
+    reruns = [a["ms"] for a in actions if a["kind"] != "poll"]
+    analyses = [a for s in sessions for a in s["analyses"]]
+    e2e = [a["ms"] for a in analyses if not a["failed"]]
+    if calls is None:
+        calls = {}
+        for s in sessions:
+            for kind, count in s["model_calls"].items():
+                calls[kind] = calls.get(kind, 0) + count
+    user_actions = {kind: sum(1 for a in actions if a["kind"] == kind) for kind in calls}
+    return {
+        "sessions": len(sessions),
+        "rerun_p50_ms": round(percentile(reruns, 50), 1),
+        "rerun_p95_ms": round(percentile(reruns, 95), 1),
+        "rerun_by_action_p50_ms": {
+            kind: round(statistics.median(a["ms"] for a in actions if a["kind"] == kind), 1)
+            for kind in ("open", "navigate", "upload", "analyze", "poll")
+            if any(a["kind"] == kind for a in actions)
+        },
+        "e2e_p50_ms": round(percentile(e2e, 50), 1) if e2e else None,
+        "e2e_p95_ms": round(percentile(e2e, 95), 1) if e2e else None,
+        "e2e_p99_ms": round(percentile(e2e, 99), 1) if e2e else None,
+        "failed_analyses": sum(1 for a in analyses if a["failed"]),
+        "startup_rss_mb": round(statistics.median(s["startup_rss_mb"] for s in sessions), 1),
+        "peak_rss_mb": round(statistics.median(s["peak_rss_mb"] for s in sessions), 1),
+        "peak_rss_max_mb": round(max(s["peak_rss_mb"] for s in sessions), 1),
+        "model_calls_per_action": {
+            kind: round(calls[kind] / user_actions[kind], 2) for kind in calls if user_actions[kind]
+        },
+        "model_calls_per_analysis": round(calls.get("analyze", 0) / max(1, len(analyses)), 2),
+    }
+
+
+# Settings a baseline's numbers depend on; older baselines do not record those with a default here.
+RUN_DEFAULTS = {"error_rate": 0.0}
+
+
+def run_settings(args):
+    return {"latency": args.latency, "jitter": args.jitter, "rpm": args.rpm, "error_rate": args.error_rate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions")
+    parser.add_argument("--mode", choices=sorted(BASELINE_PATHS), default="threads",
+                        help="sessions as threads of one process (shared state) or one process each")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="stub latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls that fail")
+    parser.add_argument("--rpm", type=float, help="admission quota per minute (default: the app's own)")
+    parser.add_argument("--check", action="store_true", help="fail if a metric regressed past the baseline")
+    parser.add_argument("--update", action="store_true", help="write the measured numbers as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_session(args.worker)))
+        return 0
+
+    baseline_path = BASELINE_PATHS[args.mode]
+    if args.check:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Per-session RSS and latency depend on how many sessions share the process and the queue.
+        settings = {"sessions": args.sessions, **run_settings(args)}
+        differing = [f"{name} {baseline.get(name, RUN_DEFAULTS.get(name))} (now {value})"
+                     for name, value in settings.items() if baseline.get(name, RUN_DEFAULTS.get(name)) != value]
+        if differing:
+            print(f"Cannot compare: the baseline was recorded with {', '.join(differing)}. "
+                  "Rerun with the baseline's settings, or record a new baseline with --update.")
+            return 2
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        if args.mode == "threads":
+            sessions, calls = run_threaded(args, workdir)
+        else:
+            with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+                sessions = list(pool.map(lambda i: spawn_session(i, args, workdir), range(args.sessions)))
+            calls = None
+        wall = time.perf_counter() - started
+    result = summarize(sessions, calls)
+    quota = f"{args.rpm:g} rpm" if args.rpm is not None else "the app's quota"
+
+    print(f"{result['sessions']} concurrent sessions as {args.mode}, stub latency {args.latency}s ± {args.jitter}s, "
+          f"{quota} ({wall:.1f}s wall)")
+    print(f"  script rerun: p50 {result['rerun_p50_ms']:.0f} ms · p95 {result['rerun_p95_ms']:.0f} ms")
+    for kind, ms in result["rerun_by_action_p50_ms"].items():
+        print(f"    {kind:<9} p50 {ms:.0f} ms")
+    if result["e2e_p50_ms"] is not None:
+        print(f"  click to result: p50 {result['e2e_p50_ms']:.0f} ms · p95 {result['e2e_p95_ms']:.0f} ms · "
+              f"p99 {result['e2e_p99_ms']:.0f} ms ({result['failed_analyses']} failed)")
+    if args.mode == "threads":
+        print(f"  RSS per session: {result['peak_rss_mb']:.1f} MB over {result['startup_rss_mb']:.0f} MB after imports")
+    else:
+        print(f"  peak RSS per session: median {result['peak_rss_mb']:.0f} MB · "
+              f"max {result['peak_rss_max_mb']:.0f} MB (after imports {result['startup_rss_mb']:.0f} MB)")
+    print("  model calls per action: " + ", ".join(
+        f"{kind} {count}" for kind, count in result["model_calls_per_action"].items()
+    ))
+
+    if args.update:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({**result, **run_settings(args)}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {os.path.relpath(baseline_path, ROOT)}")
+        return 0
+
+    if args.check:
+        regressions = []
+        for key in CHECKED:
+            if result[key] is None or baseline.get(key) is None:
+                continue
+            limit = baseline[key] * (1 + args.tolerance)
+            if result[key] > limit:
+                regressions.append(f"{key}: {result[key]} > {limit:.1f} allowed")
+        if result["failed_analyses"] > baseline.get("failed_analyses", 0):
+            regressions.append(f"failed_analyses: {result['failed_analyses']} > {baseline['failed_analyses']}")
+        if regressions:
+            print("REGRESSION: " + "; ".join(regressions))
+            return 1
+        print(f"OK: within {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
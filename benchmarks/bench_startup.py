@@ -0,0 +1,119 @@
+"""Cold-start benchmark: import-time profile and time to first paint of the Home page.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py              # report
+    python benchmarks/bench_startup.py --check      # exit 1 if slower than the baseline
+    python benchmarks/bench_startup.py --update     # record a new baseline
+
+Each sample starts a fresh interpreter and renders app.py once with AppTest,
+which is what the first request after a restart or scale-out pays. The
+import profile comes from `python -X importtime` for the modules the Home
+route loads.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+# Modules that are only needed once a model page is opened.
+HEAVY_MODULES = ["google.generativeai", "PIL.Image", "numpy"]
+
+FIRST_PAINT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=60)
+app.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "script_ms": elapsed * 1000,
+    "exceptions": len(app.exception),
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def first_paint_sample():
+    """Milliseconds from process spawn until the Home page has rendered once."""
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_PAINT_SCRIPT, os.path.join(ROOT, "app.py"), *HEAVY_MODULES],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    sample = json.loads(output.strip().splitlines()[-1])
+    sample["wall_ms"] = (time.perf_counter() - started) * 1000
+    return sample
+
+
+def import_profile(modules, top):
+    """Top modules by cumulative import time (microseconds), from -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--check", action="store_true", help="fail if first paint regressed past the baseline")
+    parser.add_argument("--update", action="store_true", help="write the measured numbers as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline")
+    args = parser.parse_args()
+
+    print("Import profile for the Home route (cumulative ms, self ms, module):")
+    for cumulative_us, self_us, name in import_profile(["utils", "home_page"], args.top):
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    samples = [first_paint_sample() for _ in range(args.runs)]
+    result = {
+        "first_paint_ms": round(statistics.median(s["wall_ms"] for s in samples), 1),
+        "script_ms": round(statistics.median(s["script_ms"] for s in samples), 1),
+        "heavy_modules_loaded": samples[-1]["loaded"],
+    }
+    if any(s["exceptions"] for s in samples):
+        print("Home page raised during the first run.")
+        return 1
+    print(f"Cold start to first paint (median of {args.runs}): {result['first_paint_ms']:.0f} ms")
+    print(f"  of which app script and imports: {result['script_ms']:.0f} ms")
+    print(f"  heavy modules loaded by Home: {', '.join(result['heavy_modules_loaded']) or 'none'}")
+
+    if args.update:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {os.path.relpath(BASELINE_PATH, ROOT)}")
+        return 0
+
+    if args.check:
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        limit = baseline["first_paint_ms"] * (1 + args.tolerance)
+        if result["first_paint_ms"] > limit:
+            print(f"REGRESSION: {result['first_paint_ms']:.0f} ms > {limit:.0f} ms allowed")
+            return 1
+        if set(result["heavy_modules_loaded"]) - set(baseline["heavy_modules_loaded"]):
+            print("REGRESSION: Home now imports modules that were previously deferred")
+            return 1
+        print(f"OK: within {args.tolerance:.0%} of the {baseline['first_paint_ms']:.0f} ms baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
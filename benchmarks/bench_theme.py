@@ -0,0 +1,85 @@
+"""Before/after measurement of the theme stylesheet cost per rerun.
+
+Run from the repository root:
+
+    python benchmarks/bench_theme.py
+
+"Before" re-renders the unminified stylesheet on every rerun, as apply_theme
+used to; "after" uses the memoized, minified utils.theme_stylesheet.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.runtime.forward_msg_cache import create_reference_msg, populate_hash_if_needed
+from streamlit.testing.v1 import AppTest
+
+import utils
+
+
+def legacy_stylesheet(theme):
+    return utils._render_stylesheet(utils.THEME_PALETTES[theme])
+
+
+def markdown_msg_size(body):
+    """Returns (full message bytes, hash-reference message bytes) for a markdown element."""
+    msg = ForwardMsg()
+    msg.delta.new_element.markdown.body = body
+    msg.delta.new_element.markdown.allow_html = True
+    full = len(msg.SerializeToString())
+    populate_hash_if_needed(msg)
+    return full, len(create_reference_msg(msg).SerializeToString())
+
+
+def time_reruns(runs):
+    """Median wall time of a Home page rerun, in milliseconds."""
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    app.run()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        app.run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    memoized = utils.theme_stylesheet
+    for theme in ("light", "dark"):
+        started = time.perf_counter()
+        for _ in range(1000):
+            legacy_stylesheet(theme)
+        before_us = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for _ in range(1000):
+            memoized(theme)
+        after_us = (time.perf_counter() - started) * 1000
+
+        before_bytes, _ = markdown_msg_size(legacy_stylesheet(theme))
+        after_bytes, ref_bytes = markdown_msg_size(memoized(theme))
+        print(f"[{theme}] build: {before_us:.2f} us -> {after_us:.2f} us per rerun")
+        print(
+            f"[{theme}] websocket: {before_bytes} B every rerun -> "
+            f"{after_bytes} B once, then {ref_bytes} B per rerun (hash reference)"
+        )
+
+    utils.theme_stylesheet = legacy_stylesheet
+    before_ms = time_reruns(args.runs)
+    utils.theme_stylesheet = memoized
+    after_ms = time_reruns(args.runs)
+    print(f"Home page rerun (AppTest, median): {before_ms:.2f} ms -> {after_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,71 @@
 import streamlit as st
-from PIL import Image
-from utils import get_gemini_response
+from utils import (
+    PageJob, get_stored_analysis, run_combined_analysis, show_reuse_notice, get_page_result, save_page_result,
+    media_input, show_last_upload_notice, start_page_job, get_page_job, job_progress, show_job_error,
+    check_upload_quality, show_quality_feedback, open_upload, show_upload,
+)
 from prompts import DETAILED_BREED_PROMPT
 
+PAGE = "Detailed Info"
+
 def show():
     st.title("🧬 Detailed Evaluation")
     st.markdown("Expert-level breed and physical conformation analysis.")
-    
+    report_card()
+
+@st.fragment
+def report_card():
+    # A fragment: uploading or clicking here reruns this card only, not the whole app.
     st.markdown('<div class="ui-card">', unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("Upload Image", type=['jpg', 'png'], key="detail_up")
-    
+    uploaded_file = media_input(PAGE, "detail_up", ['jpg', 'png'])
+
+    show_job_error(PAGE)
+
+    response = None
     if uploaded_file:
-        image = Image.open(uploaded_file)
-        st.image(image, use_column_width=True)
-        
-        if st.button("Generate Expert Report"):
-            with st.spinner("Consulting breed standards..."):
-                response = get_gemini_response(image, DETAILED_BREED_PROMPT)
-                
+        image = open_upload(uploaded_file)
+        show_upload(uploaded_file)
+        report = check_upload_quality(uploaded_file)
+
+        saved = get_page_result(PAGE, uploaded_file)
+        if saved is not None:
+            response = saved.response
+            st.markdown("---")
+            st.markdown(response)
+            show_reuse_notice(saved.info)
+
+        elif get_page_job(PAGE, uploaded_file) is not None:
+            job_progress(PAGE)
+
+        elif not report.passed:
+            show_quality_feedback(report)
+
+        elif st.session_state.get('combined_analysis'):
+            analysis = get_stored_analysis(uploaded_file)
+            if analysis is not None:
+                response = analysis.detailed
+                st.markdown("---")
+                st.markdown(response)
+                save_page_result(PAGE, uploaded_file, response)
+            elif st.button("Generate Expert Report"):
+                run_combined_analysis(PAGE, uploaded_file, image, "detailed")
+
+        elif st.button("Generate Expert Report"):
+            # Runs as a background job; the report fills in while it streams.
+            start_page_job(PAGE, uploaded_file, image, DETAILED_BREED_PROMPT, stream=True)
+
+    else:
+        last = get_page_result(PAGE) or get_page_job(PAGE)
+        if last is not None:
+            show_last_upload_notice(last)
+            if isinstance(last, PageJob):
+                job_progress(PAGE)
+            else:
+                response = last.response
                 st.markdown("---")
                 st.markdown(response)
-                
-                st.download_button("Download Report (TXT)", response, file_name="breed_analysis.txt")
+
+    if response:
+        # The report is already on screen; downloading it needs no rerun.
+        st.download_button("Download Report (TXT)", response, file_name="breed_analysis.txt", on_click="ignore")
     st.markdown('</div>', unsafe_allow_html=True)
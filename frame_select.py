@@ -0,0 +1,130 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from quality_gate import ANALYSIS_EDGE, laplacian_variance
+
+
+# --- FRAME SCORING ---
+COVERAGE_GRID = 8
+
+
+def subject_coverage(pixels, grid=COVERAGE_GRID):
+    """Share of grid cells with real texture: a rough measure of how much of the frame the animal fills.
+
+    Cells are compared with the most textured cell, so flat sky, floor or
+    motion-blurred background count as empty regardless of overall contrast.
+    """
+    height, width = pixels.shape
+    cell_h, cell_w = height // grid, width // grid
+    if cell_h < 3 or cell_w < 3:
+        return 0.0
+    cells = pixels[:cell_h * grid, :cell_w * grid].reshape(grid, cell_h, grid, cell_w)
+    spread = cells.std(axis=(1, 3))
+    peak = spread.max()
+    if peak <= 0:
+        return 0.0
+    return float((spread >= 0.35 * peak).mean())
+
+
+def frame_score(pixels):
+    """Ranks a grayscale frame (float32 array) by sharpness weighted with subject coverage."""
+    return laplacian_variance(pixels) * (0.25 + subject_coverage(pixels))
+
+
+# --- BEST-FRAME SELECTION ---
+class BestFrames:
+    """Keeps the top `keep` frames seen so far, at least `min_gap` seconds apart.
+
+    Only the kept frames are held at full resolution, so memory stays bounded
+    by `keep` however many frames are offered.
+    """
+
+    def __init__(self, keep=2, min_gap=1.0):
+        self.keep = keep
+        self.min_gap = min_gap
+        self.offered = 0
+        self._frames = []
+
+    def wants(self, score, timestamp):
+        """True if a frame with this score and timestamp would be kept (decode it only then)."""
+        self.offered += 1
+        near = [f for f in self._frames if abs(f[1] - timestamp) < self.min_gap]
+        if near:
+            return score > max(f[0] for f in near)
+        return len(self._frames) < self.keep or score > self._frames[-1][0]
+
+    def add(self, score, timestamp, image):
+        self._frames = [f for f in self._frames if abs(f[1] - timestamp) >= self.min_gap]
+        self._frames.append((score, timestamp, image))
+        self._frames.sort(key=lambda f: f[0], reverse=True)
+        del self._frames[self.keep:]
+
+    def images(self, min_ratio=0.5):
+        """Kept frames in clip order, leaving out any scoring under min_ratio of the best one."""
+        if not self._frames:
+            return []
+        floor = self._frames[0][0] * min_ratio
+        return [image for score, _, image in sorted(self._frames, key=lambda f: f[1]) if score >= floor]
+
+
+def _scaled_size(width, height, max_edge):
+    scale = min(1.0, max_edge / max(width, height))
+    # Even dimensions keep the frame scaler happy for chroma-subsampled video.
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def select_video_frames(data, keep=2, sample_fps=3.0, max_seconds=60.0):
+    """Decodes a clip frame by frame and returns its `keep` best frames as PIL images.
+
+    Frames are sampled at `sample_fps` and scored on a small grayscale copy;
+    only frames that enter the top set are converted to full RGB. Decoding
+    stops after `max_seconds` of footage.
+    """
+    import av
+
+    best = BestFrames(keep=keep, min_gap=1.0 / sample_fps)
+    with av.open(io.BytesIO(data)) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        next_sample = 0.0
+        for frame in container.decode(stream):
+            timestamp = float(frame.time) if frame.time is not None else next_sample
+            if timestamp > max_seconds:
+                break
+            if timestamp < next_sample:
+                continue
+            next_sample = timestamp + 1.0 / sample_fps
+
+            width, height = _scaled_size(frame.width, frame.height, ANALYSIS_EDGE)
+            pixels = frame.to_ndarray(width=width, height=height, format="gray").astype(np.float32)
+            score = frame_score(pixels)
+            if best.wants(score, timestamp):
+                best.add(score, timestamp, _upright(frame.to_image(), frame))
+    return best.images()
+
+
+def _upright(image, frame):
+    """Applies the clip's display rotation (phones record portrait video sideways)."""
+    rotation = getattr(frame, "rotation", 0) or 0
+    return image.rotate(rotation, expand=True) if rotation % 360 else image
+
+
+def compose_frames(images, gap=8):
+    """Places frames side by side on one canvas so they go to the model as a single image."""
+    if len(images) == 1:
+        return images[0]
+    height = min(image.height for image in images)
+    resized = [
+        image if image.height == height else image.resize(
+            (round(image.width * height / image.height), height), Image.Resampling.BILINEAR
+        )
+        for image in images
+    ]
+    canvas = Image.new("RGB", (sum(image.width for image in resized) + gap * (len(resized) - 1), height), "white")
+    x = 0
+    for image in resized:
+        canvas.paste(image, (x, 0))
+        x += image.width + gap
+    return canvas
@@ -1,22 +1,62 @@
 import streamlit as st
-from PIL import Image
-from utils import get_gemini_response
+from utils import (
+    PageJob, get_stored_analysis, run_combined_analysis, show_reuse_notice, get_page_result, save_page_result,
+    media_input, show_last_upload_notice, start_page_job, get_page_job, job_progress, show_job_error,
+    job_just_finished, check_upload_quality, show_quality_feedback, open_upload, show_upload,
+)
 from prompts import FUN_FACTS_PROMPT
 
+PAGE = "Breed & Facts"
+
 def show():
     st.title("🎉 Breed & Trivia")
     st.markdown("Identify the animal and learn fun facts!")
-    
+    facts_card()
+
+@st.fragment
+def facts_card():
+    # A fragment: uploading or clicking here reruns this card only, not the whole app.
     st.markdown('<div class="ui-card">', unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("Upload Image", type=['jpg', 'png'], key="fun_up")
-    
+    uploaded_file = media_input(PAGE, "fun_up", ['jpg', 'png'])
+
+    show_job_error(PAGE)
+    if job_just_finished(PAGE):
+        st.balloons()
+
     if uploaded_file:
-        image = Image.open(uploaded_file)
-        st.image(image, use_column_width=True)
-        
-        if st.button("Discover Facts"):
-            with st.spinner("Finding cool facts..."):
-                response = get_gemini_response(image, FUN_FACTS_PROMPT)
-                st.markdown(response)
-                st.balloons()
+        image = open_upload(uploaded_file)
+        show_upload(uploaded_file)
+        report = check_upload_quality(uploaded_file)
+
+        saved = get_page_result(PAGE, uploaded_file)
+        if saved is not None:
+            st.markdown(saved.response)
+            show_reuse_notice(saved.info)
+
+        elif get_page_job(PAGE, uploaded_file) is not None:
+            job_progress(PAGE)
+
+        elif not report.passed:
+            show_quality_feedback(report)
+
+        elif st.session_state.get('combined_analysis'):
+            analysis = get_stored_analysis(uploaded_file)
+            if analysis is not None:
+                st.markdown(analysis.fun_facts)
+                save_page_result(PAGE, uploaded_file, analysis.fun_facts)
+            elif st.button("Discover Facts"):
+                run_combined_analysis(PAGE, uploaded_file, image, "fun_facts")
+
+        elif st.button("Discover Facts"):
+            # Runs as a background job; partial text appears while it streams.
+            start_page_job(PAGE, uploaded_file, image, FUN_FACTS_PROMPT, stream=True)
+
+    else:
+        last = get_page_result(PAGE) or get_page_job(PAGE)
+        if last is not None:
+            show_last_upload_notice(last)
+            if isinstance(last, PageJob):
+                job_progress(PAGE)
+            else:
+                st.markdown(last.response)
     st.markdown('</div>', unsafe_allow_html=True)
@@ -1,37 +1,192 @@
+import html
+
 import streamlit as st
-from PIL import Image
-from utils import get_gemini_response
-from prompts import HEALTH_ALERT_PROMPT
+from utils import (
+    PageJob, analyze_batch, get_stored_analysis, run_combined_analysis, show_reuse_notice, get_page_result,
+    save_page_result, media_input, show_last_upload_notice, start_page_job, get_page_job, job_progress,
+    show_job_error, check_upload_quality, show_quality_feedback, VIDEO_TYPES, clip_to_upload, is_video,
+    open_upload, show_upload, reuse_label,
+)
+from prompts import HEALTH_ALERT_JSON_PROMPT
+from resilience import ImageRejectedError
+from results import HealthResult, HealthStatus
+
+PAGE = "Health Triage"
+
+# Errors sort after every real status in the herd table
+ERROR_RANK = len(HealthStatus)
 
 def show():
     st.title("🩺 Health Triage")
     st.markdown("Upload a clear photo to scan for visible signs of **LSD, FMD, or Trauma**.")
-    
+
+    mode = st.radio("Mode", ["Single Animal", "Herd Batch"], horizontal=True, key="health_mode")
+
     st.markdown('<div class="ui-card">', unsafe_allow_html=True)
-    uploaded_file = st.file_uploader("Upload Image", type=['jpg', 'png', 'jpeg'], key="health_up")
-    
+    if mode == "Herd Batch":
+        show_batch()
+    else:
+        show_single()
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_assessment(result):
+    """Renders a HealthResult as an alert or stable card."""
+    body = (
+        f"<b>Observation:</b> {html.escape(result.observation)}<br>"
+        f"<b>Recommendation:</b> {html.escape(result.recommendation)}<br>"
+        f"<b>Confidence:</b> {result.confidence.name.title()}"
+    )
+    if result.status in (HealthStatus.CRITICAL, HealthStatus.WARNING):
+        st.markdown(f"""
+        <div class="alert-box alert-danger">
+            <h3>⚠️ Medical Alert: {result.status.name}</h3>
+            <div>{body}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="alert-box alert-safe">
+            <h3>✅ Assessment: Stable</h3>
+            <div>{body}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.fragment
+def show_single():
+    # A fragment: uploading or clicking here reruns this card only, not the whole app.
+    uploaded_file = media_input(PAGE, "health_up", ['jpg', 'png', 'jpeg'])
+
+    show_job_error(PAGE)
+
     if uploaded_file:
-        image = Image.open(uploaded_file)
-        st.image(image, use_column_width=True, caption="Uploaded Specimen")
-        
-        if st.button("Run Diagnostics"):
-            with st.spinner("Analyzing clinical signs..."):
-                response = get_gemini_response(image, HEALTH_ALERT_PROMPT)
-                
-                if "CRITICAL" in response or "WARNING" in response:
-                    st.markdown(f"""
-                    <div class="alert-box alert-danger">
-                        <h3>⚠️ Medical Alert</h3>
-                        <div style="white-space: pre-wrap;">{response}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                elif "HEALTHY" in response:
-                    st.markdown(f"""
-                    <div class="alert-box alert-safe">
-                        <h3>✅ Assessment: Stable</h3>
-                        <div style="white-space: pre-wrap;">{response}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+        image = open_upload(uploaded_file)
+        show_upload(uploaded_file, caption="Uploaded Specimen")
+        report = check_upload_quality(uploaded_file)
+
+        saved = get_page_result(PAGE, uploaded_file)
+        if saved is not None:
+            render_assessment(saved.response)
+            show_reuse_notice(saved.info)
+
+        elif get_page_job(PAGE, uploaded_file) is not None:
+            job_progress(PAGE)
+
+        elif not report.passed:
+            # Rejected locally: unusable photos never cost a model call.
+            show_quality_feedback(report)
+
+        elif st.session_state.get('combined_analysis'):
+            # Another page may already have analyzed this photo in combined mode.
+            analysis = get_stored_analysis(uploaded_file)
+            if analysis is not None:
+                render_assessment(analysis.health)
+                save_page_result(PAGE, uploaded_file, analysis.health)
+            elif st.button("Run Diagnostics"):
+                run_combined_analysis(PAGE, uploaded_file, image, "health")
+
+        elif st.button("Run Diagnostics"):
+            # The structured answer is short; it is rendered once parsed.
+            start_page_job(PAGE, uploaded_file, image, HEALTH_ALERT_JSON_PROMPT, result_type=HealthResult)
+
+    else:
+        last = get_page_result(PAGE) or get_page_job(PAGE)
+        if last is not None:
+            show_last_upload_notice(last)
+            if isinstance(last, PageJob):
+                job_progress(PAGE)
+            else:
+                render_assessment(last.response)
+
+def render_herd_table(rows, table):
+    """Shows herd rows most urgent first; errors sort last."""
+    rows.sort(key=lambda row: (row["_rank"], row["Animal"]))
+    table.dataframe(
+        [{k: v for k, v in row.items() if k != "_rank"} for row in rows],
+        width="stretch",
+        hide_index=True
+    )
+
+def render_herd_alert(rows):
+    critical = sum(1 for row in rows if row["Status"] == "CRITICAL")
+    if critical:
+        st.error(f"⚠️ {critical} animal(s) need immediate veterinary attention.")
+
+@st.fragment
+def show_batch():
+    uploaded_files = st.file_uploader(
+        "Upload Herd Images or Clips",
+        type=['jpg', 'png', 'jpeg'] + VIDEO_TYPES,
+        accept_multiple_files=True,
+        key="health_batch_up"
+    )
+    # One clip per animal: each is reduced to its best frame(s) and costs a single call.
+    uploaded_files = [clip_to_upload(f) if is_video(f) else f for f in uploaded_files or ()]
+    uploaded_files = [f for f in uploaded_files if f is not None]
+    # The last herd table is kept until a different set of photos is uploaded.
+    batch_key = tuple((f.name, f.size) for f in uploaded_files or ())
+    saved = st.session_state.get('health_batch_result')
+
+    if uploaded_files:
+        st.caption(f"{len(uploaded_files)} animals ready for triage.")
+
+        if st.button("Run Herd Diagnostics"):
+            progress = st.progress(0.0, text="Starting herd triage...")
+            table = st.empty()
+            rows = []
+
+            # Rows are added as each call finishes, not in upload order. Every photo is a different animal,
+            # so a near-identical photo from the same pen must not lend it its diagnosis.
+            batch = analyze_batch(uploaded_files, HEALTH_ALERT_JSON_PROMPT, result_type=HealthResult, similar=False)
+            for result in batch:
+                if isinstance(result.error, ImageRejectedError):
+                    retry_status = "Not sent (photo quality)"
+                elif result.error is not None:
+                    retry_status = f"Failed after {result.attempts} attempts"
+                elif result.attempts > 1:
+                    retry_status = f"OK after {result.attempts - 1} retries"
                 else:
-                    st.info(response)
-    st.markdown('</div>', unsafe_allow_html=True)
+                    retry_status = "OK"
+
+                if isinstance(result.error, ImageRejectedError):
+                    # The gate's message says what is wrong with the photo and how to retake it.
+                    rank, status, observation, recommendation, confidence = (
+                        ERROR_RANK, "REJECTED", str(result.error), "Retake the photo", ""
+                    )
+                elif result.error is not None:
+                    rank, status, observation, recommendation, confidence = (
+                        ERROR_RANK, "ERROR", result.error.user_message, "", ""
+                    )
+                else:
+                    health = result.response
+                    rank, status, observation, recommendation, confidence = (
+                        int(health.status), health.status.name, health.observation,
+                        health.recommendation, health.confidence.name.title()
+                    )
+                rows.append({
+                    "_rank": rank,
+                    "Animal": uploaded_files[result.index].name,
+                    "Status": status,
+                    "Confidence": confidence,
+                    "Observation": observation,
+                    "Recommendation": recommendation,
+                    "Latency (s)": round(result.latency, 2),
+                    "Retry Status": retry_status,
+                    "Source": "" if result.error is not None else reuse_label(result.info),
+                })
+                render_herd_table(rows, table)
+                progress.progress(
+                    len(rows) / len(uploaded_files),
+                    text=f"Analyzed {len(rows)} of {len(uploaded_files)} animals"
+                )
+
+            st.session_state.health_batch_result = (batch_key, rows)
+            render_herd_alert(rows)
+
+        elif saved is not None and saved[0] == batch_key:
+            render_herd_table(saved[1], st.empty())
+            render_herd_alert(saved[1])
+
+    elif saved is not None:
+        st.caption(f"Showing your last herd triage ({len(saved[1])} animals). Upload photos to run another.")
+        render_herd_table(saved[1], st.empty())
+        render_herd_alert(saved[1])
@@ -0,0 +1,223 @@
+import csv
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from results import CombinedAnalysis, HealthResult
+from routing import CONFIDENCE_LINE, STATUS_LINE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    request_key TEXT NOT NULL,
+    image_hash TEXT NOT NULL,
+    prompt_type TEXT NOT NULL,
+    language TEXT NOT NULL,
+    status TEXT,
+    breed TEXT,
+    confidence TEXT,
+    response TEXT NOT NULL,
+    thumbnail BLOB,
+    latency REAL,
+    created REAL NOT NULL,
+    model TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS analyses_request ON analyses (request_key);
+CREATE INDEX IF NOT EXISTS analyses_status ON analyses (status, created);
+CREATE INDEX IF NOT EXISTS analyses_breed ON analyses (breed COLLATE NOCASE, created);
+CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created);
+"""
+
+EXPORT_COLUMNS = ["id", "created", "image_hash", "prompt_type", "language", "model", "status", "breed",
+                  "confidence", "latency", "response"]
+
+BREED_LINE = re.compile(r"(?:Primary Breed Identification:\**|Breed:)\s*\**\s*([^\n*]+)", re.I)
+
+
+# --- RESPONSE SUMMARY ---
+def summarize(text, result=None):
+    """Returns (status, breed, confidence) of a response; fields it does not state are None.
+
+    A parsed result (HealthResult or CombinedAnalysis) is read directly;
+    plain text is searched for the STATUS, breed and confidence lines the
+    prompts ask for.
+    """
+    if isinstance(result, CombinedAnalysis):
+        status, _, confidence = summarize(None, result.health)
+        breed = summarize(result.detailed)[1] or summarize(result.fun_facts)[1]
+        return status, breed, confidence
+    if isinstance(result, HealthResult):
+        return result.status.name, None, result.confidence.name.title()
+    status = STATUS_LINE.search(text)
+    breed = BREED_LINE.search(text)
+    confidence = CONFIDENCE_LINE.search(text)
+    return (
+        status.group(1).upper() if status else None,
+        breed.group(1).strip() if breed else None,
+        confidence.group(1).title() if confidence else None,
+    )
+
+
+# --- STORE ---
+class HistoryStore:
+    """Durable log of every model analysis in a local SQLite database.
+
+    Rows are looked up by request key (image + prompt + language + model),
+    so a repeat analysis can be served from here after the result cache has
+    forgotten it. Only rows younger than max_age seconds, and newer than the
+    last `stop_reuse()`, are reused; older ones stay listed. Listing is
+    paginated in SQL and export reads a capped number of rows in batches, so
+    the history can grow without being loaded into memory.
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(analyses)")}
+            if "model" not in columns:
+                # Databases from before the model column; their rows show no model.
+                conn.execute("ALTER TABLE analyses ADD COLUMN model TEXT")
+            row = conn.execute("SELECT value FROM meta WHERE name = 'reuse_after'").fetchone()
+        self.reuse_after = row["value"] if row is not None else 0.0
+
+    def _connect(self):
+        """One connection per thread; WAL lets readers run alongside the writer."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, request_key, image_hash, prompt_type, language, text, result=None, thumbnail=None,
+               latency=None, model=None):
+        """Stores one model answer (raw text, plus the parsed result when there is one) and the model that gave it."""
+        status, breed, confidence = summarize(text, result)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analyses (request_key, image_hash, prompt_type, language, model, status, breed, "
+                "confidence, response, thumbnail, latency, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request_key, image_hash, prompt_type, language, model, status, breed, confidence, text, thumbnail,
+                 latency, time.time()),
+            )
+
+    def lookup(self, request_key):
+        """Latest reusable response text for a request key, or None."""
+        oldest = self.reuse_after
+        if self.max_age is not None:
+            oldest = max(oldest, time.time() - self.max_age)
+        row = self._connect().execute(
+            "SELECT response FROM analyses WHERE request_key = ? AND created >= ? ORDER BY id DESC LIMIT 1",
+            (request_key, oldest),
+        ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return row["response"]
+
+    def stop_reuse(self):
+        """Keeps every row listed but answers no lookup from rows recorded before now (survives restarts)."""
+        self.reuse_after = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('reuse_after', ?)", (self.reuse_after,))
+
+    # --- Queries ---
+    @staticmethod
+    def _where(status=None, breed=None, since=None, until=None):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if breed:
+            clauses.append("breed = ? COLLATE NOCASE")
+            params.append(breed.strip())
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        return self._connect().execute(f"SELECT COUNT(*) FROM analyses{where}", params).fetchone()[0]
+
+    def page(self, limit=20, offset=0, **filters):
+        """One page of rows, newest first, as dicts."""
+        where, params = self._where(**filters)
+        rows = self._connect().execute(
+            f"SELECT * FROM analyses{where} ORDER BY created DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def breeds(self):
+        rows = self._connect().execute(
+            "SELECT DISTINCT breed FROM analyses WHERE breed IS NOT NULL ORDER BY breed COLLATE NOCASE"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_rows(self, batch_size=500, limit=None, **filters):
+        """Yields matching rows (without thumbnails) oldest first, batch_size at a time from the cursor.
+
+        With a limit only the newest `limit` matching rows are yielded.
+        """
+        where, params = self._where(**filters)
+        columns = ", ".join(EXPORT_COLUMNS)
+        query = f"SELECT {columns} FROM analyses{where}"
+        if limit is not None:
+            query = f"SELECT {columns} FROM ({query} ORDER BY created DESC, id DESC LIMIT ?)"
+            params = [*params, limit]
+        # A dedicated connection keeps a long export from holding this thread's connection.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            cursor = conn.execute(f"{query} ORDER BY created, id", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def export_csv(self, fileobj, limit=None, **filters):
+        """Writes matching rows (the newest `limit` of them, if given) as CSV to a text file object."""
+        writer = csv.writer(fileobj)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in self.iter_rows(limit=limit, **filters):
+            writer.writerow(row)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM analyses")
+        self.hits = 0
+
+
+def thumbnail_jpeg(data, size=128):
+    """Small JPEG thumbnail of an encoded image for the history list."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", (size, size))
+    image = image.convert("RGB")
+    image.thumbnail((size, size))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
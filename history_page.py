@@ -0,0 +1,101 @@
+import datetime
+import io
+
+import streamlit as st
+
+import utils
+
+PAGE_SIZE = 20
+STATUSES = ["All", "CRITICAL", "WARNING", "HEALTHY"]
+
+def show():
+    st.title("🗂️ Analysis History")
+    st.markdown("Every analysis run on this server, newest first.")
+    history_card()
+
+def go_to(page):
+    st.session_state.history_page = page
+
+def reset_page():
+    go_to(0)
+
+def _filters():
+    c1, c2, c3 = st.columns([1, 1, 2])
+    with c1:
+        status = st.selectbox("Status", STATUSES, key="history_status", on_change=reset_page)
+    with c2:
+        breed = st.selectbox("Breed", ["All"] + utils.get_history_store().breeds(), key="history_breed",
+                             on_change=reset_page)
+    with c3:
+        dates = st.date_input("Date range", value=(), key="history_dates", on_change=reset_page)
+
+    filters = {}
+    if status != "All":
+        filters["status"] = status
+    if breed != "All":
+        filters["breed"] = breed
+    if len(dates) == 2:
+        start, end = dates
+        filters["since"] = datetime.datetime.combine(start, datetime.time()).timestamp()
+        filters["until"] = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time()).timestamp()
+    return filters
+
+def export_csv(filters):
+    """Builds the CSV export as bytes when the download is clicked, capped at HISTORY_EXPORT_MAX_ROWS rows."""
+    buffer = io.StringIO()
+    utils.get_history_store().export_csv(buffer, limit=utils.HISTORY_EXPORT_MAX_ROWS, **filters)
+    return buffer.getvalue().encode("utf-8")
+
+def render_row(row):
+    c1, c2 = st.columns([1, 5])
+    with c1:
+        if row["thumbnail"]:
+            st.image(row["thumbnail"], width="stretch")
+    with c2:
+        when = datetime.datetime.fromtimestamp(row["created"]).strftime("%Y-%m-%d %H:%M")
+        summary = " · ".join(
+            part for part in (row["status"], row["breed"], row["confidence"] and f"{row['confidence']} confidence")
+            if part
+        )
+        st.markdown(f"**{row['prompt_type'].replace('_', ' ').title()}** — {summary or 'No summary'}")
+        latency = f" · {row['latency']:.1f}s" if row["latency"] is not None else ""
+        model = f" · {row['model']}" if row["model"] else ""
+        st.caption(f"{when} · {row['language']}{model}{latency} · photo {row['image_hash'][:10]}")
+        if (row["model"] or "").startswith("stub:"):
+            st.caption("⚠️ Offline test answer from the stub backend, not a real analysis.")
+        with st.expander("Full response"):
+            st.text(row["response"])
+
+@st.fragment
+def history_card():
+    # A fragment: filtering and paging rerun this card only.
+    st.markdown('<div class="ui-card">', unsafe_allow_html=True)
+    store = utils.get_history_store()
+    filters = _filters()
+
+    total = store.count(**filters)
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = min(st.session_state.get('history_page', 0), pages - 1)
+
+    top1, top2 = st.columns([3, 1])
+    with top1:
+        limit = utils.HISTORY_EXPORT_MAX_ROWS
+        capped = f" · export has the newest {limit}" if total > limit else ""
+        st.caption(f"{total} analyses · page {page + 1} of {pages}{capped}")
+    with top2:
+        st.download_button(
+            "Export CSV", lambda: export_csv(filters), file_name="analysis_history.csv", mime="text/csv",
+            on_click="ignore", disabled=total == 0
+        )
+
+    # Only the rows on screen are fetched; the query runs on the status/breed/date indexes.
+    for row in store.page(limit=PAGE_SIZE, offset=page * PAGE_SIZE, **filters):
+        render_row(row)
+        st.divider()
+
+    prev_col, _, next_col = st.columns([1, 3, 1])
+    with prev_col:
+        st.button("← Newer", disabled=page == 0, key="history_prev", on_click=go_to, args=(page - 1,))
+    with next_col:
+        st.button("Older →", disabled=page >= pages - 1, key="history_next", on_click=go_to, args=(page + 1,))
+    st.markdown('</div>', unsafe_allow_html=True)
@@ -32,7 +32,7 @@ def show():
         st.button(
             "Go to Fun Facts", 
             key="btn_facts", 
-            use_container_width=True,
+            width="stretch",
             on_click=go_to_page,
             args=("Breed & Facts",)
         )
@@ -50,7 +50,7 @@ def show():
         st.button(
             "Go to Triage", 
             key="btn_health", 
-            use_container_width=True,
+            width="stretch",
             on_click=go_to_page,
             args=("Health Triage",)
         )
@@ -68,7 +68,7 @@ def show():
         st.button(
             "Go to Analysis", 
             key="btn_detail", 
-            use_container_width=True,
+            width="stretch",
             on_click=go_to_page,
             args=("Detailed Info",)
         )
@@ -86,13 +86,17 @@ def show():
         st.button(
             "Open Settings", 
             key="btn_settings", 
-            use_container_width=True,
+            width="stretch",
             on_click=go_to_page,
             args=("Settings",)
         )
 
     st.markdown("<br>", unsafe_allow_html=True)
+    helpline_card()
 
+# Picking a region reruns only this card, not the whole page.
+@st.fragment
+def helpline_card():
     # Emergency Section
     st.markdown('<div class="ui-card">', unsafe_allow_html=True)
     st.subheader("🚑 Emergency Helpline Directory")
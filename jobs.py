@@ -0,0 +1,137 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobStoreFull(Exception):
+    """Raised when every slot in the job store holds an unfinished job."""
+
+
+class Job:
+    """One background unit of work and its outcome."""
+
+    QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+    def __init__(self, job_id, label=""):
+        self.id = job_id
+        self.label = label
+        self.status = self.QUEUED
+        self.result = None
+        self.error = None
+        self.info = {}
+        self.partial = ""
+        self.queue_position = None
+        self.queue_eta = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def report_wait(self, position, estimated_seconds):
+        """on_wait callback for the admission queue; pages read the values when polling."""
+        self.queue_position = position
+        self.queue_eta = estimated_seconds
+
+    def elapsed(self):
+        end = self.finished or time.monotonic()
+        return end - (self.started or self.created)
+
+
+class JobEngine:
+    """Runs submitted callables on a worker pool and keeps their results for a while.
+
+    The store is bounded: finished jobs expire after `ttl_seconds`, and when
+    `max_jobs` is reached the oldest finished job is dropped to make room.
+    `fn(job)` is called on a worker thread; it may update `job.partial` and
+    `job.info` to report progress.
+    """
+
+    def __init__(self, max_workers=4, max_jobs=200, ttl_seconds=900.0):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self.submitted = 0
+        self.failed = 0
+        self.expired = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, fn, label=""):
+        """Queues fn(job) and returns the new job's id."""
+        with self._lock:
+            self._prune()
+            if len(self._jobs) >= self.max_jobs:
+                raise JobStoreFull()
+            job = Job(f"{next(self._counter)}-{uuid.uuid4().hex[:8]}", label=label)
+            self._jobs[job.id] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job, fn)
+        return job.id
+
+    def _run(self, job, fn):
+        job.started = time.monotonic()
+        job.status = Job.RUNNING
+        result, error = None, None
+        try:
+            result = fn(job)
+        except Exception as e:
+            error = e
+        # Settled under the lock, finish time first: _prune must never see a done job without one.
+        with self._lock:
+            job.result, job.error = result, error
+            job.finished = time.monotonic()
+            if error is not None:
+                job.status = Job.FAILED
+                self.failed += 1
+            else:
+                job.status = Job.DONE
+
+    def _prune(self):
+        """Drops expired jobs, then the oldest finished ones while over capacity. Caller holds the lock."""
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.done and now - job.finished > self.ttl_seconds:
+                del self._jobs[job_id]
+                self.expired += 1
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) < self.max_jobs:
+                break
+            if job.done:
+                del self._jobs[job_id]
+                self.expired += 1
+
+    def get(self, job_id):
+        """Returns the job, or None once it has expired or been discarded."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id):
+        """Forgets a job whose result has been collected (a running job still finishes)."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def queue_position(self, job_id):
+        """1-based place of a job among those still waiting for a worker, or None once it has started."""
+        with self._lock:
+            waiting = [job.id for job in self._jobs.values() if job.status == Job.QUEUED]
+        return waiting.index(job_id) + 1 if job_id in waiting else None
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            return {
+                "queued": sum(1 for job in jobs if job.status == Job.QUEUED),
+                "running": sum(1 for job in jobs if job.status == Job.RUNNING),
+                "stored": len(jobs),
+                "submitted": self.submitted,
+                "failed": self.failed,
+                "expired": self.expired,
+            }
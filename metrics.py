@@ -0,0 +1,228 @@
+import bisect
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Label applied to spans recorded while handling a page's work (set per job / batch worker).
+current_page = contextvars.ContextVar("current_page", default="none")
+
+# Seconds: 1 ms .. ~2 min, roughly doubling.
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+# Bytes: 1 KB .. 16 MB.
+SIZE_BUCKETS = tuple(1024 * 2 ** i for i in range(15))
+
+
+# --- HISTOGRAM ---
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus layout) with interpolated quantiles."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates the q-quantile (0..1) by linear interpolation inside its bucket.
+
+        The estimate is clamped to the smallest and largest values observed.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = max(self.buckets[i - 1] if i > 0 else 0.0, self.min)
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def merge(self, other):
+        """Adds another histogram with the same buckets into this one."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+
+# --- REGISTRY ---
+class MetricsRegistry:
+    """Process-wide histograms and counters keyed by name and labels.
+
+    `span(name, **labels)` times a block into the `<name>_seconds` histogram.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def span(self, name, **labels):
+        labels.setdefault("page", current_page.get())
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """One dict per histogram: name, labels, count, mean and p50/p95/p99."""
+        with self._lock:
+            rows = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                rows.append({
+                    "metric": name,
+                    **dict(labels),
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": histogram.quantile(0.50),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                })
+            return rows
+
+    def counters(self):
+        with self._lock:
+            return [{"metric": name, **dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())]
+
+    def to_prometheus(self, prefix="app_", gauges=None):
+        """Renders every metric (plus optional {name: value} gauges) in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        declared = set()
+        for (name, labels), histogram in histograms:
+            metric = prefix + name
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            metric = prefix + name
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            lines.append(f"{prefix}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def drain(self):
+        """Returns everything recorded so far as a picklable snapshot and starts over (see merge)."""
+        with self._lock:
+            snapshot = (self._histograms, self._counters)
+            self._histograms, self._counters = {}, {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Adds a drain() snapshot, e.g. from a worker process, into this registry."""
+        histograms, counters = snapshot
+        with self._lock:
+            for key, histogram in histograms.items():
+                if key in self._histograms:
+                    self._histograms[key].merge(histogram)
+                else:
+                    self._histograms[key] = histogram
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + [(k, str(v)) for k, v in extra.items()]
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+# --- EXPORT ---
+def serve(render, port, host="0.0.0.0"):
+    """Serves render() as /metrics on a daemon thread for Prometheus to scrape."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_periodically(render, path, interval=15.0):
+    """Rewrites render() to path every interval seconds on a daemon thread (for a textfile collector)."""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            temporary = path + ".tmp"
+            # A full disk or a failing render must not end the export for the rest of the process.
+            try:
+                with open(temporary, "w", encoding="utf-8") as f:
+                    f.write(render())
+                os.replace(temporary, path)
+            except Exception:
+                logger.exception("Could not write metrics to %s", path)
+
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
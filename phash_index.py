@@ -0,0 +1,182 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+# --- PERCEPTUAL HASH ---
+def dhash(image, hash_size=8):
+    """64-bit difference hash: robust to re-encoding, small shifts and exposure changes."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+# --- MULTI-INDEX HASHING ---
+class MultiIndexHash:
+    """Exact Hamming-radius search by splitting hashes into max_distance + 1 chunks.
+
+    By the pigeonhole principle two hashes within max_distance bits agree
+    exactly on at least one chunk, so only entries sharing a chunk value with
+    the query are compared. Lookups stay fast with hundreds of thousands of entries.
+    """
+
+    def __init__(self, max_distance, bits=64):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        base, extra = divmod(bits, chunks)
+        self._slices = []
+        shift = 0
+        for i in range(chunks):
+            width = base + (1 if i < extra else 0)
+            self._slices.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._slices]
+        self._hashes = []
+        self._values = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, hash_value, value):
+        entry = self._ids.get(hash_value)
+        if entry is not None:
+            self._values[entry] = value
+            return
+        entry = len(self._hashes)
+        self._ids[hash_value] = entry
+        self._hashes.append(hash_value)
+        self._values.append(value)
+        for table, (shift, mask) in zip(self._tables, self._slices):
+            table.setdefault((hash_value >> shift) & mask, []).append(entry)
+
+    def nearest(self, hash_value, max_distance=None):
+        """Returns (value, distance) of the closest entry within max_distance, or None."""
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        entry = self._ids.get(hash_value)
+        if entry is not None:
+            return self._values[entry], 0
+        best = None
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._slices):
+            for entry in table.get((hash_value >> shift) & mask, ()):
+                if entry in seen:
+                    continue
+                seen.add(entry)
+                distance = hamming(self._hashes[entry], hash_value)
+                if distance <= limit and (best is None or distance < best[1]):
+                    best = (self._values[entry], distance)
+        return best
+
+
+# --- PERSISTENT INDEX ---
+class PerceptualIndex:
+    """Near-duplicate lookup of previously analysed images, one hash table set per scope.
+
+    A scope groups entries that are interchangeable (same prompt, language and
+    model). Entries are appended to a tab-separated log and replayed on start.
+    Once the log holds more than twice as many lines as the entries it should
+    keep (re-analysed photos append again), it is rewritten with one line per
+    entry, and only the newest max_entries are kept.
+    """
+
+    # Logs shorter than this are never worth rewriting.
+    MIN_COMPACT_LINES = 1024
+
+    def __init__(self, path=None, max_distance=4, max_entries=100_000):
+        self.path = path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.near_hits = 0
+        self._scopes = {}
+        # (scope, hash) -> value, oldest first: what a compacted log keeps.
+        self._entries = OrderedDict()
+        self._lines = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._lines += 1
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 3:
+                        continue
+                    scope, hash_hex, value = parts
+                    self._insert(scope, int(hash_hex, 16), value)
+        except FileNotFoundError:
+            pass
+        if self._lines > len(self._entries) or len(self._entries) > self.max_entries:
+            self._compact()
+
+    def _scope_index(self, scope):
+        index = self._scopes.get(scope)
+        if index is None:
+            index = self._scopes[scope] = MultiIndexHash(self.max_distance)
+        return index
+
+    def _insert(self, scope, hash_value, value):
+        self._scope_index(scope).add(hash_value, value)
+        self._entries[scope, hash_value] = value
+        self._entries.move_to_end((scope, hash_value))
+
+    def add(self, scope, hash_value, value):
+        with self._lock:
+            self._insert(scope, hash_value, value)
+            self._lines += 1
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(f"{scope}\t{hash_value:016x}\t{value}\n")
+            if self._lines > 2 * max(min(len(self._entries), self.max_entries), self.MIN_COMPACT_LINES):
+                self._compact()
+
+    def _compact(self):
+        """Drops entries beyond max_entries (oldest first) and rewrites the log with one line per entry."""
+        if len(self._entries) > self.max_entries:
+            for _ in range(len(self._entries) - self.max_entries):
+                self._entries.popitem(last=False)
+            # Hash tables cannot forget entries, so they are rebuilt from what is kept.
+            self._scopes = {}
+            for (scope, hash_value), value in self._entries.items():
+                self._scope_index(scope).add(hash_value, value)
+        self._lines = len(self._entries)
+        if not self.path:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            for (scope, hash_value), value in self._entries.items():
+                f.write(f"{scope}\t{hash_value:016x}\t{value}\n")
+        os.replace(temporary, self.path)
+
+    def find(self, scope, hash_value, max_distance=None):
+        """Returns (value, distance) for the nearest entry in scope, or None."""
+        limit = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            index = self._scopes.get(scope)
+            return index.nearest(hash_value, limit) if index is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            self._entries.clear()
+            self._lines = 0
+            self.near_hits = 0
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
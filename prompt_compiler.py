@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from resilience import TokenBudgetError
+
+logger = logging.getLogger(__name__)
+
+# Gemini bills an image up to 384 px per side as one tile; larger images as 768 px tiles.
+IMAGE_TILE_TOKENS = 258
+SMALL_IMAGE_EDGE = 384
+IMAGE_TILE_EDGE = 768
+
+CompiledPrompt = namedtuple(
+    "CompiledPrompt", ["prompt", "language", "prefix", "suffix", "text", "prefix_tokens", "tokens"]
+)
+
+
+def estimate_tokens(text):
+    """Rough input token count (about four characters per token)."""
+    return -(-len(text) // 4)
+
+
+def image_tokens(width, height):
+    """Input tokens Gemini charges for an image of this size."""
+    if max(width, height) <= SMALL_IMAGE_EDGE:
+        return IMAGE_TILE_TOKENS
+    return IMAGE_TILE_TOKENS * math.ceil(width / IMAGE_TILE_EDGE) * math.ceil(height / IMAGE_TILE_EDGE)
+
+
+class PromptCompiler:
+    """Builds each prompt + language variant once and keeps its static prefix cached on the model.
+
+    A variant is the static prompt (the prefix, identical for every
+    language) followed by the language instruction (the suffix). Token
+    counts are recorded at compile time so `edge_for_budget` can fit the
+    image into the per-request budget before it is preprocessed.
+
+    `prefix_handle` registers a prefix with a backend's context cache once
+    per model and cache scope (API key) and returns the handle until it
+    nears expiry. Backends without context caching (or prefixes below their
+    minimum size) get None, and the full prompt is sent as before; a failed
+    registration is not retried for retry_seconds.
+    """
+
+    def __init__(self, instruction, budget=0, count_tokens=estimate_tokens, caching=True, prefix_ttl=3600.0,
+                 retry_seconds=600.0):
+        self.instruction = instruction
+        self.budget = budget
+        self.count_tokens = count_tokens
+        self.caching = caching
+        self.prefix_ttl = prefix_ttl
+        self.retry_seconds = retry_seconds
+        self.registrations = 0
+        self.fallbacks = 0
+        self.downscaled = 0
+        self._compiled = {}
+        self._prefixes = {}
+        self._unsupported = {}
+        self._lock = threading.Lock()
+
+    def compile(self, prompt, language):
+        """Returns the CompiledPrompt for a prompt in a language, building it on first use."""
+        key = (prompt, language)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            suffix = self.instruction.format(language=language)
+            prefix_tokens = self.count_tokens(prompt)
+            compiled = CompiledPrompt(
+                prompt, language, prompt, suffix, prompt + suffix, prefix_tokens,
+                prefix_tokens + self.count_tokens(suffix),
+            )
+            with self._lock:
+                compiled = self._compiled.setdefault(key, compiled)
+        return compiled
+
+    # --- Token budget ---
+    def edge_for_budget(self, compiled, max_edge):
+        """Largest image edge (up to max_edge) that keeps the request within budget.
+
+        Raises TokenBudgetError when even the smallest image does not fit.
+        """
+        if not self.budget:
+            return max_edge
+        left = self.budget - compiled.tokens
+        # Sized for a square photo, the most tiles an image of this edge can cost.
+        if image_tokens(max_edge, max_edge) <= left:
+            return max_edge
+        for edge in (IMAGE_TILE_EDGE, SMALL_IMAGE_EDGE):
+            if edge < max_edge and image_tokens(edge, edge) <= left:
+                with self._lock:
+                    self.downscaled += 1
+                return edge
+        raise TokenBudgetError(
+            f"The prompt needs {compiled.tokens} tokens plus at least {IMAGE_TILE_TOKENS} for the image; "
+            f"the budget is {self.budget}."
+        )
+
+    # --- Context caching ---
+    def prefix_handle(self, backend, model_name, compiled):
+        """The backend's cache handle for this prompt's prefix on model_name, or None to send it in full."""
+        if not self.caching or compiled.prefix_tokens < backend.min_cached_tokens:
+            return None
+        scope = (backend.name, backend.cache_scope, model_name)
+        key = scope + (compiled.prefix,)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._prefixes.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            if self._unsupported.get(scope, 0) > now:
+                return None
+        try:
+            handle = backend.register_prefix(compiled.prefix, model_name, self.prefix_ttl)
+        except Exception as e:
+            logger.warning("Could not cache the prompt prefix on %s, sending it in full: %s", model_name, e)
+            handle = None
+        with self._lock:
+            if handle is None:
+                self._unsupported[scope] = now + self.retry_seconds
+                self.fallbacks += 1
+                return None
+            # Renewed a little before the backend expires it.
+            self._prefixes[key] = (handle, now + self.prefix_ttl * 0.9)
+            self.registrations += 1
+        return handle
+
+    def stats(self):
+        with self._lock:
+            variants = list(self._compiled.values())
+            return {
+                "variants": len(variants),
+                "prefixes": len(self._prefixes),
+                "registrations": self.registrations,
+                "fallbacks": self.fallbacks,
+                "downscaled": self.downscaled,
+                "largest_tokens": max((v.tokens for v in variants), default=0),
+            }
+
+    def variants(self):
+        """(prompt, language, prefix_tokens, tokens) for every compiled variant."""
+        with self._lock:
+            return [(v.prompt, v.language, v.prefix_tokens, v.tokens) for v in self._compiled.values()]
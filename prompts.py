@@ -74,3 +74,60 @@ Provide your analysis in the following structured Markdown format. DO NOT change
 ## 📝 Reasoning for Identification
 [Detailed reasoning for your identification based on the visual evidence.]
 """
+
+# --- 4. STRUCTURED (JSON) VARIANTS ---
+# Used with a response schema (see results.py); the schema fixes field names and
+# status values, so only the free-text fields follow the output language.
+def _task_and_format(prompt):
+    """Drops the ROLE block so a single-purpose prompt can be embedded in another."""
+    return "### TASK" + prompt.split("### TASK", 1)[1]
+
+HEALTH_ALERT_JSON_PROMPT = HEALTH_ALERT_PROMPT.split("### OUTPUT FORMAT", 1)[0] + """### OUTPUT FORMAT
+Return a JSON object with these fields:
+- "status": "CRITICAL", "WARNING" or "HEALTHY" (always in English).
+- "observation": 1-2 sentences describing what you see.
+- "recommendation": Immediate Veterinary Attention / Monitor / Routine Care.
+- "confidence": "High", "Medium" or "Low" (always in English), how certain you are of the status.
+"""
+
+# --- 5. COMBINED ANALYSIS PROMPT (one call feeds every page) ---
+COMBINED_ANALYSIS_PROMPT = """
+### ROLE
+You are an expert veterinarian, cattle/buffalo breed specialist and friendly nature guide.
+
+### OVERALL TASK
+Analyze the single image provided and return one JSON object with three fields:
+- "health": the visual health triage described in PART 1, as an object with
+  "status", "observation", "recommendation" and "confidence".
+- "fun_facts": the Markdown breed fun facts described in PART 2.
+- "detailed": the Markdown expert breed evaluation described in PART 3.
+""" + "".join(
+    f"\n## PART {number}\n{_task_and_format(prompt)}"
+    for number, prompt in enumerate((HEALTH_ALERT_JSON_PROMPT, FUN_FACTS_PROMPT, DETAILED_BREED_PROMPT), 1)
+)
+
+# --- 6. PROMPT TYPES (analysis history) ---
+PROMPT_TYPES = {
+    HEALTH_ALERT_PROMPT: "health",
+    HEALTH_ALERT_JSON_PROMPT: "health",
+    FUN_FACTS_PROMPT: "fun_facts",
+    DETAILED_BREED_PROMPT: "detailed",
+    COMBINED_ANALYSIS_PROMPT: "combined",
+}
+
+# --- 7. TRANSLATION PROMPT (language switch without a new image call) ---
+# Text-only: the source text is appended after "### TEXT".
+TRANSLATION_PROMPT = """
+### ROLE
+You are a professional translator of veterinary and livestock advice for Indian farmers.
+
+### TASK
+Translate the text below from {source} into {target}.
+- Keep all Markdown formatting, headings, numbering and emojis exactly as they are.
+- Keep breed names, disease abbreviations (LSD, FMD) and numbers unchanged.
+- If the text is a JSON object, return the same JSON object with the same keys. Translate only the
+  free-text values; keep "status" and "confidence" values exactly as they are (in English).
+- Return only the translation, without notes or explanations.
+
+### TEXT
+"""
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+
+# --- THRESHOLDS ---
+QualityThresholds = namedtuple(
+    "QualityThresholds",
+    ["min_edge", "min_sharpness", "max_dark_fraction", "max_bright_fraction"],
+    defaults=(224, 40.0, 0.6, 0.6),
+)
+
+
+class QualityReport(
+    namedtuple("QualityReport", ["width", "height", "sharpness", "dark_fraction", "bright_fraction", "issues"])
+):
+    __slots__ = ()
+
+    @property
+    def passed(self):
+        return not self.issues
+
+
+# Scoring runs on a grayscale copy no larger than this on its long edge.
+ANALYSIS_EDGE = 512
+DARK_LEVEL = 32
+BRIGHT_LEVEL = 224
+
+
+# --- SCORING ---
+def laplacian_variance(pixels):
+    """Variance of the 4-neighbour Laplacian; low values mean little edge detail (blur)."""
+    lap = (
+        pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+        - 4.0 * pixels[1:-1, 1:-1]
+    )
+    return float(lap.var()) if lap.size else 0.0
+
+
+def score_image(image, thresholds=None):
+    """Scores resolution, sharpness and exposure of an upload and lists what is wrong with it.
+
+    The image may be draft-decoded in place, so pass a freshly opened one
+    rather than the image that will be sent to the model.
+    """
+    thresholds = thresholds or QualityThresholds()
+    width, height = image.size
+
+    if image.format == "JPEG":
+        image.draft("L", (ANALYSIS_EDGE, ANALYSIS_EDGE))
+    gray = image.convert("L")
+    if max(gray.size) > ANALYSIS_EDGE:
+        gray.thumbnail((ANALYSIS_EDGE, ANALYSIS_EDGE), Image.Resampling.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32)
+
+    sharpness = laplacian_variance(pixels)
+    histogram = np.bincount(np.asarray(gray, dtype=np.uint8).ravel(), minlength=256)
+    total = max(int(histogram.sum()), 1)
+    dark_fraction = float(histogram[:DARK_LEVEL].sum()) / total
+    bright_fraction = float(histogram[BRIGHT_LEVEL:].sum()) / total
+
+    issues = []
+    if min(width, height) < thresholds.min_edge:
+        issues.append(
+            f"The photo is only {width}×{height} pixels. Use a photo at least "
+            f"{thresholds.min_edge} pixels on its short side, or move closer to the animal."
+        )
+    if dark_fraction > thresholds.max_dark_fraction:
+        issues.append(
+            f"The photo is too dark ({dark_fraction:.0%} of it is near black). "
+            "Take it in daylight or turn on the flash."
+        )
+    if bright_fraction > thresholds.max_bright_fraction:
+        issues.append(
+            f"The photo is overexposed ({bright_fraction:.0%} of it is washed out). "
+            "Avoid pointing the camera towards the sun or a bright background."
+        )
+    if sharpness < thresholds.min_sharpness:
+        issues.append(
+            "The photo looks blurry. Hold the camera steady, tap to focus on the animal and retake it."
+        )
+    return QualityReport(width, height, sharpness, dark_fraction, bright_fraction, tuple(issues))
+
+
+# --- GATE ---
+class QualityGate:
+    """Process-wide local pre-check that rejects unusable photos before a model call.
+
+    Counts checks and rejections. Time saved is estimated from the running
+    average duration of real model calls, reported through observe_call.
+    """
+
+    def __init__(self, thresholds=None, call_seconds=8.0):
+        self.thresholds = thresholds or QualityThresholds()
+        self.checked = 0
+        self.rejected = 0
+        self.check_seconds = 0.0
+        self._avg_call = call_seconds
+        self._lock = threading.Lock()
+
+    def check(self, image):
+        """Scores an image against the gate's thresholds and counts the outcome."""
+        started = time.perf_counter()
+        report = score_image(image, self.thresholds)
+        self.record(report, time.perf_counter() - started)
+        return report
+
+    def record(self, report, seconds):
+        """Counts a check that took `seconds`, including ones scored elsewhere (e.g. in a worker process)."""
+        with self._lock:
+            self.checked += 1
+            self.check_seconds += seconds
+            if not report.passed:
+                self.rejected += 1
+
+    def observe_call(self, seconds):
+        """Feeds the duration of a completed model call into the time-saved estimate."""
+        with self._lock:
+            self._avg_call = 0.8 * self._avg_call + 0.2 * seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "rejected": self.rejected,
+                "rejection_rate": self.rejected / self.checked if self.checked else 0.0,
+                "avg_check_ms": 1000 * self.check_seconds / self.checked if self.checked else 0.0,
+                "time_saved": self.rejected * self._avg_call,
+            }
@@ -0,0 +1,272 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# --- TYPED ERRORS ---
+class ModelError(Exception):
+    """Base class for model call failures shown to users instead of a diagnosis."""
+
+    retryable = False
+    user_message = "The analysis service returned an error."
+
+    def __init__(self, message="", attempts=1):
+        super().__init__(message or self.user_message)
+        self.attempts = attempts
+
+
+class MissingApiKeyError(ModelError):
+    user_message = "API Key missing. Please add it in Settings."
+
+
+class ModelRequestError(ModelError):
+    user_message = "The analysis request was rejected."
+
+
+class InvalidResponseError(ModelError):
+    user_message = "The model answered in an unexpected format. Please try again."
+
+
+class RateLimitedError(ModelError):
+    retryable = True
+    user_message = "The API quota is exhausted right now. Please retry in a minute."
+
+
+class ModelUnavailableError(ModelError):
+    retryable = True
+    user_message = "The analysis service is temporarily unavailable."
+
+
+class ModelTimeoutError(ModelError):
+    retryable = True
+    user_message = "The analysis took too long and was cancelled."
+
+
+class ImageRejectedError(ModelError):
+    """Raised when the local quality gate rejects a photo; no model call was made."""
+
+    user_message = "The photo is not clear enough to analyze."
+
+    def __init__(self, message="", attempts=0):
+        super().__init__(message, attempts)
+
+
+class TokenBudgetError(ModelError):
+    """Raised when a request's prompt and image exceed the input token budget; no model call was made."""
+
+    user_message = "This request is larger than the configured token budget."
+
+    def __init__(self, message="", attempts=0):
+        super().__init__(message, attempts)
+
+
+class CircuitOpenError(ModelError):
+    user_message = "The analysis service is failing repeatedly; pausing requests briefly."
+
+
+def classify_exception(exc):
+    """Maps an SDK/transport exception onto a typed ModelError."""
+    if isinstance(exc, ModelError):
+        return exc
+    code = getattr(exc, "code", None)
+    code = code if isinstance(code, int) else None
+    name = type(exc).__name__
+    if isinstance(exc, TimeoutError) or code == 504 or name == "DeadlineExceeded":
+        return ModelTimeoutError(str(exc))
+    if code == 429 or name in ("TooManyRequests", "ResourceExhausted"):
+        return RateLimitedError(str(exc))
+    if (code is not None and code >= 500) or isinstance(exc, ConnectionError):
+        return ModelUnavailableError(str(exc))
+    return ModelRequestError(str(exc))
+
+
+# --- RETRY POLICY ---
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# --- CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """Opens after consecutive upstream failures and fails fast until reset_timeout passes."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError while open; lets one probe through after the timeout."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError()
+                self.state = self.HALF_OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+# --- FAILURE MEMORY ---
+class RecentFailures:
+    """Remembers failed calls by key for retry_seconds so repeats fail fast instead of waiting again.
+
+    Only the error's type and message are kept, with the time it failed, so
+    each repeat raises a fresh error rather than the original exception.
+    """
+
+    def __init__(self, retry_seconds=60.0):
+        self.retry_seconds = retry_seconds
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        """Raises a copy of the error recorded for key while it is recent."""
+        with self._lock:
+            failed = self._failures.get(key)
+        if failed is not None:
+            failed_at, error_type, message = failed
+            if time.monotonic() - failed_at < self.retry_seconds:
+                raise error_type(message, attempts=0)
+
+    def record(self, key, error):
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, (failed_at, _, _) in self._failures.items()
+                            if now - failed_at >= self.retry_seconds]:
+                del self._failures[expired]
+            self._failures[key] = (now, type(error), str(error))
+
+    def forget(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._failures.clear()
+
+
+# --- LATENCY TRACKING ---
+class LatencyWindow:
+    """Rolling window of recent successful call latencies."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q, min_samples=20):
+        """Returns the q-th percentile, or None until enough samples exist."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+# --- CALL WRAPPER ---
+class ResilientCaller:
+    """Runs model calls with a deadline, jittered retries, a circuit breaker and optional hedging.
+
+    `call(fn)` accepts any callable taking the remaining timeout in seconds, so a
+    local fake model can stand in for Gemini when exercising this class.
+    """
+
+    def __init__(self, policy=None, breaker=None, deadline=60.0, hedge=False, max_workers=32):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.hedge = hedge
+        self.latency = LatencyWindow()
+        self.hedged_calls = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+
+    def call(self, fn, deadline=None, info=None):
+        """Returns fn's result or raises a ModelError carrying the attempt count."""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            attempt += 1
+            if info is not None:
+                info["attempts"] = attempt
+            try:
+                self.breaker.before_call()
+            except ModelError as e:
+                e.attempts = attempt
+                raise
+            remaining = deadline_at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise ModelTimeoutError()
+                started = time.monotonic()
+                result = self._attempt(fn, remaining, info)
+            except Exception as exc:
+                error = classify_exception(exc)
+                error.attempts = attempt
+                if error.retryable:
+                    self.breaker.record_failure()
+                remaining = deadline_at - time.monotonic()
+                if not error.retryable or attempt >= self.policy.max_attempts or remaining <= 0:
+                    if error is exc:
+                        raise
+                    raise error from exc
+                time.sleep(min(self.policy.delay(attempt), remaining))
+                continue
+            self.latency.add(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, fn, timeout, info):
+        """Runs one attempt (plus a hedge after the p95 latency) and returns the first success."""
+        started = time.monotonic()
+        pending = {self._executor.submit(fn, timeout)}
+        hedge_after = self.latency.percentile(95) if self.hedge else None
+        if hedge_after is not None and hedge_after < timeout:
+            done, pending = wait(pending, timeout=hedge_after)
+            if done:
+                pending = done
+            else:
+                self.hedged_calls += 1
+                if info is not None:
+                    info["hedged"] = True
+                pending.add(self._executor.submit(fn, timeout - hedge_after))
+
+        error = None
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        raise ModelTimeoutError()
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# --- KEY HELPERS ---
+def make_key(*parts):
+    """Combines the given parts into a single cache key."""
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+# --- RESULT CACHE ---
+class ResultCache:
+    """Two-tier (memory LRU + optional disk) cache for model responses."""
+
+    def __init__(self, max_entries=256, ttl_seconds=24 * 3600, disk_dir=None, max_disk_entries=5000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _expired(self, created):
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            created, value = entry
+            self._store(key, value, created)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def set(self, key, value):
+        """Stores value in memory and, when configured, on disk."""
+        created = time.time()
+        with self._lock:
+            self._store(key, value, created)
+        self._write_disk(key, value, created)
+
+    def _store(self, key, value, created):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(payload["created"]):
+            _silent_remove(path)
+            return None
+        return payload["created"], payload["value"]
+
+    def _write_disk(self, key, value, created):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError):
+            return
+        with self._lock:
+            self._disk_writes += 1
+            should_prune = self._disk_writes % 50 == 0
+        if should_prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Drops expired files, then the oldest ones beyond max_disk_entries."""
+        try:
+            names = [n for n in os.listdir(self.disk_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        files = []
+        for name in names:
+            path = os.path.join(self.disk_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if self._expired(mtime):
+                _silent_remove(path)
+            else:
+                files.append((mtime, path))
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_disk_entries)]:
+            _silent_remove(path)
+
+    def clear(self):
+        """Empties both tiers and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json") or name.endswith(".tmp"):
+                    _silent_remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _silent_remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,129 @@
+import enum
+import json
+
+
+# --- ENUMS ---
+class HealthStatus(enum.IntEnum):
+    """Triage severity; lower values are more urgent so results sort CRITICAL first."""
+    CRITICAL = 0
+    WARNING = 1
+    HEALTHY = 2
+
+
+class Confidence(enum.IntEnum):
+    LOW = 0
+    MEDIUM = 1
+    HIGH = 2
+
+
+def _enum_schema(values):
+    return {"type": "string", "format": "enum", "enum": list(values)}
+
+
+class ResultParseError(ValueError):
+    """Raised when a structured model response does not match its schema."""
+
+
+# --- HEALTH TRIAGE ---
+class HealthResult:
+    """Compact, typed health triage result parsed from a JSON response."""
+
+    __slots__ = ("status", "observation", "recommendation", "confidence")
+
+    SCHEMA = {
+        "type": "object",
+        "properties": {
+            "status": _enum_schema(s.name for s in HealthStatus),
+            "observation": {"type": "string"},
+            "recommendation": {"type": "string"},
+            "confidence": _enum_schema(c.name.title() for c in Confidence),
+        },
+        "required": ["status", "observation", "recommendation", "confidence"],
+    }
+
+    def __init__(self, status, observation, recommendation, confidence):
+        self.status = status
+        self.observation = observation
+        self.recommendation = recommendation
+        self.confidence = confidence
+
+    @classmethod
+    def from_dict(cls, data):
+        try:
+            return cls(
+                status=HealthStatus[str(data["status"]).strip().upper()],
+                observation=str(data["observation"]).strip(),
+                recommendation=str(data["recommendation"]).strip(),
+                confidence=Confidence[str(data.get("confidence", "Low")).strip().upper()],
+            )
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ResultParseError(f"Invalid health result: {e!r}") from e
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(_load_json(text))
+
+    def to_dict(self):
+        return {
+            "status": self.status.name,
+            "observation": self.observation,
+            "recommendation": self.recommendation,
+            "confidence": self.confidence.name.title(),
+        }
+
+    def __repr__(self):
+        return f"HealthResult({self.status.name}, confidence={self.confidence.name})"
+
+
+# --- COMBINED ANALYSIS ---
+class CombinedAnalysis:
+    """Health triage plus breed fun facts and detailed report from one model call."""
+
+    __slots__ = ("health", "fun_facts", "detailed")
+
+    SCHEMA = {
+        "type": "object",
+        "properties": {
+            "health": HealthResult.SCHEMA,
+            "fun_facts": {"type": "string"},
+            "detailed": {"type": "string"},
+        },
+        "required": ["health", "fun_facts", "detailed"],
+    }
+
+    def __init__(self, health, fun_facts, detailed):
+        self.health = health
+        self.fun_facts = fun_facts
+        self.detailed = detailed
+
+    @classmethod
+    def from_dict(cls, data):
+        try:
+            return cls(
+                health=HealthResult.from_dict(data["health"]),
+                fun_facts=str(data["fun_facts"]).strip(),
+                detailed=str(data["detailed"]).strip(),
+            )
+        except (KeyError, TypeError) as e:
+            raise ResultParseError(f"Invalid combined analysis: {e!r}") from e
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(_load_json(text))
+
+    def to_dict(self):
+        return {
+            "health": self.health.to_dict(),
+            "fun_facts": self.fun_facts,
+            "detailed": self.detailed,
+        }
+
+
+def _load_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ResultParseError(f"Response is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ResultParseError("Response JSON is not an object")
+    return data
@@ -0,0 +1,122 @@
+import re
+import threading
+from collections import Counter
+
+from prompts import DETAILED_BREED_PROMPT, FUN_FACTS_PROMPT, HEALTH_ALERT_JSON_PROMPT, HEALTH_ALERT_PROMPT
+from resilience import LatencyWindow
+from results import Confidence, HealthResult, HealthStatus
+
+# Prompts the cheap tier may answer, and how their answers are checked.
+ROUTED_PROMPTS = {
+    HEALTH_ALERT_JSON_PROMPT: "health",
+    HEALTH_ALERT_PROMPT: "health_text",
+    FUN_FACTS_PROMPT: "fun_facts",
+    DETAILED_BREED_PROMPT: "detailed",
+}
+
+STATUS_LINE = re.compile(r"^\W*STATUS\W*(CRITICAL|WARNING|HEALTHY)\b", re.I | re.M)
+CONFIDENCE_LINE = re.compile(r"Confidence Level:\W*(High|Medium|Low)\b", re.I)
+BREED_LINE = re.compile(r"Breed:", re.I)
+
+# The line that settles a streamed answer of each kind before the rest of it arrives.
+DECIDING_LINES = {"health_text": STATUS_LINE, "detailed": CONFIDENCE_LINE, "fun_facts": BREED_LINE}
+
+
+class TierRouter:
+    """Sends routed prompts to a cheaper, faster model first and escalates doubtful answers.
+
+    An answer from the fast tier is escalated to the session's model when its
+    confidence is below min_confidence, its status is in escalate_statuses, it
+    cannot be parsed, or the fast call fails. Per-tier call counts, latency and
+    estimated cost are recorded so the saving can be checked against real traffic.
+    """
+
+    FAST, STRONG = "fast", "strong"
+
+    def __init__(self, fast_model, min_confidence=Confidence.MEDIUM,
+                 escalate_statuses=(HealthStatus.CRITICAL, HealthStatus.WARNING),
+                 fast_cost=0.0002, strong_cost=0.002):
+        self.fast_model = fast_model
+        self.min_confidence = min_confidence
+        self.escalate_statuses = frozenset(escalate_statuses)
+        self.costs = {self.FAST: fast_cost, self.STRONG: strong_cost}
+        self._calls = Counter()
+        self._accepted = 0
+        self._reasons = Counter()
+        self._spend = 0.0
+        self._latency = {self.FAST: LatencyWindow(), self.STRONG: LatencyWindow()}
+        self._requests = LatencyWindow(size=1000)
+        self._lock = threading.Lock()
+
+    def routes(self, prompt):
+        return prompt in ROUTED_PROMPTS
+
+    def escalation_reason(self, prompt, result):
+        """Returns why a fast-tier answer should go to the strong tier, or None to accept it."""
+        kind = ROUTED_PROMPTS.get(prompt)
+        if kind == "health":
+            return self._health_reason(result.status, result.confidence) if isinstance(result, HealthResult) \
+                else "unparsed"
+        if kind == "health_text":
+            match = STATUS_LINE.search(result)
+            return self._health_reason(HealthStatus[match.group(1).upper()], None) if match else "unparsed"
+        if kind == "detailed":
+            match = CONFIDENCE_LINE.search(result)
+            if match is None:
+                return "unparsed"
+            return "low_confidence" if Confidence[match.group(1).upper()] < self.min_confidence else None
+        if kind == "fun_facts":
+            return None if BREED_LINE.search(result) else "unparsed"
+        return None
+
+    def stream_reason(self, prompt, text, complete):
+        """Judges a streamed fast-tier answer so far; returns (decided, reason).
+
+        The answer is decided once its deciding line has arrived (or the
+        stream has ended), so an accepted answer can be streamed on.
+        """
+        line = DECIDING_LINES.get(ROUTED_PROMPTS.get(prompt))
+        if complete or (line is not None and line.search(text)):
+            return True, self.escalation_reason(prompt, text)
+        return False, None
+
+    def _health_reason(self, status, confidence):
+        if status in self.escalate_statuses:
+            return "status"
+        if confidence is not None and confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    # --- Accounting ---
+    def record_call(self, tier, seconds):
+        """Counts one model call on a tier (FAST or STRONG) and its latency."""
+        self._latency[tier].add(seconds)
+        with self._lock:
+            self._calls[tier] += 1
+            self._spend += self.costs[tier]
+
+    def record_outcome(self, reason):
+        """Counts whether a fast-tier answer was accepted (reason None) or escalated."""
+        with self._lock:
+            if reason is None:
+                self._accepted += 1
+            else:
+                self._reasons[reason] += 1
+
+    def record_request(self, seconds):
+        """End-to-end latency of one answered request, across all tiers it used."""
+        self._requests.add(seconds)
+
+    def stats(self):
+        with self._lock:
+            fast_calls = self._calls[self.FAST]
+            return {
+                "fast_calls": fast_calls,
+                "strong_calls": self._calls[self.STRONG],
+                "fast_hit_rate": self._accepted / fast_calls if fast_calls else 0.0,
+                "escalations": dict(self._reasons),
+                "fast_p50": self._latency[self.FAST].percentile(50, min_samples=1),
+                "strong_p50": self._latency[self.STRONG].percentile(50, min_samples=1),
+                "request_p50": self._requests.percentile(50, min_samples=1),
+                "spend": self._spend,
+            }
@@ -1,6 +1,8 @@
 import streamlit as st
 import time
 
+import utils
+
 def show():
     st.title("⚙️ Settings")
     st.markdown("Configure your application preferences.")
@@ -13,7 +15,7 @@ def show():
     c1, c2 = st.columns(2)
     with c1:
         st.markdown("**Language**")
-        languages = ["English", "Hindi", "Gujarati", "Marathi", "Punjabi"]
+        languages = utils.LANGUAGES
         current_lang = st.session_state.get('language', 'English')
         try:
             lang_index = languages.index(current_lang)
@@ -42,6 +44,18 @@ def show():
         elif not is_dark_mode and current_theme != 'light':
             st.session_state.theme = 'light'
             st.rerun()
+    combined = st.toggle(
+        "Combined analysis: one model call per photo feeds Health, Breed & Detailed pages",
+        value=st.session_state.get('combined_analysis', False),
+        key="combined_toggle"
+    )
+    st.session_state.combined_analysis = combined
+    routing = st.toggle(
+        f"Tiered routing: try the faster {utils.FAST_MODEL_NAME} first, escalate doubtful answers",
+        value=st.session_state.get('tiered_routing', utils.ROUTING_ENABLED),
+        key="routing_toggle"
+    )
+    st.session_state.tiered_routing = routing
     st.markdown('</div>', unsafe_allow_html=True)
 
     # --- API CARD ---
@@ -57,10 +71,34 @@ def show():
             value=current_key,
             placeholder="Enter your sk- key here..."
         )
+        current_provider = utils.get_model_provider()
+        new_provider = st.selectbox(
+            "Model Provider",
+            utils.MODEL_PROVIDERS,
+            index=utils.MODEL_PROVIDERS.index(current_provider) if current_provider in utils.MODEL_PROVIDERS else 0,
+            help="'stub' answers offline with canned responses (no API key or quota), for testing and load tests."
+        )
+        m1, m2 = st.columns([2, 1])
+        with m1:
+            new_model = st.text_input(
+                "Model",
+                value=st.session_state.get('model_name') or utils.DEFAULT_MODEL_NAME
+            )
+        with m2:
+            new_temperature = st.slider(
+                "Temperature", 0.0, 2.0,
+                value=float(st.session_state.get('temperature', utils.DEFAULT_TEMPERATURE)),
+                step=0.1
+            )
         submitted = st.form_submit_button("Save Configuration")
         
         if submitted:
+            if new_key != current_key:
+                utils.release_model_client(current_key)
             st.session_state.api_key = new_key
+            st.session_state.model_provider = new_provider
+            st.session_state.model_name = new_model.strip() or utils.DEFAULT_MODEL_NAME
+            st.session_state.temperature = new_temperature
             st.success("Configuration Saved!")
             time.sleep(1)
             st.rerun()
@@ -73,11 +111,106 @@ def show():
     
     with col_sys:
         if st.button("Clear Cache & Reset"):
+            # Only stored answers are dropped: the job engine, admission controller, circuit breaker and
+            # router are shared live state that other sessions' running analyses depend on.
+            utils.get_result_cache().clear()
+            utils.get_translation_cache().clear()
+            utils.get_translation_failures().clear()
+            utils.get_phash_index().clear()
+            # The history stays listed, but nothing recorded before the reset answers a new request.
+            utils.get_history_store().stop_reuse()
             st.cache_data.clear()
-            st.cache_resource.clear()
             st.toast("System Reset Complete", icon="🧹")
             
     with col_info:
+        cache_stats = utils.get_result_cache().stats()
+        st.caption(
+            f"Result cache: {cache_stats['entries']} entries · "
+            f"{cache_stats['hits']} hits ({cache_stats['disk_hits']} from disk) · "
+            f"{cache_stats['misses']} misses"
+        )
+        translations = utils.get_translation_cache().stats()
+        st.caption(f"Translations: {translations['entries']} stored · {translations['hits']} reused")
+        uploads = utils.upload_store_stats()
+        st.caption(
+            f"Upload store: {uploads['bytes'] / 2**20:.1f} of {uploads['max_bytes'] / 2**20:.0f} MB · "
+            f"{uploads['entries']} photos from {uploads['sessions']} sessions · "
+            f"this session {uploads['session_bytes'] / 2**20:.1f} MB · {uploads['evictions']} evicted"
+        )
+        phash_index = utils.get_phash_index()
+        st.caption(f"Near-duplicate index: {len(phash_index)} photos · {phash_index.near_hits} reuses")
+        history = utils.get_history_store()
+        st.caption(f"Analysis history: {history.count()} analyses · {history.hits} answered from history")
+        governor = utils.get_admission_controller().stats()
+        st.caption(
+            f"Request queue: {governor['in_flight']} running · {governor['queued']} waiting · "
+            f"avg wait {governor['avg_wait']:.1f}s"
+        )
+        jobs = utils.get_job_engine().stats()
+        st.caption(
+            f"Background jobs: {jobs['running']} running · {jobs['queued']} queued · "
+            f"{jobs['stored']} stored · {jobs['failed']} failed"
+        )
+        gate = utils.get_quality_gate().stats()
+        st.caption(
+            f"Photo quality gate: {gate['rejected']} of {gate['checked']} rejected "
+            f"({gate['rejection_rate']:.0%}) · ~{gate['time_saved']:.0f}s of model time saved · "
+            f"{gate['avg_check_ms']:.0f} ms per check"
+        )
+        routing = utils.get_router().stats()
+        fast_p50, request_p50 = routing['fast_p50'], routing['request_p50']
+        st.caption(
+            f"Model routing: {routing['fast_calls']} fast · {routing['strong_calls']} strong calls · "
+            f"fast tier kept {routing['fast_hit_rate']:.0%} · "
+            f"p50 {request_p50 or 0:.1f}s (fast {fast_p50 or 0:.1f}s) · est. spend ${routing['spend']:.3f}"
+        )
+        prompts = utils.get_prompt_compiler().stats()
+        st.caption(
+            f"Prompt compiler: {prompts['variants']} variants (largest {prompts['largest_tokens']} tokens) · "
+            f"{prompts['prefixes']} cached prefixes · {prompts['fallbacks']} sent in full · "
+            f"{prompts['downscaled']} photos downscaled for the budget"
+        )
+        if utils.get_model_provider() == "stub":
+            st.caption(f"Offline stub backend: {utils.get_stub_backend().calls} calls served")
+        callers = {tier: utils.get_resilient_caller(tier) for tier in ("fast", "strong")}
+        circuits = " · ".join(f"{tier} {caller.breaker.state}" for tier, caller in callers.items())
+        hedged = sum(caller.hedged_calls for caller in callers.values())
+        st.caption(f"Model circuits: {circuits} · hedged calls: {hedged}")
         st.caption("Version 2.2.0 (Emerald UI)")
         st.caption("Rashtriya Gokul Mission")
     st.markdown('</div>', unsafe_allow_html=True)
+
+    # --- DIAGNOSTICS CARD ---
+    st.markdown('<div class="ui-card">', unsafe_allow_html=True)
+    st.subheader("📈 Diagnostics")
+    st.caption(
+        "Latency per step (decode, preprocess, queue, model, request, render) in seconds and image sizes "
+        "in bytes, by page and prompt, since the server started."
+    )
+    registry = utils.get_metrics()
+    histograms = registry.summary()
+    if histograms:
+        st.dataframe(histograms, hide_index=True, width="stretch", column_config={
+            column: st.column_config.NumberColumn(format="%.3f") for column in ("mean", "p50", "p95", "p99")
+        })
+    else:
+        st.info("No analyses have run yet.")
+    tokens = registry.counters()
+    if tokens:
+        st.dataframe(tokens, hide_index=True, width="stretch")
+        st.caption("Input tokens per page, and the share served from cached prompt prefixes:")
+        st.dataframe(utils.prompt_token_report(), hide_index=True, width="stretch", column_config={
+            "saved": st.column_config.NumberColumn(format="percent"),
+        })
+    export_note = []
+    if utils.METRICS_PORT:
+        export_note.append(f"scrape :{utils.METRICS_PORT}/metrics")
+    if utils.METRICS_FILE:
+        export_note.append(f"written to {utils.METRICS_FILE}")
+    st.download_button(
+        "Download Prometheus metrics", utils.prometheus_text, file_name="metrics.prom", mime="text/plain",
+        on_click="ignore"
+    )
+    if export_note:
+        st.caption("Prometheus: " + " · ".join(export_note))
+    st.markdown('</div>', unsafe_allow_html=True)
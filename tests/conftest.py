@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The app's modules live at the repository root, which is not an installed package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that import utils must not write the app's history database into the working tree.
+os.environ.setdefault("HISTORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="app-tests-"), "history.sqlite3"))
+# The offline stub backend answers at once unless a test asks for latency.
+os.environ.setdefault("STUB_LATENCY_SECONDS", "0")
+os.environ.setdefault("STUB_LATENCY_JITTER", "0")
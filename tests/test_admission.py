@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionTimeout
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def queued_request(controller, api_key, order, waits=None):
+    """Starts a thread that records api_key in order once admitted; returns once it is queued (or admitted)."""
+    before = controller.stats()["queued"]
+
+    def run():
+        on_wait = (lambda position, seconds: waits.append(position)) if waits is not None else None
+        with controller.admit(api_key, on_wait=on_wait):
+            order.append(api_key)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    wait_until(lambda: controller.stats()["queued"] > before or api_key in order)
+    return thread
+
+
+def test_requests_are_admitted_in_arrival_order():
+    controller = AdmissionController(max_concurrent=1, requests_per_minute=60000, poll_interval=0.01)
+    order = []
+    release = threading.Event()
+
+    def holder():
+        with controller.admit("key"):
+            release.wait()
+
+    blocker = threading.Thread(target=holder)
+    blocker.start()
+    wait_until(lambda: controller.stats()["in_flight"] == 1)
+    threads = [queued_request(controller, f"key{i}", order) for i in range(4)]
+    release.set()
+    for thread in [blocker] + threads:
+        thread.join(2)
+    assert order == ["key0", "key1", "key2", "key3"]
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_concurrency_cap_is_respected():
+    controller = AdmissionController(max_concurrent=2, requests_per_minute=60000, poll_interval=0.01)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        with controller.admit("key"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak[0] == 2
+    assert controller.stats()["admitted"] == 8
+
+
+def test_a_key_out_of_quota_does_not_block_other_keys():
+    # One request per minute and no burst: key "a" has a single token.
+    controller = AdmissionController(max_concurrent=4, requests_per_minute=1, burst=1, poll_interval=0.01)
+    with controller.admit("a"):
+        pass
+    order, waits = [], []
+    starved = queued_request(controller, "a", order, waits)
+    other = queued_request(controller, "b", order)
+    other.join(2)
+    assert order == ["b"]
+    wait_until(lambda: waits)
+    assert waits[0] == 1
+    assert starved.is_alive()
+    # Let the starved request finish instead of waiting a minute for its token.
+    controller._bucket("a")._tokens = 1.0
+    starved.join(2)
+    assert order == ["b", "a"]
+
+
+def test_queue_timeout():
+    controller = AdmissionController(max_concurrent=1, requests_per_minute=1, burst=1, poll_interval=0.01)
+    with controller.admit("a"):
+        pass
+    with pytest.raises(AdmissionTimeout):
+        with controller.admit("a", timeout=0.05):
+            pass
+    assert controller.stats()["queued"] == 0
@@ -0,0 +1,92 @@
+import pytest
+from PIL import Image
+
+import utils
+from backends import STUB_HEALTH_MARKER, StubBackend
+from prompts import DETAILED_BREED_PROMPT, FUN_FACTS_PROMPT, HEALTH_ALERT_JSON_PROMPT, HEALTH_ALERT_PROMPT
+from resilience import ModelTimeoutError, ModelUnavailableError, RateLimitedError
+from results import CombinedAnalysis, HealthResult
+
+
+def contents(prompt, image=b"photo-1"):
+    return [prompt, {"mime_type": "image/jpeg", "data": image}]
+
+
+@pytest.fixture
+def stub():
+    return StubBackend(latency=0, jitter=0)
+
+
+def test_answers_are_deterministic_per_image(stub):
+    first = stub.generate(contents(FUN_FACTS_PROMPT), "model", {}, timeout=5)
+    assert stub.generate(contents(FUN_FACTS_PROMPT), "model", {}, timeout=5) == first
+    assert "Breed:" in first
+
+
+def test_answers_follow_the_prompt_shape(stub):
+    assert stub.generate(contents(HEALTH_ALERT_PROMPT), "model", {}, timeout=5).startswith("STATUS:")
+    assert "Confidence Level:" in stub.generate(contents(DETAILED_BREED_PROMPT), "model", {}, timeout=5)
+
+
+def test_schema_requests_get_parseable_json(stub):
+    text = stub.generate(contents(HEALTH_ALERT_JSON_PROMPT), "model", {"response_schema": HealthResult.SCHEMA}, 5)
+    assert HealthResult.from_json(text).observation.startswith(STUB_HEALTH_MARKER)
+    combined = stub.generate(contents("Analyze."), "model", {"response_schema": CombinedAnalysis.SCHEMA}, 5)
+    assert CombinedAnalysis.from_json(combined).fun_facts
+
+
+def test_stream_yields_the_same_answer_in_chunks(stub):
+    chunks = list(stub.stream(contents(DETAILED_BREED_PROMPT), "model", {}, timeout=5))
+    assert len(chunks) > 1
+    assert "".join(chunks) == stub.generate(contents(DETAILED_BREED_PROMPT), "model", {}, timeout=5)
+
+
+def test_usage_is_estimated(stub):
+    usage = {}
+    stub.generate(contents(FUN_FACTS_PROMPT), "model", {}, timeout=5, usage=usage)
+    assert usage["prompt_tokens"] > 258 and usage["output_tokens"] > 0 and usage["cached_tokens"] == 0
+
+
+def test_registered_prefixes_count_as_cached(stub):
+    handle = stub.register_prefix(FUN_FACTS_PROMPT, "model", ttl=60)
+    usage = {}
+    text = stub.generate(contents(""), "model", {}, timeout=5, usage=usage, cached_prefix=handle)
+
+    assert text == stub.generate(contents(FUN_FACTS_PROMPT), "model", {}, timeout=5)
+    assert usage["cached_tokens"] > 0
+
+
+@pytest.mark.parametrize("rates, error", [
+    ({"error_rate": 1}, ModelUnavailableError),
+    ({"rate_limit_rate": 1}, RateLimitedError),
+    ({"timeout_rate": 1}, ModelTimeoutError),
+])
+def test_configured_failures_are_raised(rates, error):
+    with pytest.raises(error):
+        StubBackend(latency=0, jitter=0, **rates).generate(contents(FUN_FACTS_PROMPT), "model", {}, timeout=0.01)
+
+
+def test_failures_replay_with_the_same_seed():
+    def outcomes(seed):
+        backend = StubBackend(latency=0, jitter=0, error_rate=0.5, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                results.append(bool(backend.generate(contents(FUN_FACTS_PROMPT), "model", {}, timeout=5)))
+            except ModelUnavailableError:
+                results.append(False)
+        return results
+
+    assert outcomes(7) == outcomes(7)
+    assert outcomes(7) != outcomes(8)
+
+
+def test_app_runs_offline_on_the_stub(monkeypatch):
+    monkeypatch.setattr(utils, "DEFAULT_MODEL_PROVIDER", "stub")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    image = Image.new("RGB", (400, 400), (200, 180, 40))
+    info = {}
+
+    result = utils.get_gemini_response(image, HEALTH_ALERT_JSON_PROMPT, result_type=HealthResult, info=info)
+    assert isinstance(result, HealthResult)
+    assert info["model"].startswith("stub:")
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from batch_cli import RowWriter, load_checkpoint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_photos(folder, names):
+    for i in names:
+        Image.effect_noise((320, 240), 40 + i * 10).convert("RGB").save(os.path.join(folder, f"cow{i}.jpg"))
+
+
+def run_batch(tmp_path, folder, out, metrics_file=""):
+    env = dict(
+        os.environ, MODEL_PROVIDER="stub", STUB_LATENCY_SECONDS="0", STUB_LATENCY_JITTER="0",
+        HISTORY_DB_PATH=str(tmp_path / "history.db"), RESULT_CACHE_DIR=str(tmp_path / "cache"),
+        METRICS_PORT="0", METRICS_FILE=metrics_file,
+    )
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT, "batch_cli.py"), str(folder), "--out", str(out), "--decoders", "2"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+
+def read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rerun_skips_photos_finished_by_the_first_run(tmp_path):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    write_photos(folder, range(3))
+    out = tmp_path / "triage.jsonl"
+
+    first = run_batch(tmp_path, folder, out)
+    assert first.returncode == 0, first.stderr
+    rows = read_rows(out)
+    assert sorted(row["outcome"] for row in rows) == ["ok"] * 3
+    assert load_checkpoint(str(out) + ".done") == {row["sha256"] for row in rows}
+
+    write_photos(folder, [3])
+    second = run_batch(tmp_path, folder, out)
+    assert second.returncode == 0, second.stderr
+    rows = read_rows(out)
+    assert len(rows) == 4
+    assert rows[-1]["path"].endswith("cow3.jpg")
+    assert "'skip': 3" in second.stderr
+
+
+def metric_total(text, name):
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.split("{")[0].split(" ")[0] == name)
+
+
+def test_worker_metrics_reach_the_parent_once(tmp_path):
+    folder = tmp_path / "photos"
+    folder.mkdir()
+    write_photos(folder, range(3))
+    Image.new("RGB", (320, 240)).save(folder / "dark.jpg")
+    metrics_file = tmp_path / "metrics.prom"
+
+    result = run_batch(tmp_path, folder, tmp_path / "rows.jsonl", str(metrics_file))
+    assert result.returncode == 0, result.stderr
+    text = metrics_file.read_text()
+    assert metric_total(text, "app_quality_gate_checked") == 4
+    assert metric_total(text, "app_quality_gate_rejected") == 1
+    # Each accepted photo is preprocessed once, in a worker, and counted once by the parent.
+    assert metric_total(text, "app_preprocess_seconds_count") == 3
+    assert "ScriptRunContext" not in result.stderr
+
+
+def test_errors_are_not_checkpointed(tmp_path):
+    out, checkpoint = str(tmp_path / "rows.jsonl"), str(tmp_path / "rows.done")
+    writer = RowWriter(out, checkpoint)
+    writer.write({"path": "a.jpg", "sha256": "aaa", "outcome": "ok"})
+    writer.write({"path": "b.jpg", "sha256": "bbb", "outcome": "error", "error": "boom"})
+    writer.write({"path": "c.jpg", "sha256": "ccc", "outcome": "rejected", "error": "Too dark."})
+    writer.close()
+    assert load_checkpoint(checkpoint) == {"aaa", "ccc"}
+    assert [row["outcome"] for row in read_rows(out)] == ["ok", "error", "rejected"]
@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from frame_select import BestFrames, compose_frames, frame_score, select_video_frames, subject_coverage
+
+
+def noise(shape, seed=0):
+    return np.random.default_rng(seed).uniform(0, 255, size=shape).astype(np.float32)
+
+
+def test_coverage_counts_textured_cells():
+    pixels = np.full((64, 64), 128, dtype=np.float32)
+    pixels[:32] = noise((32, 64))
+
+    assert subject_coverage(pixels) == pytest.approx(0.5)
+    assert subject_coverage(np.zeros((64, 64), dtype=np.float32)) == 0.0
+
+
+def test_sharp_full_frame_outscores_a_flat_one():
+    flat = np.full((64, 64), 128, dtype=np.float32)
+    assert frame_score(noise((64, 64))) > frame_score(flat)
+
+
+def test_best_frames_keeps_the_top_frames_apart_in_time():
+    best = BestFrames(keep=2, min_gap=1.0)
+    for score, timestamp in [(1, 0.0), (5, 0.5), (3, 2.0), (2, 4.0), (4, 4.2)]:
+        if best.wants(score, timestamp):
+            best.add(score, timestamp, f"frame@{timestamp}")
+
+    assert best.offered == 5
+    # 0.5 s displaces the weaker frame within min_gap of it; 4.2 s outscores 2.0 s; 4.0 s never enters.
+    assert best.images(min_ratio=0) == ["frame@0.5", "frame@4.2"]
+
+
+def test_weak_frames_are_left_out():
+    best = BestFrames(keep=2, min_gap=1.0)
+    best.add(10, 0.0, "sharp")
+    best.add(1, 5.0, "blurry")
+
+    assert best.images() == ["sharp"]
+
+
+def test_compose_frames_places_frames_side_by_side():
+    canvas = compose_frames([Image.new("RGB", (100, 50)), Image.new("RGB", (40, 100))], gap=8)
+    assert canvas.size == (100 + 8 + 20, 50)
+    single = Image.new("RGB", (10, 10))
+    assert compose_frames([single]) is single
+
+
+def clip(frames=12, fps=6, size=(160, 120)):
+    """An MPEG-4 clip whose middle frame is the only textured one."""
+    av = pytest.importorskip("av")
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format="mp4") as container:
+        stream = container.add_stream("mpeg4", rate=fps)
+        stream.width, stream.height, stream.pix_fmt = size[0], size[1], "yuv420p"
+        for i in range(frames):
+            pixels = noise((size[1], size[0], 3), seed=i) if i == frames // 2 else np.full((size[1], size[0], 3), 128)
+            frame = av.VideoFrame.from_ndarray(pixels.astype(np.uint8), format="rgb24")
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode(None))
+    return buffer.getvalue()
+
+
+def test_video_selection_returns_only_the_textured_frame():
+    images = select_video_frames(clip(), keep=2, sample_fps=6)
+
+    # The flat frames score far below the textured one and are left out.
+    assert len(images) == 1
+    assert images[0].size == (160, 120)
+    assert np.asarray(images[0].convert("L")).std() > 20
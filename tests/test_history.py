@@ -0,0 +1,104 @@
+import csv
+import io
+import os
+import sqlite3
+import time
+
+import pytest
+
+from history import HistoryStore, summarize
+
+HEALTHY = "STATUS: HEALTHY\nBreed: Gir\nConfidence Level: High\nLooks well."
+
+
+def make_store(tmp_path, **kwargs):
+    return HistoryStore(str(tmp_path / "history.sqlite3"), **kwargs)
+
+
+def test_summarize_reads_status_breed_and_confidence():
+    assert summarize(HEALTHY) == ("HEALTHY", "Gir", "High")
+    assert summarize("Nothing recognizable.") == (None, None, None)
+
+
+def test_lookup_returns_latest_answer_within_max_age(tmp_path):
+    store = make_store(tmp_path, max_age=60)
+    store.record("k", "img", "health", "English", "first")
+    store.record("k", "img", "health", "English", "second")
+    assert store.lookup("k") == "second"
+    assert store.lookup("other") is None
+    store.max_age = 0
+    time.sleep(0.01)
+    assert store.lookup("k") is None
+
+
+def test_stop_reuse_persists_but_keeps_rows_listed(tmp_path):
+    store = make_store(tmp_path)
+    store.record("k", "img", "health", "English", HEALTHY)
+    store.stop_reuse()
+    reopened = make_store(tmp_path)
+    assert reopened.lookup("k") is None
+    assert reopened.count() == 1
+
+
+def test_breed_filter_is_exact_and_case_insensitive(tmp_path):
+    store = make_store(tmp_path)
+    store.record("a", "1", "facts", "English", "Breed: Gir")
+    store.record("b", "2", "facts", "English", "Breed: Giriraj")
+    store.record("c", "3", "facts", "English", "Breed: G%r")
+    assert [row["breed"] for row in store.page(breed="gir")] == ["Gir"]
+    assert store.count(breed="G%") == 0
+    assert store.breeds() == ["G%r", "Gir", "Giriraj"]
+
+
+def test_old_databases_gain_the_model_column(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE analyses (id INTEGER PRIMARY KEY, request_key TEXT NOT NULL, image_hash TEXT NOT NULL, "
+            "prompt_type TEXT NOT NULL, language TEXT NOT NULL, status TEXT, breed TEXT, confidence TEXT, "
+            "response TEXT NOT NULL, thumbnail BLOB, latency REAL, created REAL NOT NULL)"
+        )
+    store = HistoryStore(path)
+    store.record("k", "img", "health", "English", HEALTHY, model="stub:gemini")
+    assert store.page()[0]["model"] == "stub:gemini"
+
+
+def test_export_is_capped_to_the_newest_rows(tmp_path):
+    store = make_store(tmp_path)
+    for i in range(5):
+        store.record(f"k{i}", f"img{i}", "health", "English", f"answer {i}")
+    out = io.StringIO()
+    store.export_csv(out, limit=2)
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [row["response"] for row in rows] == ["answer 3", "answer 4"]
+
+
+def test_export_download_converts_to_bytes(tmp_path, monkeypatch):
+    pytest.importorskip("streamlit")
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+    import history_page
+    import utils
+
+    store = make_store(tmp_path)
+    store.record("k", "img", "health", "English", HEALTHY, model="gemini")
+    monkeypatch.setattr(utils, "get_history_store", lambda: store)
+    data, _ = convert_data_to_bytes_and_infer_mime(history_page.export_csv({}), TypeError("unsupported"))
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+    assert len(rows) == 1 and rows[0]["status"] == "HEALTHY" and rows[0]["model"] == "gemini"
+
+
+def test_default_database_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    import utils
+
+    assert utils.APP_DATA_DIR == os.path.join(os.path.dirname(os.path.abspath(utils.__file__)), "data")
+    monkeypatch.delenv("HISTORY_DB_PATH")
+    monkeypatch.delenv("RESULT_CACHE_DIR", raising=False)
+    monkeypatch.setattr(utils, "APP_DATA_DIR", str(tmp_path / "app" / "data"))
+    monkeypatch.chdir(tmp_path)
+    utils.get_history_store.clear()
+    try:
+        assert utils.get_history_store().path == str(tmp_path / "app" / "data" / "history.sqlite3")
+    finally:
+        utils.get_history_store.clear()
+    assert not (tmp_path / "data").exists()
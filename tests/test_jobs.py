@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from jobs import Job, JobEngine, JobStoreFull
+
+
+def wait_done(engine, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not engine.get(job_id).done:
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.005)
+    return engine.get(job_id)
+
+
+def test_result_and_failure_are_recorded():
+    engine = JobEngine(max_workers=2)
+    ok = wait_done(engine, engine.submit(lambda job: 42))
+    failed = wait_done(engine, engine.submit(lambda job: 1 / 0))
+    assert (ok.status, ok.result, ok.finished is not None) == (Job.DONE, 42, True)
+    assert failed.status == Job.FAILED and isinstance(failed.error, ZeroDivisionError)
+    assert engine.stats()["failed"] == 1
+
+
+def test_finished_jobs_expire_after_ttl():
+    engine = JobEngine(max_workers=1, ttl_seconds=0.05)
+    first = engine.submit(lambda job: "old")
+    wait_done(engine, first)
+    time.sleep(0.06)
+    engine.submit(lambda job: "new")
+    assert engine.get(first) is None
+    assert engine.stats()["expired"] == 1
+
+
+def test_capacity_drops_oldest_finished_job():
+    engine = JobEngine(max_workers=2, max_jobs=2, ttl_seconds=60)
+    first = engine.submit(lambda job: 1)
+    second = engine.submit(lambda job: 2)
+    wait_done(engine, first)
+    wait_done(engine, second)
+    third = engine.submit(lambda job: 3)
+    assert engine.get(first) is None
+    assert engine.get(second) is not None and engine.get(third) is not None
+
+
+def test_store_full_of_unfinished_jobs_rejects_new_ones():
+    release = threading.Event()
+    engine = JobEngine(max_workers=1, max_jobs=2)
+    ids = [engine.submit(lambda job: release.wait(2)) for _ in range(2)]
+    with pytest.raises(JobStoreFull):
+        engine.submit(lambda job: None)
+    release.set()
+    for job_id in ids:
+        wait_done(engine, job_id)
+
+
+def test_queue_position_of_jobs_waiting_for_a_worker():
+    release = threading.Event()
+    engine = JobEngine(max_workers=1)
+    ids = [engine.submit(lambda job: release.wait(2)) for _ in range(3)]
+    deadline = time.monotonic() + 2
+    while engine.get(ids[0]).status != Job.RUNNING:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    assert [engine.queue_position(job_id) for job_id in ids] == [None, 1, 2]
+    release.set()
+    for job_id in ids:
+        wait_done(engine, job_id)
+    assert engine.queue_position(ids[2]) is None
@@ -0,0 +1,48 @@
+import pytest
+
+from metrics import Histogram, MetricsRegistry
+
+
+def test_quantiles_interpolate_within_buckets():
+    histogram = Histogram(range(10, 101, 10))
+    for value in range(1, 101):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == pytest.approx(50, abs=1)
+    assert histogram.quantile(0.95) == pytest.approx(95, abs=1)
+    assert histogram.quantile(0.99) == pytest.approx(99, abs=1)
+
+
+def test_quantiles_are_clamped_to_observed_values():
+    histogram = Histogram((1, 10, 100))
+    histogram.observe(7)
+    assert histogram.quantile(0.01) == 7
+    assert histogram.quantile(0.99) == 7
+    histogram.observe(500)
+    assert histogram.quantile(1.0) == 500
+
+
+def test_empty_histogram_has_no_quantile():
+    assert Histogram((1, 2)).quantile(0.5) is None
+
+
+def test_registry_prometheus_output():
+    registry = MetricsRegistry()
+    registry.observe("model_seconds", 0.3, page="health")
+    registry.inc("prompt_tokens_total", 120, page="health")
+    text = registry.to_prometheus(gauges={"jobs_running": 2})
+    assert 'app_model_seconds_bucket{page="health",le="0.5"} 1' in text
+    assert 'app_model_seconds_count{page="health"} 1' in text
+    assert 'app_prompt_tokens_total{page="health"} 120' in text
+    assert "app_jobs_running 2" in text
+
+
+def test_drained_snapshot_merges_into_another_registry():
+    worker, parent = MetricsRegistry(), MetricsRegistry()
+    parent.observe("preprocess_seconds", 0.2, page="batch_cli")
+    worker.observe("preprocess_seconds", 0.4, page="batch_cli")
+    worker.inc("photos_total", 2)
+    parent.merge(worker.drain())
+    assert worker.summary() == [] and worker.counters() == []
+    [row] = parent.summary()
+    assert row["count"] == 2 and row["mean"] == pytest.approx(0.3)
+    assert parent.counters() == [{"metric": "photos_total", "value": 2}]
@@ -0,0 +1,115 @@
+import random
+
+from PIL import Image
+
+import utils
+from phash_index import MultiIndexHash, PerceptualIndex, hamming
+from prompts import FUN_FACTS_PROMPT
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def brute_force(entries, query, limit):
+    distances = [hamming(h, query) for h in entries]
+    best = min(distances)
+    return best if best <= limit else None
+
+
+def test_radius_search_matches_brute_force():
+    rng = random.Random(7)
+    for max_distance in (0, 2, 4, 6):
+        index = MultiIndexHash(max_distance)
+        entries = [rng.getrandbits(64) for _ in range(2000)]
+        for i, h in enumerate(entries):
+            index.add(h, i)
+        for _ in range(400):
+            query = flip_bits(rng.choice(entries), rng.randint(0, max_distance + 3), rng)
+            found = index.nearest(query)
+            expected = brute_force(entries, query, max_distance)
+            if expected is None:
+                assert found is None
+            else:
+                assert found is not None and found[1] == expected
+                assert hamming(entries[found[0]], query) == expected
+
+
+def test_every_hash_within_the_radius_is_found():
+    # Worst case for the pigeonhole split: the differing bits spread over every chunk but one.
+    rng = random.Random(3)
+    index = MultiIndexHash(4)
+    stored = rng.getrandbits(64)
+    index.add(stored, "cow")
+    for _ in range(500):
+        assert index.nearest(flip_bits(stored, 4, rng)) == ("cow", 4)
+        assert index.nearest(flip_bits(stored, 5, rng)) is None
+
+
+def test_narrower_query_radius_and_updates():
+    index = MultiIndexHash(4)
+    index.add(0b1111, "a")
+    assert index.nearest(0b0000) == ("a", 4)
+    assert index.nearest(0b0000, max_distance=3) is None
+    index.add(0b1111, "b")
+    assert len(index) == 1
+    assert index.nearest(0b1111) == ("b", 0)
+
+
+def test_perceptual_index_scopes_and_replay(tmp_path):
+    path = str(tmp_path / "index.tsv")
+    index = PerceptualIndex(path=path, max_distance=4)
+    index.add("health", 0xFF, "key1")
+    assert index.find("health", 0xFE) == ("key1", 1)
+    assert index.find("facts", 0xFF) is None
+    replayed = PerceptualIndex(path=path, max_distance=4)
+    assert replayed.find("health", 0xFF) == ("key1", 0)
+    assert len(replayed) == 1
+
+
+def test_log_is_compacted_when_replayed(tmp_path):
+    path = tmp_path / "index.tsv"
+    index = PerceptualIndex(path=str(path))
+    for value in ("old", "newer", "newest"):
+        index.add("health", 0xFF, value)
+
+    replayed = PerceptualIndex(path=str(path))
+    assert replayed.find("health", 0xFF) == ("newest", 0)
+    assert path.read_text().splitlines() == ["health\t00000000000000ff\tnewest"]
+
+
+def test_log_is_rewritten_once_mostly_repeats(tmp_path, monkeypatch):
+    monkeypatch.setattr(PerceptualIndex, "MIN_COMPACT_LINES", 4)
+    path = tmp_path / "index.tsv"
+    index = PerceptualIndex(path=str(path))
+    for i in range(20):
+        index.add("health", i % 3, f"key{i}")
+
+    assert len(path.read_text().splitlines()) <= 2 * 4
+    assert PerceptualIndex(path=str(path)).find("health", 1) == ("key19", 0)
+
+
+def test_oldest_entries_are_dropped_beyond_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(PerceptualIndex, "MIN_COMPACT_LINES", 4)
+    index = PerceptualIndex(path=str(tmp_path / "index.tsv"), max_distance=0, max_entries=5)
+    for i in range(50):
+        index.add("health", i, f"key{i}")
+
+    assert len(index) <= 10
+    assert index.find("health", 0) is None
+    assert index.find("health", 49) == ("key49", 0)
+    assert len(PerceptualIndex(path=str(tmp_path / "index.tsv"), max_entries=5)) == 5
+
+
+def test_near_duplicate_answers_keep_their_provenance(monkeypatch):
+    monkeypatch.setattr(utils, "DEFAULT_MODEL_PROVIDER", "stub")
+    original, similar = Image.new("RGB", (400, 400), (10, 20, 30)), Image.new("RGB", (400, 400), (11, 20, 30))
+    answer = utils.get_gemini_response(original, FUN_FACTS_PROMPT)
+
+    for _ in range(2):
+        info = {}
+        assert utils.get_gemini_response(similar, FUN_FACTS_PROMPT, info=info) == answer
+        assert info["source"] == "near_duplicate"
+    assert utils.get_result_cache().get(utils._build_request(similar, FUN_FACTS_PROMPT).cache_key) is None
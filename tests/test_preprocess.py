@@ -0,0 +1,58 @@
+import io
+
+from PIL import Image
+
+import utils
+
+
+def encoded(image, format, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def decode(prepared):
+    return Image.open(io.BytesIO(prepared.data))
+
+
+def test_large_photo_is_downscaled_to_a_jpeg():
+    prepared = utils.preprocess_image(encoded(Image.new("RGB", (3000, 2000), (90, 140, 60)), "PNG"), max_edge=1024)
+
+    assert prepared.mime_type == "image/jpeg"
+    assert max(prepared.width, prepared.height) <= 1024
+    assert decode(prepared).format == "JPEG"
+    assert decode(prepared).size == (prepared.width, prepared.height)
+
+
+def test_transparency_is_flattened_onto_white():
+    prepared = utils.preprocess_image(encoded(Image.new("RGBA", (300, 300), (0, 0, 0, 0)), "PNG"))
+
+    assert decode(prepared).mode == "RGB"
+    assert min(decode(prepared).getpixel((150, 150))) > 245
+
+
+def test_exif_orientation_is_applied():
+    exif = Image.Exif()
+    exif[utils.EXIF_ORIENTATION] = 6  # rotated 90 degrees
+    prepared = utils.preprocess_image(encoded(Image.new("RGB", (400, 200)), "JPEG", exif=exif))
+
+    assert (prepared.width, prepared.height) == (200, 400)
+
+
+def test_small_upright_jpeg_is_sent_unchanged():
+    image = encoded(Image.new("RGB", (400, 300), (200, 30, 30)), "JPEG", quality=95)
+    original = bytes(image.fp.getbuffer())
+
+    prepared = utils.preprocess_image(image, max_edge=1024)
+    assert prepared.data == original
+    assert prepared.source_bytes == len(original)
+
+
+def test_digest_and_phash_identify_the_payload():
+    image = Image.new("RGB", (500, 500), (10, 120, 200))
+    first = utils.preprocess_image(encoded(image, "PNG"))
+    second = utils.preprocess_image(encoded(image, "PNG"))
+
+    assert first.digest == second.digest
+    assert first.phash == second.phash
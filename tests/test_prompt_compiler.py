@@ -0,0 +1,78 @@
+import pytest
+
+from backends import ModelBackend, StubBackend
+from prompt_compiler import IMAGE_TILE_TOKENS, PromptCompiler, estimate_tokens, image_tokens
+from resilience import TokenBudgetError
+
+INSTRUCTION = "\n\nAnswer in {language}."
+PROMPT = "Describe the animal. " * 400  # about 2,100 tokens, enough for a context cache
+
+
+class FailingBackend(ModelBackend):
+    name = "failing"
+
+    def __init__(self):
+        self.attempts = 0
+
+    def register_prefix(self, prefix, model_name, ttl):
+        self.attempts += 1
+        raise RuntimeError("caching not enabled for this project")
+
+
+def test_variants_share_the_static_prefix():
+    compiler = PromptCompiler(INSTRUCTION)
+    english, hindi = compiler.compile(PROMPT, "English"), compiler.compile(PROMPT, "Hindi")
+
+    assert english.prefix == hindi.prefix == PROMPT
+    assert hindi.text == PROMPT + "\n\nAnswer in Hindi."
+    assert hindi.tokens == estimate_tokens(PROMPT) + estimate_tokens(hindi.suffix)
+    assert compiler.compile(PROMPT, "Hindi") is hindi
+    assert compiler.stats()["variants"] == 2
+
+
+def test_image_tokens_follow_the_tile_sizes():
+    assert image_tokens(300, 200) == IMAGE_TILE_TOKENS
+    assert image_tokens(1024, 768) == 2 * IMAGE_TILE_TOKENS
+
+
+def test_image_is_shrunk_to_fit_the_budget():
+    compiled = PromptCompiler(INSTRUCTION).compile("Short prompt.", "English")
+
+    assert PromptCompiler(INSTRUCTION).edge_for_budget(compiled, 1024) == 1024
+    compiler = PromptCompiler(INSTRUCTION, budget=compiled.tokens + IMAGE_TILE_TOKENS)
+    assert compiler.edge_for_budget(compiled, 1024) == 768  # one tile
+    assert compiler.stats()["downscaled"] == 1
+
+
+def test_request_over_budget_is_rejected():
+    compiler = PromptCompiler(INSTRUCTION, budget=100)
+    with pytest.raises(TokenBudgetError):
+        compiler.edge_for_budget(compiler.compile(PROMPT, "English"), 1024)
+
+
+def test_prefix_is_registered_once_per_model():
+    compiler = PromptCompiler(INSTRUCTION)
+    backend = StubBackend(latency=0, jitter=0)
+    compiled = compiler.compile(PROMPT, "English")
+
+    handle = compiler.prefix_handle(backend, "model-a", compiled)
+    assert handle is not None
+    assert compiler.prefix_handle(backend, "model-a", compiler.compile(PROMPT, "Hindi")) == handle
+    assert compiler.prefix_handle(backend, "model-b", compiled) != handle
+    assert compiler.stats()["registrations"] == 2
+
+
+def test_short_prefixes_are_sent_in_full():
+    compiler = PromptCompiler(INSTRUCTION)
+    assert compiler.prefix_handle(StubBackend(), "model", compiler.compile("Short prompt.", "English")) is None
+
+
+def test_failed_registration_is_not_retried_right_away():
+    compiler = PromptCompiler(INSTRUCTION, retry_seconds=600)
+    backend = FailingBackend()
+    compiled = compiler.compile(PROMPT, "English")
+
+    assert compiler.prefix_handle(backend, "model", compiled) is None
+    assert compiler.prefix_handle(backend, "model", compiled) is None
+    assert backend.attempts == 1
+    assert compiler.stats()["fallbacks"] == 1
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from quality_gate import QualityGate, QualityThresholds, laplacian_variance, score_image
+
+
+def textured(size=(600, 400), seed=0):
+    """A sharp, evenly exposed photo stand-in: mid-grey noise."""
+    pixels = np.random.default_rng(seed).integers(60, 200, size=(size[1], size[0], 3), dtype=np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def test_sharp_well_exposed_photo_passes():
+    report = score_image(textured())
+    assert report.passed
+    assert (report.width, report.height) == (600, 400)
+
+
+def test_blurry_photo_is_rejected():
+    report = score_image(textured().filter(ImageFilter.GaussianBlur(8)))
+    assert not report.passed
+    assert "blurry" in report.issues[0]
+
+
+@pytest.mark.parametrize("level, word", [(5, "too dark"), (250, "overexposed")])
+def test_badly_exposed_photo_is_rejected(level, word):
+    report = score_image(Image.new("RGB", (600, 400), (level, level, level)),
+                         QualityThresholds(min_sharpness=0))
+    assert any(word in issue for issue in report.issues)
+
+
+def test_tiny_photo_is_rejected():
+    report = score_image(textured(size=(120, 90)))
+    assert any("120×90" in issue for issue in report.issues)
+
+
+def test_flat_image_has_no_laplacian_variance():
+    assert laplacian_variance(np.full((20, 20), 128, dtype=np.float32)) == 0.0
+
+
+def test_gate_counts_rejections_and_estimates_time_saved():
+    gate = QualityGate(call_seconds=10.0)
+    gate.check(textured())
+    gate.check(textured().filter(ImageFilter.GaussianBlur(8)))
+    gate.observe_call(5.0)
+
+    stats = gate.stats()
+    assert (stats["checked"], stats["rejected"]) == (2, 1)
+    assert stats["rejection_rate"] == 0.5
+    assert stats["time_saved"] == pytest.approx(0.8 * 10.0 + 0.2 * 5.0)
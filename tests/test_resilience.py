@@ -0,0 +1,207 @@
+import threading
+import time
+
+import pytest
+
+from resilience import (
+    CircuitBreaker, CircuitOpenError, ModelRequestError, ModelTimeoutError, ModelUnavailableError, RateLimitedError,
+    RecentFailures, ResilientCaller, RetryPolicy, classify_exception,
+)
+
+
+class FakeModel:
+    """Callable standing in for a model call: fails with the queued errors, then answers."""
+
+    def __init__(self, errors=(), answer="ok", delay=0.0):
+        self.errors = list(errors)
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, timeout):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if self.delay:
+            time.sleep(self.delay)
+        if error is not None:
+            raise error
+        return self.answer
+
+
+def make_caller(max_attempts=3, failure_threshold=5, reset_timeout=30.0, deadline=5.0, hedge=False):
+    return ResilientCaller(
+        policy=RetryPolicy(max_attempts=max_attempts, base_delay=0.001, max_delay=0.002),
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout),
+        deadline=deadline,
+        hedge=hedge,
+    )
+
+
+# --- Retries ---
+def test_retries_transient_errors_until_success():
+    model = FakeModel(errors=[ModelUnavailableError(), RateLimitedError()])
+    info = {}
+    assert make_caller().call(model, info=info) == "ok"
+    assert model.calls == 3
+    assert info["attempts"] == 3
+
+
+def test_gives_up_after_max_attempts_with_attempt_count():
+    model = FakeModel(errors=[ModelUnavailableError()] * 5)
+    with pytest.raises(ModelUnavailableError) as raised:
+        make_caller(max_attempts=3).call(model)
+    assert model.calls == 3
+    assert raised.value.attempts == 3
+
+
+def test_does_not_retry_non_retryable_errors():
+    model = FakeModel(errors=[ModelRequestError("bad request")])
+    with pytest.raises(ModelRequestError) as raised:
+        make_caller().call(model)
+    assert model.calls == 1
+    assert raised.value.attempts == 1
+
+
+def test_sdk_exceptions_are_classified():
+    model = FakeModel(errors=[ConnectionError("reset"), TimeoutError()])
+    assert make_caller().call(model) == "ok"
+    assert isinstance(classify_exception(ConnectionError()), ModelUnavailableError)
+    assert isinstance(classify_exception(TimeoutError()), ModelTimeoutError)
+    assert isinstance(classify_exception(ValueError()), ModelRequestError)
+
+
+def test_backoff_delay_is_bounded():
+    policy = RetryPolicy(base_delay=0.5, max_delay=2.0)
+    assert all(0 <= policy.delay(attempt) <= 2.0 for attempt in range(10) for _ in range(20))
+
+
+# --- Deadline ---
+def test_deadline_bounds_a_slow_call():
+    model = FakeModel(delay=1.0)
+    started = time.monotonic()
+    with pytest.raises(ModelTimeoutError):
+        make_caller(deadline=0.1).call(model)
+    assert time.monotonic() - started < 0.5
+
+
+def test_deadline_stops_retrying():
+    model = FakeModel(errors=[ModelUnavailableError()] * 100, delay=0.05)
+    started = time.monotonic()
+    with pytest.raises((ModelUnavailableError, ModelTimeoutError)):
+        make_caller(max_attempts=100, deadline=0.2).call(model)
+    assert time.monotonic() - started < 0.6
+    assert model.calls < 100
+
+
+# --- Circuit breaker ---
+def test_breaker_opens_after_consecutive_failures_and_fails_fast():
+    caller = make_caller(max_attempts=1, failure_threshold=2)
+    model = FakeModel(errors=[ModelUnavailableError()] * 2)
+    for _ in range(2):
+        with pytest.raises(ModelUnavailableError):
+            caller.call(model)
+    assert caller.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        caller.call(model)
+    assert model.calls == 2
+
+
+def test_breaker_half_opens_after_timeout_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_non_retryable_errors_do_not_trip_the_breaker():
+    caller = make_caller(failure_threshold=1)
+    with pytest.raises(ModelRequestError):
+        caller.call(FakeModel(errors=[ModelRequestError()]))
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+# --- Hedging ---
+def test_hedges_a_call_slower_than_p95():
+    caller = make_caller(hedge=True)
+    for _ in range(20):
+        caller.latency.add(0.01)
+    calls = []
+    lock = threading.Lock()
+
+    def model(timeout):
+        with lock:
+            calls.append(timeout)
+            first = len(calls) == 1
+        if first:
+            time.sleep(1.0)
+            return "slow"
+        return "hedged"
+
+    info = {}
+    started = time.monotonic()
+    assert caller.call(model, info=info) == "hedged"
+    assert time.monotonic() - started < 0.5
+    assert caller.hedged_calls == 1
+    assert info["hedged"] is True
+
+
+def test_no_hedge_without_latency_history():
+    caller = make_caller(hedge=True)
+    model = FakeModel(delay=0.05)
+    assert caller.call(model) == "ok"
+    assert caller.hedged_calls == 0
+    assert model.calls == 1
+
+
+def test_recent_failures_raise_a_copy_until_they_expire(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("resilience.time.monotonic", lambda: now)
+    failures = RecentFailures(retry_seconds=60)
+    original = RateLimitedError("quota", attempts=3)
+    failures.record("key", original)
+
+    with pytest.raises(RateLimitedError) as raised:
+        failures.check("key")
+    assert raised.value is not original
+    assert (str(raised.value), raised.value.attempts) == ("quota", 0)
+    now += 60
+    failures.check("key")
+
+
+def test_recent_failures_are_safe_to_share_between_threads():
+    failures = RecentFailures(retry_seconds=0)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(500):
+                failures.record(f"{n}-{i}", ModelUnavailableError("down"))
+                failures.check(f"{n}-{i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,57 @@
+import os
+
+from result_cache import ResultCache, make_key
+
+
+def test_make_key_separates_parts():
+    assert make_key("a", "bc") != make_key("ab", "c")
+    assert make_key("photo", 1) == make_key("photo", "1")
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = ResultCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = ResultCache(ttl_seconds=10)
+    now = 1000.0
+    monkeypatch.setattr("result_cache.time.time", lambda: now)
+    cache.set("a", "1")
+
+    now += 11
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).set("a", "answer")
+
+    cache = ResultCache(disk_dir=str(tmp_path))
+    assert cache.get("a") == "answer"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_is_pruned_to_max_disk_entries(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path), max_disk_entries=10)
+    for i in range(50):
+        cache.set(f"key{i}", "x")
+
+    assert len(os.listdir(tmp_path)) == 10
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.set("a", "1")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert os.listdir(tmp_path) == []
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from results import CombinedAnalysis, Confidence, HealthResult, HealthStatus, ResultParseError
+
+HEALTH = {"status": "warning", "observation": " Ribs visible. ", "recommendation": "Monitor", "confidence": "High"}
+
+
+def test_health_result_parses_and_normalizes():
+    result = HealthResult.from_json(json.dumps(HEALTH))
+
+    assert result.status is HealthStatus.WARNING
+    assert result.confidence is Confidence.HIGH
+    assert result.observation == "Ribs visible."
+
+
+def test_health_result_round_trips():
+    result = HealthResult.from_json(json.dumps(HEALTH))
+    assert HealthResult.from_dict(result.to_dict()).to_dict() == result.to_dict()
+
+
+def test_missing_confidence_counts_as_low():
+    data = {key: value for key, value in HEALTH.items() if key != "confidence"}
+    assert HealthResult.from_dict(data).confidence is Confidence.LOW
+
+
+@pytest.mark.parametrize("text", ["not json", "[1, 2]", json.dumps({**HEALTH, "status": "FINE"}),
+                                  json.dumps({"status": "HEALTHY"})])
+def test_invalid_health_responses_raise_parse_errors(text):
+    with pytest.raises(ResultParseError):
+        HealthResult.from_json(text)
+
+
+def test_statuses_sort_most_urgent_first():
+    assert sorted([HealthStatus.HEALTHY, HealthStatus.CRITICAL, HealthStatus.WARNING]) == [
+        HealthStatus.CRITICAL, HealthStatus.WARNING, HealthStatus.HEALTHY]
+
+
+def test_combined_analysis_round_trips():
+    data = {"health": HEALTH, "fun_facts": "Breed: Gir", "detailed": "Confidence Level: High"}
+    analysis = CombinedAnalysis.from_json(json.dumps(data))
+
+    assert analysis.health.status is HealthStatus.WARNING
+    assert CombinedAnalysis.from_dict(analysis.to_dict()).to_dict() == analysis.to_dict()
+
+
+def test_combined_analysis_needs_every_part():
+    with pytest.raises(ResultParseError):
+        CombinedAnalysis.from_json(json.dumps({"health": HEALTH, "fun_facts": "Breed: Gir"}))
@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import utils
+from prompts import DETAILED_BREED_PROMPT, FUN_FACTS_PROMPT, HEALTH_ALERT_JSON_PROMPT, HEALTH_ALERT_PROMPT
+from resilience import ImageRejectedError, InvalidResponseError, ModelRequestError, TokenBudgetError
+from results import Confidence, HealthResult, HealthStatus
+from routing import TierRouter
+
+TIERS = ("fast-model", "strong-model")
+
+
+def health(status, confidence=Confidence.HIGH):
+    return HealthResult(status=status, observation="", recommendation="", confidence=confidence)
+
+
+@pytest.fixture
+def router():
+    return TierRouter(fast_model="fast-model")
+
+
+def test_routes_only_known_prompts(router):
+    assert router.routes(HEALTH_ALERT_JSON_PROMPT)
+    assert not router.routes("Describe this photo.")
+
+
+def test_health_answers_escalate_on_status_and_confidence(router):
+    assert router.escalation_reason(HEALTH_ALERT_JSON_PROMPT, health(HealthStatus.HEALTHY)) is None
+    assert router.escalation_reason(HEALTH_ALERT_JSON_PROMPT, health(HealthStatus.CRITICAL)) == "status"
+    assert router.escalation_reason(
+        HEALTH_ALERT_JSON_PROMPT, health(HealthStatus.HEALTHY, Confidence.LOW)) == "low_confidence"
+    assert router.escalation_reason(HEALTH_ALERT_JSON_PROMPT, "not parsed") == "unparsed"
+
+
+def test_text_answers_escalate_on_their_deciding_line(router):
+    assert router.escalation_reason(HEALTH_ALERT_PROMPT, "STATUS: HEALTHY\nAll good.") is None
+    assert router.escalation_reason(HEALTH_ALERT_PROMPT, "STATUS: WARNING\nThin.") == "status"
+    assert router.escalation_reason(DETAILED_BREED_PROMPT, "Confidence Level: Low") == "low_confidence"
+    assert router.escalation_reason(DETAILED_BREED_PROMPT, "Confidence Level: High") is None
+    assert router.escalation_reason(FUN_FACTS_PROMPT, "No breed here") == "unparsed"
+
+
+def test_stream_is_decided_once_the_deciding_line_arrives(router):
+    assert router.stream_reason(DETAILED_BREED_PROMPT, "Breed: Gir\n", complete=False) == (False, None)
+    assert router.stream_reason(DETAILED_BREED_PROMPT, "Confidence Level: High", complete=False) == (True, None)
+    assert router.stream_reason(FUN_FACTS_PROMPT, "Facts without a breed", complete=True) == (True, "unparsed")
+
+
+def test_accounting(router):
+    router.record_call(router.FAST, 0.1)
+    router.record_outcome(None)
+    router.record_call(router.FAST, 0.1)
+    router.record_outcome("status")
+    router.record_call(router.STRONG, 1.0)
+
+    stats = router.stats()
+    assert (stats["fast_calls"], stats["strong_calls"]) == (2, 1)
+    assert stats["fast_hit_rate"] == 0.5
+    assert stats["escalations"] == {"status": 1}
+    assert stats["spend"] == pytest.approx(2 * 0.0002 + 0.002)
+
+
+# --- Escalation through utils ---
+def answering(failures=None, answers=None):
+    """attempt_on for _call_tiers: each tier fails with failures[tier] or answers answers[tier]."""
+    calls = []
+
+    def attempt_on(model_name, tier):
+        def attempt(timeout):
+            calls.append(tier)
+            if tier in (failures or {}):
+                raise failures[tier]
+            text = (answers or {}).get(tier, "Breed: Gir")
+            return text, text
+        return attempt
+    return attempt_on, calls
+
+
+def test_fast_tier_failure_escalates_to_the_strong_tier():
+    attempt_on, calls = answering(failures={"fast": ModelRequestError("404 model retired")})
+    info = {}
+
+    assert utils._call_tiers(FUN_FACTS_PROMPT, TIERS, attempt_on, info) == ("Breed: Gir", "Breed: Gir")
+    assert calls == ["fast", "strong"]
+    assert info["tier"] == "strong"
+
+
+def test_unparsed_fast_answer_escalates():
+    attempt_on, calls = answering(failures={"fast": InvalidResponseError("bad json")})
+
+    utils._call_tiers(FUN_FACTS_PROMPT, TIERS, attempt_on, {})
+    assert calls == ["fast", "strong"]
+
+
+@pytest.mark.parametrize("error", [ImageRejectedError("blurry"), TokenBudgetError("too big")])
+def test_request_errors_are_not_escalated(error):
+    attempt_on, calls = answering(failures={"fast": error})
+
+    with pytest.raises(type(error)):
+        utils._call_tiers(FUN_FACTS_PROMPT, TIERS, attempt_on, {})
+    assert calls == ["fast"]
+
+
+def test_each_tier_has_its_own_circuit_breaker():
+    fast, strong = utils.get_resilient_caller("fast"), utils.get_resilient_caller("strong")
+    assert fast is not strong
+    assert fast.breaker is not strong.breaker
+
+
+# --- Streaming ---
+def fast_stream(chunks, error=None):
+    """open_stream for _open_fast_stream: yields chunks, then raises error if one is given."""
+    state = {"closed": False}
+
+    def generate():
+        try:
+            yield from chunks
+            if error is not None:
+                raise error
+        finally:
+            state["closed"] = True
+
+    def open_stream(timeout):
+        stream = generate()
+        return stream, next(stream, None)
+    return open_stream, state
+
+
+def test_accepted_fast_stream_replays_what_was_read_and_streams_the_rest():
+    open_stream, _ = fast_stream(["Primary Breed: Gir\n", "Confidence Level: High\n", "Origin: Gujarat"])
+
+    reason, chunks = utils._open_fast_stream(DETAILED_BREED_PROMPT, open_stream, {})
+    assert reason is None
+    assert list(chunks) == ["Primary Breed: Gir\n", "Confidence Level: High\n", "Origin: Gujarat"]
+
+
+def test_doubtful_fast_stream_is_closed_and_escalated():
+    open_stream, state = fast_stream(["Confidence Level: Low\n", "more text"])
+
+    assert utils._open_fast_stream(DETAILED_BREED_PROMPT, open_stream, {}) == ("low_confidence", None)
+    assert state["closed"]
+
+
+def test_fast_stream_failing_before_it_is_decided_escalates():
+    open_stream, _ = fast_stream(["Primary Breed: Gir\n"], error=TimeoutError("read timed out"))
+
+    assert utils._open_fast_stream(DETAILED_BREED_PROMPT, open_stream, {}) == ("error", None)
+
+
+def test_stub_streams_routed_prompts_from_the_fast_tier(monkeypatch):
+    monkeypatch.setattr(utils, "DEFAULT_MODEL_PROVIDER", "stub")
+    image = Image.fromarray(np.random.default_rng(1).integers(0, 255, (400, 400, 3), dtype=np.uint8))
+    info = {}
+
+    chunks = list(utils.stream_gemini_response(image, FUN_FACTS_PROMPT, info))
+    assert len(chunks) > 1
+    assert info["tier"] == "fast"
+    assert utils.get_result_cache().get(utils._build_request(image, FUN_FACTS_PROMPT).cache_key) == "".join(chunks)
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+import utils
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_reset_drops_stored_answers_but_keeps_shared_services():
+    services = (utils.get_job_engine(), utils.get_admission_controller(), utils.get_resilient_caller(),
+                utils.get_router())
+    utils.get_result_cache().set("key", "answer")
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    app.run()
+    app.sidebar.radio(key="navigation").set_value("Settings")
+    app.run()
+    next(b for b in app.button if b.label == "Clear Cache & Reset").click()
+    app.run()
+
+    assert not app.exception
+    assert utils.get_result_cache().get("key") is None
+    assert (utils.get_job_engine(), utils.get_admission_controller(), utils.get_resilient_caller(),
+            utils.get_router()) == services
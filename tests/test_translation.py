@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import streamlit as st
+from PIL import Image
+
+import utils
+from prompts import FUN_FACTS_PROMPT
+from resilience import ModelUnavailableError
+from results import Confidence, HealthResult, HealthStatus
+
+
+@pytest.fixture(autouse=True)
+def stub(monkeypatch):
+    monkeypatch.setattr(utils, "DEFAULT_MODEL_PROVIDER", "stub")
+    yield utils.get_stub_backend()
+    st.session_state.pop("language", None)
+
+
+def test_translations_are_cached_by_text_and_language_pair(stub):
+    calls = stub.calls
+    text = "Breed: Gir\nA hardy dairy breed from Gujarat."
+
+    translated = utils.translate_response(text, "English", "Hindi")
+    assert translated.startswith("*[Hindi]*") and "Gir" in translated
+    assert utils.translate_response(text, "English", "Hindi") == translated
+    assert stub.calls == calls + 1
+    assert utils.translate_response(text, "English", "English") is text
+
+
+def test_structured_results_are_translated_into_the_same_type():
+    result = HealthResult(HealthStatus.WARNING, "Ribs are visible.", "Monitor", Confidence.MEDIUM)
+
+    translated = utils.translate_response(result, "English", "Marathi")
+    assert isinstance(translated, HealthResult)
+    assert translated.status is HealthStatus.WARNING
+
+
+def test_failed_translations_fail_fast_with_a_fresh_error(monkeypatch):
+    calls = []
+
+    def failing(*args):
+        calls.append(args)
+        raise ModelUnavailableError("translation model down")
+
+    monkeypatch.setattr(utils, "_call_translation", failing)
+    with pytest.raises(ModelUnavailableError) as first:
+        utils.translate_response("Breed: Sahiwal", "English", "Punjabi")
+    with pytest.raises(ModelUnavailableError) as second:
+        utils.translate_response("Breed: Sahiwal", "English", "Punjabi")
+
+    assert len(calls) == 1
+    assert second.value is not first.value
+    assert str(second.value) == "translation model down"
+    utils.get_translation_failures().clear()
+
+
+def test_language_switch_translates_instead_of_analyzing_again(stub):
+    image = Image.fromarray(np.random.default_rng(2).integers(0, 255, (400, 400, 3), dtype=np.uint8))
+    english = utils.get_gemini_response(image, FUN_FACTS_PROMPT)
+    calls = stub.calls
+
+    st.session_state["language"] = "Gujarati"
+    info = {}
+    gujarati = utils.get_gemini_response(image, FUN_FACTS_PROMPT, info=info)
+
+    assert info["source"] == "translation" and info["from_language"] == "English"
+    assert gujarati.startswith("*[Gujarati]*") and english.strip() in gujarati
+    assert stub.calls == calls + 1
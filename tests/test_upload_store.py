@@ -0,0 +1,69 @@
+import hashlib
+import io
+
+from PIL import Image
+
+from upload_store import UploadStore
+
+
+def jpeg(size=(800, 600), color=(120, 90, 60)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_same_upload_is_stored_once_for_every_session():
+    store = UploadStore()
+    data = jpeg()
+
+    digest = store.put(data, owner="a")
+    assert store.put(data, owner="b") == digest == hashlib.sha256(data).hexdigest()
+    assert store.get(digest) == data
+    stats = store.stats(owner="a")
+    assert (stats["entries"], stats["sessions"], stats["bytes"]) == (1, 2, len(data))
+    assert stats["session_bytes"] == len(data)
+
+
+def test_open_decodes_the_shared_bytes():
+    store = UploadStore()
+    digest = store.put(jpeg(size=(320, 240)))
+
+    assert store.open(digest).size == (320, 240)
+    assert store.open("missing") is None
+
+
+def test_thumbnails_are_made_once_and_counted():
+    store = UploadStore()
+    digest = store.put(jpeg())
+
+    thumbnail = store.thumbnail(digest, 128)
+    assert max(Image.open(io.BytesIO(thumbnail)).size) <= 128
+    assert store.thumbnail(digest, 128) is thumbnail
+    assert store.stats()["bytes"] == len(store.get(digest)) + len(thumbnail)
+
+
+def test_least_recently_used_uploads_are_evicted_over_budget():
+    uploads = [jpeg(color=(i * 40, 0, 0)) for i in range(3)]
+    store = UploadStore(max_bytes=sum(len(data) for data in uploads) - 1)
+    first, second = store.put(uploads[0]), store.put(uploads[1])
+    store.get(first)
+    store.put(uploads[2])
+
+    assert store.get(second) is None
+    assert store.get(first) is not None
+    assert store.evictions == 1
+
+
+def test_uploads_are_freed_when_their_last_session_ends():
+    alive = {"a", "b"}
+    store = UploadStore(is_alive=alive.__contains__, sweep_seconds=0)
+    shared = store.put(jpeg(), owner="a")
+    store.put(jpeg(), owner="b")
+    own = store.put(jpeg(color=(0, 0, 200)), owner="b")
+
+    alive.discard("b")
+    store.put(jpeg(color=(0, 200, 0)), owner="a")
+
+    assert store.get(own) is None
+    assert store.get(shared) is not None
+    assert store.stats()["sessions"] == 1
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_thumbnail(data, edge, quality=80):
+    """Display-sized, upright RGB JPEG of an encoded image."""
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    # The JPEG decoder can skip most of the pixels of a large photo.
+    image.draft("RGB", (edge, edge))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((edge, edge))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class _Entry:
+    __slots__ = ("data", "thumbnails", "owners")
+
+    def __init__(self, data):
+        self.data = data
+        self.thumbnails = {}
+        self.owners = set()
+
+    @property
+    def size(self):
+        return len(self.data) + sum(len(t) for t in self.thumbnails.values())
+
+
+class UploadStore:
+    """Uploaded photos shared by every session, keyed by content hash, within a byte budget.
+
+    A photo's encoded bytes are kept once however many sessions upload it,
+    with display-sized thumbnails made on first use, so reruns neither
+    decode the full image again nor send it to the browser at full size.
+    `open()` returns a lazily decoded PIL image over the shared bytes.
+
+    Entries are evicted least recently used once the total passes
+    max_bytes, and dropped when every session that uploaded them has ended:
+    `is_alive(owner)` is checked at most every sweep_seconds.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, is_alive=None, sweep_seconds=30.0):
+        self.max_bytes = max_bytes
+        self.is_alive = is_alive
+        self.sweep_seconds = sweep_seconds
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def put(self, data, owner=None, digest=None):
+        """Stores an upload for owner (a session id, or None) and returns its SHA-256 digest."""
+        digest = digest or hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                entry = self._entries[digest] = _Entry(bytes(data))
+                self._bytes += entry.size
+            else:
+                self._entries.move_to_end(digest)
+            if owner is not None:
+                entry.owners.add(owner)
+            self._evict()
+        self._maybe_sweep()
+        return digest
+
+    def get(self, digest):
+        """The encoded bytes of a stored upload, or None if it was evicted."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            return entry.data
+
+    def open(self, digest):
+        """A PIL image over the stored bytes (decoded only when used), or None."""
+        from PIL import Image
+
+        data = self.get(digest)
+        return Image.open(io.BytesIO(data)) if data is not None else None
+
+    def thumbnail(self, digest, edge):
+        """JPEG thumbnail of a stored upload no larger than edge, made once; None if evicted."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            thumbnail = entry.thumbnails.get(edge)
+            if thumbnail is not None:
+                self._entries.move_to_end(digest)
+                return thumbnail
+            data = entry.data
+        thumbnail = make_thumbnail(data, edge)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and edge not in entry.thumbnails:
+                entry.thumbnails[edge] = thumbnail
+                self._bytes += len(thumbnail)
+                self._entries.move_to_end(digest)
+                self._evict()
+        return thumbnail
+
+    def _evict(self):
+        # The most recent entry always stays, even if it alone is over budget.
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    # --- Sessions ---
+    def release(self, owner):
+        """Forgets owner's uploads; ones no other session holds are freed."""
+        with self._lock:
+            for digest, entry in list(self._entries.items()):
+                if owner in entry.owners:
+                    entry.owners.discard(owner)
+                    if not entry.owners:
+                        del self._entries[digest]
+                        self._bytes -= entry.size
+
+    def _maybe_sweep(self):
+        if self.is_alive is None or time.monotonic() - self._last_sweep < self.sweep_seconds:
+            return
+        self._last_sweep = time.monotonic()
+        with self._lock:
+            owners = set().union(*(entry.owners for entry in self._entries.values()))
+        for owner in owners:
+            if not self.is_alive(owner):
+                self.release(owner)
+
+    def stats(self, owner=None):
+        """Global usage, plus the bytes held for owner (shared photos count in full)."""
+        with self._lock:
+            entries = list(self._entries.values())
+            return {
+                "entries": len(entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "thumbnails": sum(len(entry.thumbnails) for entry in entries),
+                "sessions": len(set().union(*(entry.owners for entry in entries))),
+                "evictions": self.evictions,
+                "session_bytes": sum(entry.size for entry in entries if owner in entry.owners),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -1,8 +1,41 @@
 import streamlit as st
-import google.generativeai as genai
+import contextlib
+import functools
+import hashlib
+import io
+import itertools
+import json
+import logging
+import operator
 import os
+import re
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from admission import AdmissionController, AdmissionTimeout
+from backends import GeminiBackend, StubBackend
+from jobs import Job, JobEngine, JobStoreFull
+from metrics import SIZE_BUCKETS, MetricsRegistry, current_page
+from prompt_compiler import PromptCompiler
+from prompts import COMBINED_ANALYSIS_PROMPT, PROMPT_TYPES, TRANSLATION_PROMPT
+from resilience import (
+    CircuitBreaker, ImageRejectedError, InvalidResponseError, MissingApiKeyError, ModelError, ModelTimeoutError,
+    ModelUnavailableError, RecentFailures, ResilientCaller, RetryPolicy, TokenBudgetError, classify_exception,
+)
+from result_cache import ResultCache, make_key
+from results import CombinedAnalysis, Confidence, HealthStatus, ResultParseError
+
+logger = logging.getLogger(__name__)
 
 # --- CONSTANTS ---
+# Default home of the app's local data; not the working directory, so the app and batch_cli.py share it.
+APP_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
 HELPLINE_NUMBERS = {
     "All India (Kisan Call Center)": "1800-180-1551",
     "Andhra Pradesh": "1962",
@@ -18,47 +51,44 @@ HELPLINE_NUMBERS = {
 }
 
 # --- THEME MANAGER (GLOBAL CSS) ---
-def apply_theme():
-    """Applies a global design system using CSS variables."""
-    
-    # Define Color Palettes
-    if st.session_state.get('theme') == 'dark':
-        # Dark Theme (Slate & Emerald)
-        colors = {
-            "bg": "#0f172a",           # Deep Slate
-            "card_bg": "#1e293b",      # Lighter Slate
-            "text": "#f8fafc",         # White-ish
-            "sub_text": "#94a3b8",     # Grey text
-            "border": "#334155",       # Slate Border
-            "primary": "#34d399",      # Bright Emerald
-            "primary_hover": "#10b981",
-            "input_bg": "#020617",     # Almost Black
-            "input_text": "#ffffff",
-            "success_bg": "#064e3b",
-            "success_border": "#059669",
-            "danger_bg": "#450a0a",
-            "danger_border": "#dc2626"
-        }
-    else:
-        # Light Theme (Clean White & Emerald)
-        colors = {
-            "bg": "#f0f2f5",           # Light Grey-Blue
-            "card_bg": "#ffffff",      # Pure White
-            "text": "#1e293b",         # Dark Slate
-            "sub_text": "#64748b",     # Grey text
-            "border": "#e2e8f0",       # Light Border
-            "primary": "#059669",      # Emerald Green
-            "primary_hover": "#047857",
-            "input_bg": "#ffffff",
-            "input_text": "#000000",
-            "success_bg": "#ecfdf5",
-            "success_border": "#34d399",
-            "danger_bg": "#fef2f2",
-            "danger_border": "#f87171"
-        }
-
-    # Inject CSS
-    st.markdown(f"""
+THEME_PALETTES = {
+    # Dark Theme (Slate & Emerald)
+    "dark": {
+        "bg": "#0f172a",           # Deep Slate
+        "card_bg": "#1e293b",      # Lighter Slate
+        "text": "#f8fafc",         # White-ish
+        "sub_text": "#94a3b8",     # Grey text
+        "border": "#334155",       # Slate Border
+        "primary": "#34d399",      # Bright Emerald
+        "primary_hover": "#10b981",
+        "input_bg": "#020617",     # Almost Black
+        "input_text": "#ffffff",
+        "success_bg": "#064e3b",
+        "success_border": "#059669",
+        "danger_bg": "#450a0a",
+        "danger_border": "#dc2626"
+    },
+    # Light Theme (Clean White & Emerald)
+    "light": {
+        "bg": "#f0f2f5",           # Light Grey-Blue
+        "card_bg": "#ffffff",      # Pure White
+        "text": "#1e293b",         # Dark Slate
+        "sub_text": "#64748b",     # Grey text
+        "border": "#e2e8f0",       # Light Border
+        "primary": "#059669",      # Emerald Green
+        "primary_hover": "#047857",
+        "input_bg": "#ffffff",
+        "input_text": "#000000",
+        "success_bg": "#ecfdf5",
+        "success_border": "#34d399",
+        "danger_bg": "#fef2f2",
+        "danger_border": "#f87171"
+    }
+}
+
+def _render_stylesheet(colors):
+    """Builds the global design system stylesheet for one palette."""
+    return f"""
         <style>
         /* --- GLOBAL VARIABLES --- */
         :root {{
@@ -194,25 +224,1282 @@ def apply_theme():
             border-right: 1px solid var(--border-color);
         }}
         </style>
-    """, unsafe_allow_html=True)
+    """
+
+@functools.lru_cache(maxsize=None)
+def theme_stylesheet(theme):
+    """Stylesheet for a theme, rendered once per process.
+
+    Returning the identical string on every rerun also lets Streamlit's
+    forward-message cache (see .streamlit/config.toml) replace the repeated
+    element with a short hash reference on the websocket.
+    """
+    css = _render_stylesheet(THEME_PALETTES.get(theme, THEME_PALETTES['light']))
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    return re.sub(r"\s+", " ", css).replace("> <", "><").strip()
+
+def apply_theme():
+    """Applies a global design system using CSS variables."""
+    st.markdown(theme_stylesheet(st.session_state.get('theme', 'light')), unsafe_allow_html=True)
+
+# --- RESULT CACHE ---
+# How long any stored answer (cache, translations, history) may be reused for the same request.
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide response cache shared by all sessions."""
+    return ResultCache(
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+        ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+        disk_dir=os.getenv("RESULT_CACHE_DIR") or None,
+        max_disk_entries=int(os.getenv("RESULT_CACHE_MAX_DISK_ENTRIES", "5000")),
+    )
+
+# --- METRICS & TRACING ---
+# Prometheus export: METRICS_PORT serves /metrics, METRICS_FILE is rewritten every METRICS_FILE_SECONDS.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_FILE_SECONDS = float(os.getenv("METRICS_FILE_SECONDS", "15"))
+
+# Guarded at module level: a st.cache_resource.clear() must not start them again.
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+def _start_metrics_exporters():
+    """Starts the Prometheus exporters once per process; they always render the current registry."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    import metrics
+
+    if METRICS_PORT:
+        try:
+            metrics.serve(prometheus_text, METRICS_PORT)
+        except OSError as e:
+            logger.error("Could not serve metrics on port %d: %s", METRICS_PORT, e)
+    if METRICS_FILE:
+        metrics.write_periodically(prometheus_text, METRICS_FILE, METRICS_FILE_SECONDS)
+
+def disable_metrics_export():
+    """Keeps this process from starting exporters, e.g. in worker processes whose parent exports their metrics."""
+    global _exporters_started
+    with _exporters_lock:
+        _exporters_started = True
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide latency histograms and token/byte counters, labelled by page and prompt."""
+    _start_metrics_exporters()
+    return MetricsRegistry()
+
+def trace(name, **labels):
+    """Times a block into the `<name>_seconds` histogram, labelled with the current page."""
+    return get_metrics().span(name, **labels)
+
+def prompt_label(prompt):
+    return PROMPT_TYPES.get(prompt, "custom")
+
+def prometheus_text():
+    """All metrics in the Prometheus text format, with the shared services' counters as gauges."""
+    gauges = {}
+    for prefix, stats in (
+        ("result_cache", get_result_cache().stats()),
+        ("admission", get_admission_controller().stats()),
+        ("jobs", get_job_engine().stats()),
+        ("quality_gate", get_quality_gate().stats()),
+        ("router", get_router().stats()),
+        ("upload_store", get_upload_store().stats()),
+        ("prompt_compiler", get_prompt_compiler().stats()),
+    ):
+        gauges.update(
+            (f"{prefix}_{name}", value) for name, value in stats.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        )
+    return get_metrics().to_prometheus(gauges=gauges)
+
+# --- IMAGE PREPROCESSING ---
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+PreparedImage = namedtuple(
+    "PreparedImage", ["data", "mime_type", "width", "height", "source_bytes", "digest", "phash"]
+)
+
+EXIF_ORIENTATION = 0x0112
+
+def _source_size(image):
+    """Best-effort size of the encoded upload behind a PIL image."""
+    fp = getattr(image, "fp", None)
+    if fp is not None and hasattr(fp, "getbuffer"):
+        return fp.getbuffer().nbytes
+    return image.width * image.height * len(image.getbands())
+
+def _passthrough_bytes(image, max_edge):
+    """The upload's own bytes when it is already an upright RGB JPEG within max_edge, else None."""
+    fp = getattr(image, "fp", None)
+    if (image.format != "JPEG" or image.mode != "RGB" or max(image.size) > max_edge
+            or fp is None or not hasattr(fp, "getbuffer")):
+        return None
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        return None
+    return bytes(fp.getbuffer())
+
+def preprocess_image(image, max_edge=None, quality=None):
+    """Normalizes an upload into a compact RGB JPEG ready for the model."""
+    from PIL import Image, ImageOps
+    from phash_index import dhash
+
+    max_edge = max_edge or IMAGE_MAX_EDGE
+    quality = quality or IMAGE_JPEG_QUALITY
+    source_bytes = _source_size(image)
+    # Re-encoding a JPEG that already fits would only lose detail, so it is sent as is.
+    passthrough = _passthrough_bytes(image, max_edge)
+
+    with trace("decode"):
+        # Let the JPEG decoder downscale by a power of two while decoding.
+        if image.format == "JPEG":
+            image.draft("RGB", (max_edge, max_edge))
+
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        else:
+            image.load()
+
+    with trace("preprocess"):
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+        if passthrough is not None:
+            data = passthrough
+        else:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+            data = buffer.getvalue()
+
+    registry = get_metrics()
+    registry.observe("source_bytes", source_bytes, buckets=SIZE_BUCKETS, page=current_page.get())
+    registry.observe("payload_bytes", len(data), buckets=SIZE_BUCKETS, page=current_page.get())
+
+    logger.info(
+        "Preprocessed image to %dx%d: %d -> %d bytes (saved %d)",
+        image.width, image.height, source_bytes, len(data), source_bytes - len(data),
+    )
+    return PreparedImage(
+        data=data,
+        mime_type="image/jpeg",
+        width=image.width,
+        height=image.height,
+        source_bytes=source_bytes,
+        digest=hashlib.sha256(data).hexdigest(),
+        phash=dhash(image),
+    )
+
+# --- QUALITY GATE ---
+@st.cache_resource
+def get_quality_gate():
+    """Process-wide local photo check (sharpness, exposure, resolution) run before any model call."""
+    from quality_gate import QualityGate, QualityThresholds
+
+    return QualityGate(
+        thresholds=QualityThresholds(
+            min_edge=int(os.getenv("QUALITY_MIN_EDGE", "224")),
+            min_sharpness=float(os.getenv("QUALITY_MIN_SHARPNESS", "40")),
+            max_dark_fraction=float(os.getenv("QUALITY_MAX_DARK_FRACTION", "0.6")),
+            max_bright_fraction=float(os.getenv("QUALITY_MAX_BRIGHT_FRACTION", "0.6")),
+        ),
+        call_seconds=float(os.getenv("QUALITY_GATE_CALL_SECONDS", "8")),
+    )
+
+def _check_quality(data):
+    """Runs the gate on a fresh decode of the upload bytes, leaving the caller's image untouched."""
+    from PIL import Image
+
+    return get_quality_gate().check(Image.open(io.BytesIO(data)))
+
+def check_upload_quality(uploaded_file):
+    """Returns the QualityReport for an upload, checked once per session and photo."""
+    reports = st.session_state.setdefault('quality_reports', {})
+    key = upload_digest(uploaded_file)
+    report = reports.get(key)
+    if report is None:
+        report = _check_quality(uploaded_file.getvalue())
+        _store_bounded(reports, key, report)
+    return report
+
+def show_quality_feedback(report):
+    """Explains why a photo was rejected locally and how to retake it."""
+    st.warning("📷 This photo was not sent for analysis:\n\n" + "\n".join(f"- {issue}" for issue in report.issues))
+
+# --- UPLOAD STORE ---
+DISPLAY_EDGE = int(os.getenv("DISPLAY_IMAGE_EDGE", "720"))
+
+def _session_alive(session_id):
+    from streamlit import runtime
+
+    return not runtime.exists() or runtime.get_instance().is_active_session(session_id)
+
+@st.cache_resource
+def get_upload_store():
+    """Uploads shared by all sessions by content hash, with display thumbnails, within UPLOAD_STORE_MAX_MB."""
+    from upload_store import UploadStore
+
+    return UploadStore(
+        max_bytes=int(float(os.getenv("UPLOAD_STORE_MAX_MB", "256")) * 1024 * 1024),
+        is_alive=_session_alive,
+    )
+
+def _session_id():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+def store_upload(uploaded_file):
+    """Adds an upload to the shared store on behalf of this session and returns its digest."""
+    digest = upload_digest(uploaded_file)
+    get_upload_store().put(uploaded_file.getvalue(), owner=_session_id(), digest=digest)
+    return digest
+
+def open_upload(uploaded_file):
+    """A lazily decoded PIL image of an upload, over the store's shared copy of its bytes."""
+    from PIL import Image
+
+    return get_upload_store().open(store_upload(uploaded_file)) or Image.open(uploaded_file)
+
+def show_upload(uploaded_file, caption=None):
+    """Shows an upload as a display-sized thumbnail instead of the full-resolution photo."""
+    show_stored_image(store_upload(uploaded_file), caption)
+
+def show_stored_image(digest, caption=None):
+    thumbnail = get_upload_store().thumbnail(digest, DISPLAY_EDGE)
+    if thumbnail is not None:
+        st.image(thumbnail, width="stretch", caption=caption)
+
+def upload_store_stats():
+    """Upload store usage overall and, as session_bytes, for this session."""
+    return get_upload_store().stats(_session_id())
+
+# --- CAMERA & VIDEO INPUT ---
+VIDEO_TYPES = ['mp4', 'mov', 'webm', 'm4v']
+VIDEO_KEEP_FRAMES = int(os.getenv("VIDEO_KEEP_FRAMES", "2"))
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", "3"))
+VIDEO_MAX_SECONDS = float(os.getenv("VIDEO_MAX_SECONDS", "60"))
+
+class FrameUpload(io.BytesIO):
+    """The best frame(s) of a clip as a JPEG that pages treat like an uploaded photo."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+def is_video(uploaded_file):
+    return uploaded_file.name.rsplit(".", 1)[-1].lower() in VIDEO_TYPES
+
+def clip_to_upload(uploaded_file):
+    """Picks the sharpest, best-filled frames of a clip (once per session) and returns them as a FrameUpload.
+
+    Two frames are placed side by side so the animal still costs one model
+    call. Returns None, with a notice, when no frame could be decoded.
+    """
+    frames = st.session_state.setdefault('video_frames', {})
+    key = upload_digest(uploaded_file)
+    if key in frames:
+        return frames[key]
+
+    from frame_select import compose_frames, select_video_frames
+
+    with st.spinner("Picking the clearest frames from your clip..."):
+        try:
+            images = select_video_frames(
+                uploaded_file.getvalue(), keep=VIDEO_KEEP_FRAMES,
+                sample_fps=VIDEO_SAMPLE_FPS, max_seconds=VIDEO_MAX_SECONDS,
+            )
+        except ImportError:
+            st.info("Video input needs the PyAV package (`pip install av`). Please upload a photo instead.")
+            return None
+        except Exception as e:
+            logger.warning("Could not decode clip %s: %s", uploaded_file.name, e)
+            images = []
+    if not images:
+        st.error("⚠️ Could not read any frames from this clip. Try another video or a photo.")
+        return None
+
+    buffer = io.BytesIO()
+    compose_frames(images).save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+    upload = FrameUpload(buffer.getvalue(), uploaded_file.name.rsplit(".", 1)[0] + "_frames.jpg")
+    _store_bounded(frames, key, upload)
+    return upload
+
+def media_input(page, key, types):
+    """Photo upload, camera snapshot or short clip; returns a file-like photo or None.
+
+    Clips are reduced locally to their best frame(s) before anything else sees them.
+    """
+    source = st.radio(
+        "Source", ["Upload Photo", "Camera", "Video Clip"], horizontal=True, key=f"{key}_source",
+        label_visibility="collapsed"
+    )
+    if source == "Camera":
+        return st.camera_input(
+            "Take a photo", key=f"{key}_cam", on_change=forget_removed_upload, args=(page, f"{key}_cam")
+        )
+    if source == "Video Clip":
+        clip = st.file_uploader(
+            "Upload a short clip", type=VIDEO_TYPES, key=f"{key}_clip",
+            on_change=forget_removed_upload, args=(page, f"{key}_clip")
+        )
+        return clip_to_upload(clip) if clip else None
+    return st.file_uploader(
+        "Upload Image", type=types, key=key, on_change=forget_removed_upload, args=(page, key)
+    )
+
+# --- MODEL CLIENT REGISTRY ---
+DEFAULT_MODEL_NAME = os.getenv("GEMINI_MODEL", 'gemini-2.5-flash-preview-09-2025')
+DEFAULT_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "1.0"))
+
+def _close_when_unused(client):
+    # Other sessions' in-flight calls may still hold a client the pool drops (on release or
+    # eviction), so its transport is closed only once nothing refers to the client any more.
+    weakref.finalize(client, client.transport.close)
+    return client
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_model_client(api_key):
+    """One Gemini transport per API key, shared by all sessions so connections stay warm."""
+    from google.ai import generativelanguage as glm
+    return _close_when_unused(glm.GenerativeServiceClient(client_options={"api_key": api_key}))
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_cache_client(api_key):
+    """Context-cache client for one API key, so prompt prefixes are cached in that key's project."""
+    from google.ai import generativelanguage as glm
+    return _close_when_unused(glm.CacheServiceClient(client_options={"api_key": api_key}))
+
+def release_model_client(api_key):
+    """Drops the pooled clients for a key that is no longer in use; each closes after its last call."""
+    if api_key:
+        get_model_client.clear(api_key)
+        get_cache_client.clear(api_key)
+
+def get_model_settings():
+    """Returns the model name and generation config selected for this session."""
+    model_name = _provider_model(st.session_state.get('model_name') or DEFAULT_MODEL_NAME)
+    generation_config = {"temperature": st.session_state.get('temperature', DEFAULT_TEMPERATURE)}
+    return model_name, generation_config
+
+def _provider_model(model_name):
+    provider = get_model_provider()
+    # Keeps offline answers out of the cache scope of real model results.
+    return model_name if provider == "gemini" else f"{provider}:{model_name}"
+
+def _generation_config(result_type=None):
+    model_name, generation_config = get_model_settings()
+    if result_type is not None:
+        generation_config.update(
+            response_mime_type="application/json",
+            response_schema=result_type.SCHEMA,
+        )
+    return model_name, generation_config
+
+# --- MODEL BACKENDS ---
+MODEL_PROVIDERS = ["gemini", "stub"]
+DEFAULT_MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "gemini")
+
+def get_model_provider():
+    """The backend this session calls: "gemini", or "stub" for offline runs and load tests."""
+    return st.session_state.get('model_provider') or DEFAULT_MODEL_PROVIDER
+
+@st.cache_resource
+def get_stub_backend():
+    """Process-wide offline backend; latency and error rates come from STUB_* variables."""
+    return StubBackend(
+        latency=float(os.getenv("STUB_LATENCY_SECONDS", "0.8")),
+        jitter=float(os.getenv("STUB_LATENCY_JITTER", "0.4")),
+        error_rate=float(os.getenv("STUB_ERROR_RATE", "0")),
+        timeout_rate=float(os.getenv("STUB_TIMEOUT_RATE", "0")),
+        rate_limit_rate=float(os.getenv("STUB_RATE_LIMIT_RATE", "0")),
+        seed=int(os.getenv("STUB_SEED", "0")),
+        prefill_seconds_per_1k=float(os.getenv("STUB_PREFILL_SECONDS_PER_1K", "0")),
+        min_cached_tokens=int(os.getenv("STUB_MIN_CACHED_TOKENS", str(GeminiBackend.min_cached_tokens))),
+    )
+
+def get_backend():
+    """Returns this session's backend and the key its calls are admitted (and rate limited) under."""
+    if get_model_provider() == "stub":
+        return get_stub_backend(), "stub"
+    api_key = _get_api_key()
+    scope = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    return GeminiBackend(get_model_client(api_key), get_cache_client(api_key), scope), api_key
+
+# --- TIERED ROUTING ---
+FAST_MODEL_NAME = os.getenv("ROUTER_FAST_MODEL", "gemini-2.5-flash-lite")
+ROUTING_ENABLED = os.getenv("MODEL_ROUTING", "1") == "1"
+
+@st.cache_resource
+def get_router():
+    """Process-wide fast-first model router and its per-tier accounting."""
+    from routing import TierRouter
+
+    return TierRouter(
+        fast_model=FAST_MODEL_NAME,
+        min_confidence=Confidence[os.getenv("ROUTER_MIN_CONFIDENCE", "MEDIUM").upper()],
+        escalate_statuses=[
+            HealthStatus[name.strip().upper()]
+            for name in os.getenv("ROUTER_ESCALATE_STATUSES", "CRITICAL,WARNING").split(",") if name.strip()
+        ],
+        fast_cost=float(os.getenv("ROUTER_FAST_COST_PER_CALL", "0.0002")),
+        strong_cost=float(os.getenv("ROUTER_STRONG_COST_PER_CALL", "0.002")),
+    )
+
+def _model_tiers(prompt, model_name):
+    """Models to try in order for a prompt: the fast tier first when routing applies."""
+    fast_model = _provider_model(FAST_MODEL_NAME)
+    if st.session_state.get('tiered_routing', ROUTING_ENABLED) and fast_model != model_name \
+            and get_router().routes(prompt):
+        return (fast_model, model_name)
+    return (model_name,)
+
+# Errors about the request itself, not the fast model: the strong tier would fail the same way.
+NOT_ESCALATED_ERRORS = (ImageRejectedError, TokenBudgetError, MissingApiKeyError)
+
+def _escalation_error(error):
+    """Returns why a fast-tier failure is escalated to the strong tier, or raises it when it is not."""
+    if isinstance(error, InvalidResponseError):
+        return "unparsed"
+    error = classify_exception(error)
+    if isinstance(error, NOT_ESCALATED_ERRORS):
+        raise error
+    logger.warning("Fast tier failed, escalating: %s", error)
+    return "error"
+
+def _call_fast_tiers(prompt, tiers, attempt_on, info):
+    """Tries every tier but the last; returns the first (text, result) the router accepts, or None.
+
+    A fast-tier answer that fails to parse, or a fast call that fails (timed
+    out, rate limited, model retired...), is escalated like a doubtful answer.
+    """
+    router = get_router()
+    for model_name in tiers[:-1]:
+        started = time.perf_counter()
+        try:
+            text, result = get_resilient_caller(router.FAST).call(attempt_on(model_name, router.FAST), info=info)
+            reason = router.escalation_reason(prompt, result)
+        except ModelError as e:
+            reason = _escalation_error(e)
+        _record_tier_call(prompt, router.FAST, time.perf_counter() - started)
+        router.record_outcome(reason)
+        if reason is None:
+            if info is not None:
+                info.update(tier=router.FAST, model=model_name)
+            return text, result
+        logger.info("Escalating %s answer to %s (%s)", model_name, tiers[-1], reason)
+    if info is not None:
+        info.update(tier=router.STRONG, model=tiers[-1])
+    return None
+
+def _call_tiers(prompt, tiers, attempt_on, info):
+    """Runs attempt_on(model, tier) per tier until the router accepts an answer; the last tier always answers."""
+    router = get_router()
+    started = time.perf_counter()
+    answer = _call_fast_tiers(prompt, tiers, attempt_on, info)
+    if answer is None:
+        strong_started = time.perf_counter()
+        answer = get_resilient_caller(router.STRONG).call(attempt_on(tiers[-1], router.STRONG), info=info)
+        _record_tier_call(prompt, router.STRONG, time.perf_counter() - strong_started)
+    router.record_request(time.perf_counter() - started)
+    return answer
+
+def _record_tier_call(prompt, tier, seconds):
+    """Accounts one model call (retries included) with the router and the latency histograms."""
+    get_router().record_call(tier, seconds)
+    get_metrics().observe("model_seconds", seconds, page=current_page.get(), prompt=prompt_label(prompt), tier=tier)
+
+def _record_usage(labels, tier, usage):
+    """Adds one answered call's token counts to the token counters."""
+    registry = get_metrics()
+    for name in ("prompt_tokens", "output_tokens", "cached_tokens"):
+        if usage.get(name):
+            registry.inc(f"{name}_total", usage[name], tier=tier, **labels)
+
+# --- RESILIENCE ---
+@st.cache_resource
+def get_resilient_caller(tier="strong"):
+    """Process-wide retry/deadline/circuit-breaker wrapper for one kind of model call.
+
+    The fast and strong routing tiers and translations each get their own,
+    so one failing model does not open the circuit for the others.
+    """
+    return ResilientCaller(
+        policy=RetryPolicy(max_attempts=int(os.getenv("MODEL_MAX_ATTEMPTS", "3"))),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("MODEL_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("MODEL_BREAKER_RESET_SECONDS", "30")),
+        ),
+        deadline=float(os.getenv("MODEL_CALL_TIMEOUT", "60")),
+        hedge=os.getenv("MODEL_HEDGE_REQUESTS", "0") == "1",
+    )
+
+# --- ADMISSION CONTROL ---
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+MAX_CONCURRENT_CALLS = int(os.getenv("MODEL_MAX_CONCURRENCY", "8"))
+QUEUE_TIMEOUT = float(os.getenv("MODEL_QUEUE_TIMEOUT", "300"))
+
+@st.cache_resource
+def get_admission_controller():
+    """Server-wide governor shared by every session: FIFO queue, concurrency cap, per-key quota."""
+    return AdmissionController(max_concurrent=MAX_CONCURRENT_CALLS, requests_per_minute=REQUESTS_PER_MINUTE)
+
+@contextlib.contextmanager
+def _admitted(api_key, on_wait, timeout=QUEUE_TIMEOUT):
+    started = time.perf_counter()
+    try:
+        with get_admission_controller().admit(api_key, on_wait=on_wait, timeout=timeout):
+            get_metrics().observe("queue_seconds", time.perf_counter() - started, page=current_page.get())
+            yield
+    except AdmissionTimeout as e:
+        raise ModelTimeoutError("Timed out waiting in the request queue.") from e
+
+# --- NEAR-DUPLICATE INDEX ---
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "4"))
+
+@st.cache_resource
+def get_phash_index():
+    """Perceptual-hash index of analysed images, replayed from disk at startup."""
+    from phash_index import PerceptualIndex
+
+    path = os.getenv("PHASH_INDEX_PATH")
+    if not path and os.getenv("RESULT_CACHE_DIR"):
+        path = os.path.join(os.getenv("RESULT_CACHE_DIR"), "phash_index.tsv")
+    return PerceptualIndex(
+        path=path, max_distance=PHASH_MAX_DISTANCE, max_entries=int(os.getenv("PHASH_INDEX_MAX_ENTRIES", "100000"))
+    )
+
+# --- ANALYSIS HISTORY ---
+# The CSV export is built in memory when downloaded, so it holds at most this many (newest) rows.
+HISTORY_EXPORT_MAX_ROWS = int(os.getenv("HISTORY_EXPORT_MAX_ROWS", "20000"))
+
+@st.cache_resource
+def get_history_store():
+    """SQLite log of every analysis, shared by all sessions and kept across restarts."""
+    from history import HistoryStore
+
+    data_dir = os.getenv("RESULT_CACHE_DIR") or APP_DATA_DIR
+    path = os.getenv("HISTORY_DB_PATH") or os.path.join(data_dir, "history.sqlite3")
+    # Answers are reused from history only as long as from the result cache.
+    return HistoryStore(path, max_age=RESULT_CACHE_TTL_SECONDS)
+
+def _record_history(request, text, result, latency, model):
+    from history import thumbnail_jpeg
+
+    try:
+        get_history_store().record(
+            request.cache_key, request.digest, PROMPT_TYPES.get(request.prompt, "custom"), request.language, text,
+            result=result, thumbnail=thumbnail_jpeg(request.contents[1]["data"]), latency=latency, model=model,
+        )
+    except Exception:
+        # History is a convenience; a locked or full database must not fail the analysis.
+        logger.exception("Could not record analysis in history")
+
+# --- LOCALIZATION ---
+# Image analysis happens once per photo; other languages are text-only translations of that answer.
+LANGUAGES = ["English", "Hindi", "Gujarati", "Marathi", "Punjabi"]
+TRANSLATION_MODEL_NAME = os.getenv("TRANSLATION_MODEL", FAST_MODEL_NAME)
+TRANSLATION_TEMPERATURE = float(os.getenv("TRANSLATION_TEMPERATURE", "0.2"))
+# Translations of stored results run while a page renders, so they wait less and failures are remembered.
+TRANSLATION_QUEUE_TIMEOUT = float(os.getenv("TRANSLATION_QUEUE_TIMEOUT", "20"))
+TRANSLATION_RETRY_SECONDS = float(os.getenv("TRANSLATION_RETRY_SECONDS", "60"))
+
+@st.cache_resource
+def get_translation_cache():
+    """Process-wide store of each photo's analysis (any language) and of its translations."""
+    disk_dir = os.getenv("RESULT_CACHE_DIR")
+    return ResultCache(
+        max_entries=int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "1024")),
+        ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+        disk_dir=os.path.join(disk_dir, "translations") if disk_dir else None,
+        max_disk_entries=int(os.getenv("RESULT_CACHE_MAX_DISK_ENTRIES", "5000")),
+    )
+
+@st.cache_resource
+def get_translation_failures():
+    """Recent translation failures: reruns raise them again instead of waiting for another call."""
+    return RecentFailures(retry_seconds=TRANSLATION_RETRY_SECONDS)
+
+def _response_text(response):
+    """Returns (text, result_type): plain text as is, a parsed result as its JSON."""
+    if isinstance(response, str):
+        return response, None
+    return json.dumps(response.to_dict(), ensure_ascii=False), type(response)
+
+def translate_response(response, source_language, target_language, info=None):
+    """Returns a response (text or parsed result) in target_language.
+
+    Translations come from one small text-only call on TRANSLATION_MODEL and
+    are cached by source text and language pair, so a language switch is a
+    cache lookup after the first time. Failures raise a ModelError, and the
+    same translation fails fast for TRANSLATION_RETRY_SECONDS afterwards.
+    """
+    if source_language == target_language:
+        return response
+    text, result_type = _response_text(response)
+    cache = get_translation_cache()
+    key = make_key("translation", text, source_language, target_language, TRANSLATION_MODEL_NAME)
+    translated = cache.get(key)
+    if translated is None:
+        failures = get_translation_failures()
+        failures.check(key)
+        try:
+            translated = _call_translation(text, result_type, source_language, target_language, info)
+        except ModelError as e:
+            failures.record(key, e)
+            raise
+        failures.forget(key)
+        cache.set(key, translated)
+    return result_type.from_json(translated) if result_type is not None else translated
+
+def _call_translation(text, result_type, source_language, target_language, info):
+    backend, api_key = get_backend()
+    model_name = _provider_model(TRANSLATION_MODEL_NAME)
+    generation_config = {"temperature": TRANSLATION_TEMPERATURE}
+    if result_type is not None:
+        generation_config.update(response_mime_type="application/json", response_schema=result_type.SCHEMA)
+    contents = [TRANSLATION_PROMPT.format(source=source_language, target=target_language) + text]
+    labels = {"page": current_page.get(), "prompt": "translation"}
+
+    def attempt(timeout):
+        usage = {}
+        translated = backend.generate(contents, model_name, generation_config, timeout, usage)
+        _record_usage(labels, "translation", usage)
+        if result_type is not None:
+            try:
+                result_type.from_json(translated)
+            except ResultParseError as e:
+                raise InvalidResponseError(str(e)) from e
+        return translated
+
+    with _admitted(api_key, None, timeout=TRANSLATION_QUEUE_TIMEOUT):
+        started = time.perf_counter()
+        translated = get_resilient_caller("translation").call(attempt, info=info)
+        get_metrics().observe("model_seconds", time.perf_counter() - started, tier="translation", **labels)
+    return translated
+
+def _translate_other_language(request, result_type, info):
+    """Answers from this photo's analysis in another language with a translation, or returns None."""
+    stored = get_translation_cache().get(request.analysis_key)
+    if stored is None:
+        return None
+    language, text = json.loads(stored)
+    if language == request.language:
+        return None
+    original = result_type.from_json(text) if result_type is not None else text
+    try:
+        translated = translate_response(original, language, request.language, info)
+    except ModelError as e:
+        logger.warning("Translation from %s failed, analyzing the image again: %s", language, e)
+        return None
+    info.update(source="translation", from_language=language)
+    _remember(request, _response_text(translated)[0], translated if result_type is not None else None,
+              original=False, model=_provider_model(TRANSLATION_MODEL_NAME))
+    return translated
+
+def _localize(response, info, language):
+    """A stored response and its info in the session's language, translated (and cached) if needed."""
+    target = st.session_state.get('language', 'English')
+    if language == target:
+        return response, info
+    try:
+        with st.spinner(f"Translating to {target}..."):
+            response = translate_response(response, language, target)
+    except ModelError as e:
+        st.caption(f"Could not translate to {target} ({e.user_message}); showing the {language} result.")
+        return response, info
+    return response, {**info, "source": "translation", "from_language": language}
+
+# --- PROMPT COMPILER ---
+LANGUAGE_INSTRUCTION = "\n\nIMPORTANT OUTPUT INSTRUCTION: Provide the response strictly in {language} language."
+
+# No spinner: the first call usually comes from a background job, after its rerun has finished.
+@st.cache_resource(show_spinner=False)
+def get_prompt_compiler():
+    """Process-wide compiled prompt variants, per-request token budget and cached prompt prefixes."""
+    return PromptCompiler(
+        LANGUAGE_INSTRUCTION,
+        budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "2048")),
+        caching=os.getenv("PROMPT_PREFIX_CACHING", "1") == "1",
+        prefix_ttl=float(os.getenv("PROMPT_PREFIX_TTL_SECONDS", "3600")),
+    )
+
+def _prompt_contents(backend, model_name, request):
+    """The contents to send to model_name and the cached prefix they continue (None to send everything)."""
+    handle = get_prompt_compiler().prefix_handle(backend, model_name, request.compiled)
+    if handle is None:
+        return request.contents, None
+    return [request.compiled.suffix] + request.contents[1:], handle
+
+def prompt_token_report():
+    """Input tokens sent and saved by cached prompt prefixes, per page (from the token counters)."""
+    report = {}
+    for row in get_metrics().counters():
+        if row["metric"] in ("prompt_tokens_total", "cached_tokens_total"):
+            entry = report.setdefault(row.get("page", "none"), {"prompt_tokens": 0, "cached_tokens": 0})
+            entry[row["metric"][:-len("_total")]] += row["value"]
+    for entry in report.values():
+        entry["saved"] = entry["cached_tokens"] / entry["prompt_tokens"] if entry["prompt_tokens"] else 0.0
+    return [{"page": page, **entry} for page, entry in sorted(report.items())]
 
 # --- API HANDLER ---
-def get_gemini_response(image, prompt):
-    """Handles communication with Google Gemini API."""
+ModelRequest = namedtuple(
+    "ModelRequest",
+    ["cache_key", "scope_key", "analysis_key", "phash", "contents", "tiers", "digest", "prompt", "language",
+     "compiled"],
+)
+
+def prepare_image(image, prompt):
+    """Preprocesses a photo for `prompt` in the session's language.
+
+    Fitting the request into the token budget may shrink the image before it
+    is encoded. The result can be passed to get_gemini_response in place of
+    the PIL image, e.g. by callers that prepare photos in worker processes.
+    """
+    compiler = get_prompt_compiler()
+    compiled = compiler.compile(prompt, st.session_state.get('language', 'English'))
+    return preprocess_image(image, max_edge=compiler.edge_for_budget(compiled, IMAGE_MAX_EDGE))
+
+def _build_request(image, prompt, result_type=None):
+    """Prepares the cache keys and model contents shared by both call styles."""
+    target_language = st.session_state.get('language', 'English')
+    compiled = get_prompt_compiler().compile(prompt, target_language)
+    prepared = image if isinstance(image, PreparedImage) else prepare_image(image, prompt)
+    model_name, generation_config = get_model_settings()
+    schema_name = result_type.__name__ if result_type is not None else None
+    tiers = _model_tiers(prompt, model_name)
+    # Everything except the image: results within one scope are interchangeable.
+    scope_key = make_key(prompt, target_language, ">".join(tiers), sorted(generation_config.items()), schema_name)
+    cache_key = make_key(prepared.digest, scope_key)
+    # The same request in any language: its answer can be translated instead of re-analyzed.
+    analysis_key = make_key(prepared.digest, prompt, ">".join(tiers), sorted(generation_config.items()), schema_name)
+
+    # The static prompt comes first so the backend can serve it from a context cache.
+    contents = [compiled.text, {"mime_type": prepared.mime_type, "data": prepared.data}]
+    return ModelRequest(
+        cache_key, scope_key, analysis_key, prepared.phash, contents, tiers, prepared.digest, prompt, target_language,
+        compiled,
+    )
+
+def _lookup_cached(request, info, similar=True):
+    """Returns a stored response for this exact image, or (if similar) for a near-duplicate of it.
+
+    The result cache is checked first, then the analysis history, which
+    keeps answers after the cache has expired or been cleared.
+    """
+    cache = get_result_cache()
+    cached = cache.get(request.cache_key)
+    if cached is not None:
+        if info is not None:
+            info.update(source="cache", attempts=0)
+        return cached
+
+    history = get_history_store()
+    cached = history.lookup(request.cache_key)
+    if cached is not None:
+        cache.set(request.cache_key, cached)
+        if info is not None:
+            info.update(source="history", attempts=0)
+        return cached
+    if not similar:
+        return None
+
+    index = get_phash_index()
+    match = index.find(request.scope_key, request.phash)
+    if match is None:
+        return None
+    similar_key, distance = match
+    cached = cache.get(similar_key) or history.lookup(similar_key)
+    if cached is None:
+        return None
+    # Not stored under this photo's own key: it is another photo's answer, found again by the index next time.
+    index.near_hits += 1
+    if info is not None:
+        info.update(source="near_duplicate", distance=distance, attempts=0)
+    return cached
+
+def _remember(request, text, result=None, latency=None, original=True, model=None):
+    get_result_cache().set(request.cache_key, text)
+    _record_history(request, text, result, latency, model)
+    get_phash_index().add(request.scope_key, request.phash, request.cache_key)
+    if original:
+        # Kept per photo whatever the language, so other languages translate it instead of re-analyzing.
+        get_translation_cache().set(request.analysis_key, json.dumps([request.language, text]))
+
+def show_reuse_notice(info):
+    """Tells the user when a result came from a previous analysis instead of a new call."""
+    if info.get("source") == "near_duplicate":
+        st.caption(f"♻️ Reused the analysis of a near-identical photo (distance {info['distance']}).")
+    elif info.get("source") == "history":
+        st.caption("♻️ Answered from your analysis history for this photo.")
+    elif info.get("source") == "cache":
+        st.caption("♻️ Reused a previous analysis of this photo.")
+    elif info.get("source") == "translation":
+        st.caption(f"🌐 Translated from the {info['from_language']} analysis of this photo; no new image analysis.")
+
+def reuse_label(info):
+    """Short table label for where a response came from."""
+    source = info.get("source", "model")
+    if source == "near_duplicate":
+        return f"Near-identical photo (distance {info['distance']})"
+    if source == "translation":
+        return f"Translated from {info['from_language']}"
+    return {"cache": "Reused (same photo)", "history": "History (same photo)"}.get(source, "New analysis")
+
+def _get_api_key():
     api_key = st.session_state.get('api_key') or os.getenv("GEMINI_API_KEY")
-    
     if not api_key:
-        return "ERROR: API Key missing. Please add it in Settings."
-    
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash-preview-09-2025') 
-    
-    target_language = st.session_state.get('language', 'English')
-    language_instruction = f"\n\nIMPORTANT OUTPUT INSTRUCTION: Provide the response strictly in {target_language} language."
-    final_prompt = prompt + language_instruction
+        raise MissingApiKeyError()
+    return api_key
+
+def get_gemini_response(image, prompt, result_type=None, info=None, on_wait=None, similar=True):
+    """Handles communication with the session's model backend (Google Gemini or the offline stub).
+
+    With a result_type (see results.py) the model is constrained to its JSON
+    schema and the parsed result object is returned instead of text. Failures
+    raise a resilience.ModelError. If `info` is a dict it receives call details
+    such as the response source and the number of attempts. Calls wait in the
+    process-wide admission queue; `on_wait(position, seconds)` reports progress.
+    Responses for the same or (unless similar is False) a near-identical
+    photo are served from storage. `image` is a PIL image or a PreparedImage
+    from prepare_image.
+    """
+    info = {} if info is None else info
+    with _traced_request(prompt, info):
+        return _get_gemini_response(image, prompt, result_type, info, on_wait, similar)
+
+@contextlib.contextmanager
+def _traced_request(prompt, info):
+    """Times a whole request into `request_seconds`, labelled with where the answer came from."""
+    started = time.perf_counter()
+    source = "error"
+    try:
+        yield
+        source = info.get("source", "model")
+    finally:
+        get_metrics().observe(
+            "request_seconds", time.perf_counter() - started,
+            page=current_page.get(), prompt=prompt_label(prompt), source=source,
+        )
+
+def _get_gemini_response(image, prompt, result_type, info, on_wait, similar=True):
+    backend, api_key = get_backend()
 
+    request = _build_request(image, prompt, result_type)
+    info["language"] = request.language
+    cached = _lookup_cached(request, info, similar)
+    if cached is not None:
+        return result_type.from_json(cached) if result_type is not None else cached
+    translated = _translate_other_language(request, result_type, info)
+    if translated is not None:
+        return translated
+
+    _, generation_config = _generation_config(result_type)
+    # Attempts run on the resilient caller's threads, so the page label is captured here.
+    labels = {"page": current_page.get(), "prompt": prompt_label(prompt)}
+
+    def attempt_on(model_name, tier):
+        def attempt(timeout):
+            usage = {}
+            contents, prefix = _prompt_contents(backend, model_name, request)
+            text = backend.generate(contents, model_name, generation_config, timeout, usage, prefix)
+            _record_usage(labels, tier, usage)
+            try:
+                return text, result_type.from_json(text) if result_type is not None else text
+            except ResultParseError as e:
+                raise InvalidResponseError(str(e)) from e
+        return attempt
+
+    info["source"] = "model"
+    with _admitted(api_key, on_wait):
+        started = time.perf_counter()
+        text, result = _call_tiers(prompt, request.tiers, attempt_on, info)
+        latency = time.perf_counter() - started
+        get_quality_gate().observe_call(latency)
+    _remember(request, text, result, latency, model=info.get("model"))
+    return result
+
+def _open_fast_stream(prompt, open_stream, info):
+    """Reads a fast-tier stream until the router can judge it; returns (reason, chunks).
+
+    When the router accepts the answer (reason None), chunks replays what was
+    read and streams the rest. Otherwise the stream is closed, chunks is
+    None and the answer goes to the strong tier, as in _call_fast_tiers.
+    """
+    router = get_router()
+    chunks, held = None, []
     try:
-        response = model.generate_content([final_prompt, image])
-        return response.text
+        chunks, first = get_resilient_caller(router.FAST).call(open_stream, info=info)
+        chunk = first
+        while True:
+            if chunk is not None:
+                held.append(chunk)
+            decided, reason = router.stream_reason(prompt, "".join(held), complete=chunk is None)
+            if decided:
+                break
+            chunk = next(chunks, None)
     except Exception as e:
-        return f"ERROR: {str(e)}"
+        reason = _escalation_error(e)
+    if reason is None:
+        return None, itertools.chain(held, chunks)
+    if chunks is not None and hasattr(chunks, "close"):
+        chunks.close()
+    return reason, None
+
+def stream_gemini_response(image, prompt, info=None, on_wait=None):
+    """Yields the model's response in chunks as they arrive.
+
+    Page jobs collect the chunks into Job.partial, which the page renders on
+    each poll. A routed prompt streams from the fast tier once the router has
+    accepted its answer, else from the session's model. Retries and the
+    circuit breaker cover opening the stream; an error after the first chunk
+    is raised as a ModelError once the partial text is shown.
+    """
+    info = {} if info is None else info
+    with _traced_request(prompt, info):
+        yield from _stream_gemini_response(image, prompt, info, on_wait)
+
+def _stream_gemini_response(image, prompt, info, on_wait):
+    backend, api_key = get_backend()
+
+    request = _build_request(image, prompt)
+    info["language"] = request.language
+    cached = _lookup_cached(request, info)
+    if cached is None:
+        cached = _translate_other_language(request, None, info)
+    if cached is not None:
+        yield cached
+        return
+
+    _, generation_config = _generation_config()
+    labels = {"page": current_page.get(), "prompt": prompt_label(prompt)}
+
+    def open_stream_on(model_name, usage):
+        def open_stream(timeout):
+            contents, prefix = _prompt_contents(backend, model_name, request)
+            chunks = iter(backend.stream(contents, model_name, generation_config, timeout, usage, prefix))
+            return chunks, next(chunks, None)
+        return open_stream
+
+    info["source"] = "model"
+    parts = []
+    # The admission slot is held until the stream is fully consumed.
+    with _admitted(api_key, on_wait):
+        started = time.perf_counter()
+        router = get_router()
+        for model_name in request.tiers[:-1]:
+            tier, tier_started, usage = router.FAST, time.perf_counter(), {}
+            reason, chunks = _open_fast_stream(prompt, open_stream_on(model_name, usage), info)
+            router.record_outcome(reason)
+            if reason is None:
+                info.update(tier=tier, model=model_name)
+                break
+            _record_tier_call(prompt, tier, time.perf_counter() - tier_started)
+            _record_usage(labels, tier, usage)
+            logger.info("Escalating %s answer to %s (%s)", model_name, request.tiers[-1], reason)
+        else:
+            info.update(tier=router.STRONG, model=request.tiers[-1])
+            tier, tier_started, usage = router.STRONG, time.perf_counter(), {}
+            chunks, first = get_resilient_caller(tier).call(open_stream_on(request.tiers[-1], usage), info=info)
+            chunks = itertools.chain([first] if first is not None else [], chunks)
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield text
+        except Exception as e:
+            raise classify_exception(e) from e
+        _record_tier_call(prompt, tier, time.perf_counter() - tier_started)
+        _record_usage(labels, tier, usage)
+        latency = time.perf_counter() - started
+        router.record_request(latency)
+        get_quality_gate().observe_call(latency)
+
+    _remember(request, "".join(parts), latency=latency, model=info.get("model"))
+
+def show_model_error(error):
+    """Renders a ModelError as a user-facing notice instead of a diagnosis."""
+    attempts = f" (after {error.attempts} attempts)" if error.attempts > 1 else ""
+    st.error(f"⚠️ {error.user_message}{attempts}")
+    if str(error) != error.user_message:
+        st.caption(str(error))
+
+# --- COMBINED ANALYSIS ---
+ANALYSIS_STORE_MAX_ENTRIES = 20
+
+def upload_digest(uploaded_file):
+    """Content hash of an uploaded file's raw bytes (no decoding), computed once per upload."""
+    file_id = getattr(uploaded_file, "file_id", None)
+    digests = st.session_state.setdefault('upload_digests', {})
+    digest = digests.get(file_id) if file_id else None
+    if digest is None:
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if file_id:
+            _store_bounded(digests, file_id, digest)
+    return digest
+
+def _analysis_store_key(uploaded_file):
+    # Language-free: stored results are translated on display (see _localize).
+    model_name, generation_config = get_model_settings()
+    return make_key(upload_digest(uploaded_file), model_name, sorted(generation_config.items()))
+
+def get_stored_analysis(uploaded_file):
+    """Returns this session's combined analysis for the upload in the session's language, if one already ran."""
+    entry = st.session_state.get('analysis_store', {}).get(_analysis_store_key(uploaded_file))
+    if entry is None:
+        return None
+    analysis, language = entry
+    return _localize(analysis, {}, language)[0]
+
+def run_combined_analysis(page, uploaded_file, image, part):
+    """Starts one combined call for all pages in the background.
+
+    When it is collected the full analysis is stored under the image hash for
+    every page, and `part` (e.g. "fun_facts") becomes this page's result.
+    """
+    start_page_job(
+        page, uploaded_file, image, COMBINED_ANALYSIS_PROMPT,
+        result_type=CombinedAnalysis, extract=operator.attrgetter(part)
+    )
+
+def _store_bounded(store, key, value):
+    """Inserts into a session dict, dropping the oldest entries beyond ANALYSIS_STORE_MAX_ENTRIES."""
+    store.pop(key, None)
+    store[key] = value
+    while len(store) > ANALYSIS_STORE_MAX_ENTRIES:
+        store.pop(next(iter(store)))
+
+# --- PAGE RESULTS ---
+PageResult = namedtuple("PageResult", ["response", "info", "name", "digest"])
+
+def save_page_result(page, uploaded_file, response, info=None):
+    """Keeps a rendered result for this page and upload so reruns can show it without a new call.
+
+    The page's most recent upload is remembered too: navigating away resets
+    the file uploader, and the last result is shown again on return.
+    """
+    _save_page_result(
+        page, _analysis_store_key(uploaded_file), uploaded_file.name, store_upload(uploaded_file), response, info,
+        st.session_state.get('language', 'English'),
+    )
+
+def _save_page_result(page, store_key, name, digest, response, info, language):
+    key = (page, store_key)
+    _store_bounded(st.session_state.setdefault('page_results', {}), key, (response, dict(info or {}), language))
+    # The photo itself stays in the shared upload store; the session keeps only its digest.
+    st.session_state.setdefault('page_last_upload', {})[page] = (key, name, digest)
+
+def get_page_result(page, uploaded_file=None):
+    """Returns the stored PageResult for the upload, or the page's last one when no file is uploaded.
+
+    A result stored in another language is translated to the session's language.
+    """
+    store = st.session_state.get('page_results', {})
+    if uploaded_file is not None:
+        key, name, digest = (page, _analysis_store_key(uploaded_file)), uploaded_file.name, None
+    else:
+        last = st.session_state.get('page_last_upload', {}).get(page)
+        if last is None:
+            return None
+        key, name, digest = last
+    entry = store.get(key)
+    if entry is None:
+        return None
+    response, info = _localize(*entry)
+    return PageResult(response, info, name, digest)
+
+def forget_removed_upload(page, uploader_key):
+    """file_uploader on_change callback: the user removed the photo, so stop showing its last result."""
+    if st.session_state.get(uploader_key) is None:
+        st.session_state.get('page_last_upload', {}).pop(page, None)
+
+def show_last_upload_notice(last):
+    """Shows the photo behind a result (or pending job) restored after navigating back to a page."""
+    st.caption(f"Showing **{last.name}** from your last visit. Upload a photo to analyze another.")
+    show_stored_image(last.digest)
+
+# --- BACKGROUND JOBS ---
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+# A job waiting for admission holds its worker, so the pool covers the admission slots plus a queue
+# behind them; jobs then wait in the admission queue, which reports their position and estimated wait.
+JOB_MAX_WORKERS = max(MAX_CONCURRENT_CALLS, int(os.getenv("JOB_MAX_WORKERS", str(MAX_CONCURRENT_CALLS * 4))))
+PageJob = namedtuple("PageJob", ["job_id", "store_key", "name", "digest", "extract"])
+
+@st.cache_resource
+def get_job_engine():
+    """Process-wide worker pool and bounded store for analyses that outlive a script run."""
+    return JobEngine(
+        max_workers=JOB_MAX_WORKERS,
+        max_jobs=int(os.getenv("JOB_MAX_ENTRIES", "200")),
+        ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", "900")),
+    )
+
+def submit_page_job(page, uploaded_file, image, prompt, result_type=None, stream=False, extract=None):
+    """Queues a page's analysis on the job engine and returns the job id.
+
+    The job keeps running when the user navigates away; the page collects it
+    the next time it is shown. Streaming jobs expose the text received so far
+    as `job.partial`.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(job):
+        # Workers read session settings (API key, language, model) like the script thread.
+        add_script_run_ctx(threading.current_thread(), ctx)
+        current_page.set(page)
+        if stream:
+            for chunk in stream_gemini_response(image, prompt, info=job.info, on_wait=job.report_wait):
+                job.partial += chunk
+            return job.partial
+        return get_gemini_response(image, prompt, result_type, info=job.info, on_wait=job.report_wait)
+
+    try:
+        job_id = get_job_engine().submit(run, label=page)
+    except JobStoreFull as e:
+        raise ModelUnavailableError("Too many analyses are queued right now.") from e
+    store_key = _analysis_store_key(uploaded_file)
+    digest = store_upload(uploaded_file)
+    st.session_state.setdefault('page_jobs', {})[page] = PageJob(job_id, store_key, uploaded_file.name, digest, extract)
+    st.session_state.setdefault('page_last_upload', {})[page] = ((page, store_key), uploaded_file.name, digest)
+    return job_id
+
+def start_page_job(page, uploaded_file, image, prompt, result_type=None, stream=False, extract=None):
+    """Submits the page's job and shows its progress, or the error if it could not be queued."""
+    try:
+        submit_page_job(page, uploaded_file, image, prompt, result_type, stream, extract)
+    except ModelError as e:
+        show_model_error(e)
+        return
+    job_progress(page)
+
+def get_page_job(page, uploaded_file=None):
+    """Returns the page's pending PageJob (for this upload, if one is given)."""
+    pending = st.session_state.get('page_jobs', {}).get(page)
+    if pending is None or (uploaded_file is not None and pending.store_key != _analysis_store_key(uploaded_file)):
+        return None
+    return pending
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(page):
+    """Polls the page's background job and collects its result into the page store when done."""
+    pending = st.session_state.get('page_jobs', {}).get(page)
+    if pending is None:
+        return
+    engine = get_job_engine()
+    job = engine.get(pending.job_id)
+    if job is not None and not job.done:
+        waiting = engine.queue_position(job.id)
+        if job.partial:
+            st.markdown(job.partial + " ▌")
+        elif job.queue_position and "attempts" not in job.info:
+            st.info(f"⏳ Server busy: you are #{job.queue_position} in the queue (about {job.queue_eta:.0f}s).")
+        elif waiting:
+            # Still waiting for a worker: every request in the admission queue is ahead of it.
+            governor = get_admission_controller()
+            position = governor.stats()["queued"] + waiting
+            st.info(
+                f"⏳ Server busy: you are #{position} in the queue (about {governor.slot_wait(position - 1):.0f}s)."
+            )
+        else:
+            st.info(f"⏳ Analyzing in the background ({job.elapsed():.0f}s). You can switch pages meanwhile.")
+        return
+
+    del st.session_state.page_jobs[page]
+    if job is None:
+        # Expired before it was collected; the page offers a fresh run.
+        st.rerun()
+    engine.discard(job.id)
+    if job.status == Job.FAILED:
+        st.session_state.setdefault('page_job_errors', {})[page] = classify_exception(job.error)
+    else:
+        response = job.result
+        language = job.info.get("language", st.session_state.get('language', 'English'))
+        if isinstance(response, CombinedAnalysis):
+            _store_bounded(st.session_state.setdefault('analysis_store', {}), pending.store_key, (response, language))
+        if pending.extract is not None:
+            response = pending.extract(response)
+        _save_page_result(page, pending.store_key, pending.name, pending.digest, response, job.info, language)
+        st.session_state.page_job_finished = page
+    # Rerun the whole page so it renders the stored result instead of this poller.
+    st.rerun()
+
+def show_job_error(page):
+    """Shows (once) the error from the page's last background job, if it failed."""
+    error = st.session_state.get('page_job_errors', {}).pop(page, None)
+    if error is not None:
+        show_model_error(error)
+
+def job_just_finished(page):
+    """True once, on the rerun right after the page's background job was collected."""
+    if st.session_state.get('page_job_finished') == page:
+        del st.session_state.page_job_finished
+        return True
+    return False
+
+def show_job_summary():
+    """Sidebar status of this session's background analyses, refreshed while any are pending."""
+    if st.session_state.get('page_jobs'):
+        _job_summary()
+
+@st.fragment(run_every=JOB_POLL_SECONDS * 2)
+def _job_summary():
+    engine = get_job_engine()
+    st.caption("Background analyses")
+    for page, pending in list(st.session_state.get('page_jobs', {}).items()):
+        job = engine.get(pending.job_id)
+        if job is None or job.done:
+            st.caption(f"✅ {page}: ready — open the page to view")
+        else:
+            st.caption(f"⏳ {page}: {job.status} ({job.elapsed():.0f}s)")
+
+# --- BATCH ANALYSIS ---
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "6"))
+BatchResult = namedtuple("BatchResult", ["index", "response", "error", "latency", "attempts", "info"])
+
+def analyze_batch(files, prompt, result_type=None, max_workers=None, similar=True):
+    """Analyzes many uploads on a bounded thread pool, yielding BatchResults as they finish.
+
+    Each result's info holds the response source (see show_reuse_notice). With
+    similar=False no answer is reused from a near-identical photo, for batches
+    where every photo shows a different subject.
+    """
+    from PIL import Image
+
+    ctx = get_script_run_ctx()
+    page = current_page.get()
+
+    def attach_context():
+        # Workers read session settings (API key, language, model) like the script thread.
+        add_script_run_ctx(threading.current_thread(), ctx)
+        current_page.set(page)
+
+    def analyze(index, file):
+        # Quota pacing and retries happen inside get_gemini_response (admission + resilient caller).
+        started = time.perf_counter()
+        info = {}
+        response = error = None
+        try:
+            report = _check_quality(file.getvalue())
+            if not report.passed:
+                raise ImageRejectedError(" ".join(report.issues))
+            response = get_gemini_response(Image.open(file), prompt, result_type, info=info, similar=similar)
+        except ModelError as e:
+            error = e
+        attempts = error.attempts if error is not None else info.get("attempts", 1)
+        return BatchResult(index, response, error, time.perf_counter() - started, attempts, info)
+
+    with ThreadPoolExecutor(max_workers=max_workers or BATCH_MAX_WORKERS, initializer=attach_context) as pool:
+        futures = [pool.submit(analyze, index, file) for index, file in enumerate(files)]
+        for future in as_completed(futures):
+            yield future.result()